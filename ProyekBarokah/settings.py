@@ -38,6 +38,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard_admin.middleware.SqlProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'ProyekBarokah.urls'
@@ -139,5 +140,65 @@ else:
 
 DEFAULT_FROM_EMAIL = 'admin@barokah.com'
 
+# Profiling SQL per request (dashboard_admin/middleware.py): header X-Query-Count dan
+# Server-Timing, log request lambat, dan halaman "Profil Query" di dasbor admin.
+# Aktifkan di production sementara saja dengan environment variable SQL_PROFILING=1.
+SQL_PROFILING_ENABLED = os.environ.get('SQL_PROFILING', '1' if DEBUG else '0') == '1'
+SQL_PROFILING_SLOW_REQUEST_MS = int(os.environ.get('SQL_PROFILING_SLOW_REQUEST_MS', 500))
+SQL_PROFILING_LOG_FILE = os.path.join(BASE_DIR, 'slow_requests.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_requests_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SQL_PROFILING_LOG_FILE,
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'dashboard_admin.slow_requests': {
+            'handlers': ['slow_requests_file'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Laporan PDF transaksi dibuat di background (dashboard_admin/pdf_reports.py) dan
+# disimpan di disk berdasarkan hash parameter filter; unduhan ulang diambil dari cache.
+REPORT_CACHE_DIR = os.path.join(BASE_DIR, 'report_cache')
+REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 15 * 60))
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'admin_dashboard.Admin'
+
+# Email keluar (admin_dashboard/outbox.py): email hanya diantrekan saat admin menyimpan,
+# lalu dikirim setiap menit oleh `python manage.py run_scheduler` (atau `send_outbox`) per batch
+# melalui satu koneksi SMTP.
+# Email yang gagal dicoba ulang setelah OUTBOX_RETRY_DELAY detik (berlipat dua tiap percobaan).
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_RETRY_DELAY = int(os.environ.get('OUTBOX_RETRY_DELAY', 60))
+
+# Tugas latar belakang (admin_dashboard/jobs.py): notifikasi dan pengumuman produk dijalankan
+# setelah respons oleh thread pool proses web; sisanya (percobaan ulang, tugas proses yang berhenti)
+# dijalankan setiap menit oleh `python manage.py run_scheduler` (atau `run_jobs`). Tugas yang diklaim tetapi tidak selesai dalam
+# JOBS_VISIBILITY_TIMEOUT detik diklaim ulang oleh worker lain.
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 2))
+JOBS_VISIBILITY_TIMEOUT = int(os.environ.get('JOBS_VISIBILITY_TIMEOUT', 300))
+JOBS_RETRY_DELAY = int(os.environ.get('JOBS_RETRY_DELAY', 30))
+JOBS_RUN_IN_PROCESS = os.environ.get('JOBS_RUN_IN_PROCESS', '1') == '1'
+
+# Tugas berkala (admin_dashboard/periodic.py): dijalankan oleh satu proses
+# `python manage.py run_scheduler` (ulang tahun, pembayaran & diskon kedaluwarsa, rekap penjualan,
+# notifikasi lama, serta email keluar dan tugas latar setiap menit). Setiap tugas dikunci dengan sewa di database selama SCHEDULER_LEASE detik, jadi
+# beberapa scheduler boleh berjalan bersamaan tanpa menjalankan tugas yang sama dua kali.
+SCHEDULER_LEASE = int(os.environ.get('SCHEDULER_LEASE', 15 * 60))
+SCHEDULER_RETRY_DELAY = int(os.environ.get('SCHEDULER_RETRY_DELAY', 5 * 60))
+# Notifikasi pribadi yang sudah dibaca dan lebih lama dari ini (hari) dihapus
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 180))
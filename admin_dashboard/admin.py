@@ -1,5 +1,5 @@
 from django.contrib import admin
-from django.db.models import Sum, F, Prefetch
+from django.db.models import F, Prefetch
 from django.shortcuts import redirect, render # 🚨 MODIFIKASI: Ditambahkan 'render'
 from django.utils.html import format_html
 from django.urls import path, reverse
@@ -11,7 +11,12 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
 
-from .models import Admin, Pelanggan, Produk, Transaksi, DetailTransaksi, DiskonPelanggan, Notifikasi, Kategori
+from .models import Admin, Pelanggan, Produk, Transaksi, DetailTransaksi, DiskonPelanggan, Notifikasi, NotifikasiBroadcast, Kategori, EmailKeluar, TugasLatar, JadwalTugas
+from . import jobs
+from .loyalty import change_transaction_status
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # 🔔 MODIFIKASI: DUMMY VIEW/PLACEHOLDER UNTUK MEMPERBAIKI MASALAH SIDEBAR
@@ -80,6 +85,10 @@ class IsLoyalFilter(admin.SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(pelanggan_loyal=True)
+        if self.value() == 'no':
+            return queryset.filter(pelanggan_loyal=False)
         return queryset
 
 # Daftarkan model Admin
@@ -103,7 +112,6 @@ class PelangganAdmin(BaseModelAdmin):
         """
         Admin action to manually trigger birthday discount for loyal customers
         """
-        from django.db.models import Sum
         from datetime import date
         from .views import create_notification, send_notification_email  # Import notification helpers
         
@@ -113,11 +121,7 @@ class PelangganAdmin(BaseModelAdmin):
         # Filter customers who qualify for double discount (birthday AND loyal)
         for pelanggan in queryset:
             # Check if customer has birthday today
-            is_birthday = (
-                pelanggan.tanggal_lahir and 
-                pelanggan.tanggal_lahir.month == today.month and 
-                pelanggan.tanggal_lahir.day == today.day
-            )
+            is_birthday = pelanggan.is_birthday_on(today)
             
             if not is_birthday:
                 self.message_user(
@@ -127,16 +131,9 @@ class PelangganAdmin(BaseModelAdmin):
                 )
                 continue
             
-            # Calculate total spending for paid transactions
-            total_spending = Transaksi.objects.filter(
-                pelanggan=pelanggan,
-                status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-            ).aggregate(
-                total_belanja=Sum('total')
-            )['total_belanja'] or 0
-            
-            # Check if customer is loyal
-            is_loyal = total_spending >= 5000000
+            # Total spending and loyalty status from the stored loyalty ledger
+            total_spending = pelanggan.total_spending
+            is_loyal = pelanggan.is_loyal
             
             if not is_loyal:
                 self.message_user(
@@ -218,30 +215,20 @@ class PelangganAdmin(BaseModelAdmin):
     set_birthday_discount_for_loyal_customers.short_description = "Set Birthday Discount for Loyal Customers"
     
     def total_belanja_admin(self, obj):
-        # Calculate total spending for paid transactions
-        status_loyalitas = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        total_spending = obj.transaksi_set.filter(status_transaksi__in=status_loyalitas).aggregate(
-            total_belanja=Sum('total')
-        )['total_belanja'] or 0
-        
-        return f"Rp {total_spending:,.0f}"
+        # Total spending for paid transactions, read from the loyalty ledger
+        return f"Rp {obj.total_spending:,.0f}"
 
     def is_ultah(self, obj):
         today = date.today()
-        if obj.tanggal_lahir and obj.tanggal_lahir.month == today.month and obj.tanggal_lahir.day == today.day:
+        if obj.is_birthday_on(today):
             return format_html('<span style="color: green; font-weight: bold;">&#10004; Ya</span>')
         return "-"
 
     def set_diskon_button(self, obj):
         today = date.today()
-        # Calculate total spending for paid transactions
-        status_loyalitas = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        total_spending = obj.transaksi_set.filter(status_transaksi__in=status_loyalitas).aggregate(
-            total_belanja=Sum('total')
-        )['total_belanja'] or 0
-        
-        is_loyal = total_spending >= 5000000
-        is_ultah = obj.tanggal_lahir and obj.tanggal_lahir.month == today.month and obj.tanggal_lahir.day == today.day
+        # Loyalty status from the loyalty ledger
+        is_loyal = obj.is_loyal
+        is_ultah = obj.is_birthday_on(today)
         
         # Debug information
         # print(f"Customer: {obj.nama_pelanggan}")
@@ -264,14 +251,9 @@ class PelangganAdmin(BaseModelAdmin):
             return redirect("admin:admin_dashboard_pelanggan_changelist")
 
         today = date.today()
-        # Calculate total spending for paid transactions
-        status_loyalitas = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        total_spending = pelanggan.transaksi_set.filter(status_transaksi__in=status_loyalitas).aggregate(
-            total_belanja=Sum('total')
-        )['total_belanja'] or 0
-        
-        is_loyal = total_spending >= 5000000
-        is_ultah = pelanggan.tanggal_lahir and pelanggan.tanggal_lahir.month == today.month and pelanggan.tanggal_lahir.day == today.day
+        # Loyalty status from the loyalty ledger
+        is_loyal = pelanggan.is_loyal
+        is_ultah = pelanggan.is_birthday_on(today)
         
         # Debug information
         # messages.info(request, f"Customer: {pelanggan.nama_pelanggan}")
@@ -363,94 +345,22 @@ class ProdukAdmin(BaseModelAdmin):
         # Save the product
         super().save_model(request, obj, form, change)
         
-        # Send notifications
+        # Announce new and restocked products after the response: one
+        # background job broadcasts the notification and queues the emails
         if is_new:
-            # P3: Notify all customers about new product with email
-            from .views import create_notification_for_all_customers, send_notification_email
-            
-            # Create in-app notification for all customers with specific product detail link
-            create_notification_for_all_customers(
-                "Produk Baru", 
-                f"Produk baru telah tersedia: {obj.nama_produk}.",
-                url_target=f'/produk_detail/{obj.id}/'
-            )
-            
-            # Send email notification to all customers with valid emails
-            try:
-                # Get all customers with valid emails
-                from .models import Pelanggan
-                customers_with_email = Pelanggan.objects.exclude(email__isnull=True).exclude(email='')
-                recipient_list = [customer.email for customer in customers_with_email]
-                
-                if recipient_list:
-                    send_notification_email(
-                        subject='Produk Baru Tersedia!',
-                        template_name='emails/new_product_email.html',
-                        context={'product': obj},
-                        recipient_list=recipient_list,
-                        url_target=f'/produk_detail/{obj.id}/'
-                    )
-            except Exception as e:
-                # Log error but don't fail the save operation
-                pass
+            jenis = 'baru'
         elif old_obj and old_obj.stok_produk == 0 and obj.stok_produk > 0:
-            # Notify all customers about restocked product
-            from .views import create_notification_for_all_customers, send_notification_email
-            
-            # Create in-app notification for all customers with specific product detail link
-            create_notification_for_all_customers(
-                "Stok Diperbarui", 
-                f"Stok produk {obj.nama_produk} telah diperbarui.",
-                url_target=f'/produk_detail/{obj.id}/'
-            )
-            
-            # Send email notification to all customers with valid emails
-            try:
-                # Get all customers with valid emails
-                from .models import Pelanggan
-                customers_with_email = Pelanggan.objects.exclude(email__isnull=True).exclude(email='')
-                recipient_list = [customer.email for customer in customers_with_email]
-                
-                if recipient_list:
-                    send_notification_email(
-                        subject='Stok Produk Bertambah!',
-                        template_name='emails/stock_update_email.html',
-                        context={'product': obj},
-                        recipient_list=recipient_list,
-                        url_target=f'/produk_detail/{obj.id}/'
-                    )
-            except Exception as e:
-                # Log error but don't fail the save operation
-                pass
+            jenis = 'stok_kembali'
         elif old_obj and old_obj.stok_produk < obj.stok_produk:
-            # P3: Notify all customers about stock increase
-            from .views import create_notification_for_all_customers, send_notification_email
-            
-            # Create in-app notification for all customers with specific product detail link
-            create_notification_for_all_customers(
-                "Stok Produk Bertambah", 
-                f"Stok produk {obj.nama_produk} telah bertambah.",
-                url_target=f'/produk_detail/{obj.id}/'
-            )
-            
-            # Send email notification to all customers with valid emails
-            try:
-                # Get all customers with valid emails
-                from .models import Pelanggan
-                customers_with_email = Pelanggan.objects.exclude(email__isnull=True).exclude(email='')
-                recipient_list = [customer.email for customer in customers_with_email]
-                
-                if recipient_list:
-                    send_notification_email(
-                        subject='Stok Produk Bertambah!',
-                        template_name='emails/stock_update_email.html',
-                        context={'product': obj},
-                        recipient_list=recipient_list,
-                        url_target=f'/produk_detail/{obj.id}/'
-                    )
-            except Exception as e:
-                # Log error but don't fail the save operation
-                pass
+            jenis = 'stok_bertambah'
+        else:
+            return
+        jobs.enqueue(
+            'produk.umumkan',
+            dedup_key=f'produk.umumkan:{obj.pk}:{jenis}',
+            produk_id=obj.pk,
+            jenis=jenis
+        )
 
     # Custom action for best-selling products report
     def laporan_produk_terlaris(self, request, queryset):
@@ -563,31 +473,27 @@ class TransaksiAdmin(BaseModelAdmin):
 
     # Custom actions for bulk status changes
     def ubah_status_diproses(self, request, queryset):
-        updated_count = queryset.update(status_transaksi='DIPROSES')
+        updated_count = change_transaction_status(queryset, 'DIPROSES')
         self.message_user(request, f"{updated_count} transaksi berhasil diubah statusnya menjadi Diproses.")
     
     def ubah_status_dibayar(self, request, queryset):
-        updated_count = queryset.update(status_transaksi='DIBAYAR')
+        updated_count = change_transaction_status(queryset, 'DIBAYAR')
         self.message_user(request, f"{updated_count} transaksi berhasil diubah statusnya menjadi Dibayar.")
     
     def ubah_status_dikirim(self, request, queryset):
-        updated_count = queryset.update(status_transaksi='DIKIRIM')
+        updated_count = change_transaction_status(queryset, 'DIKIRIM')
         self.message_user(request, f"{updated_count} transaksi berhasil diubah statusnya menjadi Dikirim.")
     
     def ubah_status_selesai(self, request, queryset):
-        updated_count = queryset.update(status_transaksi='SELESAI')
-        # Create notifications for customers whose transactions were marked as completed
-        for transaksi in queryset:
-            detail_url = reverse('detail_pesanan', args=[transaksi.pk])
-            create_notification(
-                transaksi.pelanggan,
-                "Pesanan Selesai",
-                f"Pesanan Anda dengan ID {transaksi.id} telah SELESAI. <a href='{detail_url}' class='alert-link'>Beri Feedback</a>"
-            )
+        transaksi_ids = list(queryset.values_list('pk', flat=True))
+        updated_count = change_transaction_status(queryset, 'SELESAI')
+        # Notify the customers whose transactions were marked as completed
+        # in one background job
+        jobs.enqueue('notifikasi.pesanan_selesai', transaksi_ids=transaksi_ids)
         self.message_user(request, f"{updated_count} transaksi berhasil diubah statusnya menjadi Selesai.")
     
     def ubah_status_dibatalkan(self, request, queryset):
-        updated_count = queryset.update(status_transaksi='DIBATALKAN')
+        updated_count = change_transaction_status(queryset, 'DIBATALKAN')
         self.message_user(request, f"{updated_count} transaksi berhasil diubah statusnya menjadi Dibatalkan.")
     
     def save_model(self, request, obj, form, change):
@@ -604,14 +510,13 @@ class TransaksiAdmin(BaseModelAdmin):
         
         # If ongkir has changed, create a notification for the customer
         if old_ongkir != obj.ongkir:
-            from .views import create_notification
-            # Create notification for the customer
-            create_notification(
-                obj.pelanggan,
-                "Ongkos Kirim Diperbarui",
-                f"Ongkos kirim untuk pesanan Anda dengan ID #{obj.id} telah diperbarui. "
+            # Notify the customer after the response
+            jobs.enqueue(
+                'notifikasi.pelanggan',
+                pelanggan_id=obj.pelanggan_id,
+                tipe_pesan="Ongkos Kirim Diperbarui",
+                isi_pesan=f"Ongkos kirim untuk pesanan Anda dengan ID #{obj.id} telah diperbarui. "
                 f"Jumlah Ongkir yang harus Anda bayarkan saat produk diantar adalah  Rp {obj.ongkir:,.0f}. "
-                
             )
 
     def save_related(self, request, form, formsets, change):
@@ -680,4 +585,33 @@ class NotifikasiAdmin(BaseModelAdmin):
     list_display = ['pelanggan', 'tipe_pesan', 'is_read', 'created_at', 'get_actions_links']
     search_fields = ['pelanggan__nama_pelanggan', 'tipe_pesan']
     list_filter = ['is_read', 'created_at']
-    list_per_page = 6
\ No newline at end of file
+    list_per_page = 6
+
+# Daftarkan model NotifikasiBroadcast
+@admin.register(NotifikasiBroadcast)
+class NotifikasiBroadcastAdmin(BaseModelAdmin):
+    list_display = ['tipe_pesan', 'created_at', 'get_actions_links']
+    search_fields = ['tipe_pesan', 'isi_pesan']
+    list_filter = ['created_at']
+    list_per_page = 6
+# Daftarkan model EmailKeluar (status pengiriman per email)
+@admin.register(EmailKeluar)
+class EmailKeluarAdmin(BaseModelAdmin):
+    list_display = ['penerima', 'subjek', 'status', 'percobaan', 'kirim_setelah', 'terkirim_pada', 'get_actions_links']
+    search_fields = ['penerima', 'subjek']
+    list_filter = ['status', 'dibuat_pada']
+    list_per_page = 6
+# Daftarkan model TugasLatar (antrean tugas latar belakang)
+@admin.register(TugasLatar)
+class TugasLatarAdmin(BaseModelAdmin):
+    list_display = ['nama', 'status', 'percobaan', 'maks_percobaan', 'jalankan_setelah', 'selesai_pada', 'get_actions_links']
+    search_fields = ['nama', 'kunci_unik', 'error_terakhir']
+    list_filter = ['status', 'nama']
+    list_per_page = 6
+# Daftarkan model JadwalTugas (status tugas berkala dari run_scheduler)
+@admin.register(JadwalTugas)
+class JadwalTugasAdmin(BaseModelAdmin):
+    list_display = ['nama', 'status_terakhir', 'mulai_terakhir', 'durasi_terakhir_ms', 'jalankan_berikutnya', 'jumlah_gagal', 'get_actions_links']
+    search_fields = ['nama', 'error_terakhir']
+    list_filter = ['status_terakhir']
+    list_per_page = 6
@@ -7,3 +7,5 @@ class AdminDashboardConfig(AppConfig):
     
     def ready(self):
         import admin_dashboard.signals
+        import admin_dashboard.tasks
+        import admin_dashboard.periodic
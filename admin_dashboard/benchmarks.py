@@ -0,0 +1,141 @@
+"""
+Query-count, latency and memory benchmarks for the hot storefront and admin
+views. Run them with `manage.py run_benchmarks`; the views are exercised
+through the test client against a seeded throwaway database.
+"""
+import statistics
+import tempfile
+import time
+import tracemalloc
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Admin, Pelanggan, Produk
+
+SCALES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+CART_SIZE = 3
+
+
+class Scenario:
+    """
+    One request to benchmark. `prepare(client, ctx)` runs before every
+    request (outside the measurement), `data(ctx)` builds the POST body.
+    """
+
+    def __init__(self, name, url_name, role, method='get', prepare=None, data=None):
+        self.name = name
+        self.url_name = url_name
+        self.role = role
+        self.method = method
+        self.prepare = prepare
+        self.data = data
+
+
+def _fill_cart(client, ctx):
+    session = client.session
+    session['keranjang'] = {str(produk_id): 1 for produk_id in ctx['cart_product_ids']}
+    session.pop('checkout_data', None)
+    session.save()
+
+
+def _payment_data(ctx):
+    return {
+        'alamat_pengiriman': 'Jl. Benchmark',
+        'bukti_bayar': SimpleUploadedFile('bukti.png', b'bukti', content_type='image/png'),
+    }
+
+
+SCENARIOS = [
+    Scenario('produk_list', 'produk_list', 'customer'),
+    Scenario('keranjang', 'keranjang', 'customer', prepare=_fill_cart),
+    Scenario('checkout', 'checkout', 'customer', prepare=_fill_cart),
+    Scenario('proses_pembayaran', 'proses_pembayaran', 'customer', method='post', prepare=_fill_cart, data=_payment_data),
+    Scenario('dashboard', 'dashboard_admin:dashboard', 'admin'),
+    Scenario('analytics', 'dashboard_admin:analytics', 'admin'),
+    Scenario('transaction_report', 'dashboard_admin:transaction_report', 'admin'),
+    Scenario('best_products_report', 'dashboard_admin:best_products_report', 'admin'),
+]
+
+
+def make_clients():
+    """
+    A logged-in customer client and admin client, plus the context the
+    scenarios need (cart products)
+    """
+    pelanggan = Pelanggan.objects.order_by('pk').first()
+    admin = Admin.objects.filter(username='benchmark').first() or Admin.objects.create_user(
+        username='benchmark', password='benchmark', nama_lengkap='Benchmark Admin'
+    )
+    # Plenty of stock so repeated payments never run out
+    cart_product_ids = list(Produk.objects.order_by('pk').values_list('pk', flat=True)[:CART_SIZE])
+    Produk.objects.filter(pk__in=cart_product_ids).update(stok_produk=1000000)
+
+    customer = Client()
+    session = customer.session
+    session['pelanggan_id'] = pelanggan.pk
+    session.save()
+    admin_client = Client()
+    admin_client.force_login(admin)
+    return {'customer': customer, 'admin': admin_client}, {'cart_product_ids': cart_product_ids}
+
+
+def _request(client, scenario, ctx):
+    url = reverse(scenario.url_name)
+    if scenario.method == 'post':
+        return client.post(url, scenario.data(ctx) if scenario.data else {})
+    return client.get(url)
+
+
+def measure(scenario, client, ctx, repeat=3):
+    """
+    Run one scenario `repeat` times (after a warm-up request) and return the
+    status code, query count, wall times and peak traced memory
+    """
+    def run(capture_memory=False):
+        if scenario.prepare:
+            scenario.prepare(client, ctx)
+        if capture_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = _request(client, scenario, ctx)
+        elapsed = time.perf_counter() - started
+        peak = None
+        if capture_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return response, len(queries), elapsed, peak
+
+    run()  # warm-up: templates, caches, sessions
+    timings = []
+    for _ in range(max(repeat, 1)):
+        response, query_count, elapsed, _ = run()
+        timings.append(elapsed * 1000)
+    _, _, _, peak = run(capture_memory=True)
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'wall_ms_median': round(statistics.median(timings), 2),
+        'wall_ms_min': round(min(timings), 2),
+        'wall_ms_max': round(max(timings), 2),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_scenarios(repeat=3, scenarios=None):
+    """
+    Benchmark every scenario against the current database
+    """
+    clients, ctx = make_clients()
+    results = {}
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+        for scenario in scenarios or SCENARIOS:
+            results[scenario.name] = measure(scenario, clients[scenario.role], ctx, repeat)
+    return results
@@ -0,0 +1,209 @@
+import time
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from .models import DetailTransaksi, DiskonPelanggan, Notifikasi, Pelanggan, Produk, PAID_STATUSES, birthday_key
+from .notifications import forget_unread
+
+# Notification types that count as "already congratulated today"
+BIRTHDAY_NOTIFICATION_TYPES = ["Selamat Ulang Tahun!", "Diskon Ulang Tahun Permanen", "Diskon Ulang Tahun Instan"]
+
+# P2-A: Loyalitas Permanen (Loyal + Birthday)
+P2A_TIPE_PESAN = "Diskon Ulang Tahun Permanen"
+P2A_ISI_PESAN = "Selamat ulang tahun! Diskon 10% otomatis aktif pada 3 produk terfavorit Anda."
+# P2-B: Loyalitas Instan (Non-Loyal + Birthday)
+P2B_TIPE_PESAN = "Diskon Ulang Tahun Instan"
+P2B_ISI_PESAN = (
+    "Selamat ulang tahun! Raih Diskon 10% untuk SEMUA belanjaan hari ini "
+    "jika total keranjang Anda mencapai Rp 5.000.000."
+)
+CAMPAIGN_URL = '/produk/'
+BIRTHDAY_DISCOUNT_PERCENT = 10
+TOP_PRODUCT_LIMIT = 3
+
+# Keeps IN (...) lists below SQLite's bound parameter limit
+ID_CHUNK_SIZE = 500
+
+
+def birthday_customers(today=None):
+    """
+    Customers whose birthday is today, as an index lookup on ulang_tahun_mmdd
+    """
+    today = today or timezone.localdate()
+    return Pelanggan.objects.filter(ulang_tahun_mmdd=birthday_key(today))
+
+
+def upcoming_birthday_customers(days, today=None):
+    """
+    Customers with a birthday in the next `days` days, today included. Ranges
+    that run past 31 December wrap around to January (index range scans on
+    ulang_tahun_mmdd either way).
+    """
+    today = today or timezone.localdate()
+    if days <= 0:
+        return Pelanggan.objects.none()
+    if days >= 366:
+        return Pelanggan.objects.filter(ulang_tahun_mmdd__isnull=False)
+    start = birthday_key(today)
+    end = birthday_key(today + timedelta(days=days - 1))
+    if start <= end:
+        return Pelanggan.objects.filter(ulang_tahun_mmdd__gte=start, ulang_tahun_mmdd__lte=end)
+    return Pelanggan.objects.filter(Q(ulang_tahun_mmdd__gte=start) | Q(ulang_tahun_mmdd__lte=end))
+
+
+def _day_bounds(today):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(today, datetime.min.time()), tz)
+    return start, start + timedelta(days=1)
+
+
+def pending_birthday_customers(today=None):
+    """
+    Today's birthday customers that have not received a birthday notification
+    today, removed with a single NOT EXISTS anti-join
+    """
+    today = today or timezone.localdate()
+    start, end = _day_bounds(today)
+    already_notified = Notifikasi.objects.filter(
+        pelanggan_id=OuterRef('pk'),
+        tipe_pesan__in=BIRTHDAY_NOTIFICATION_TYPES,
+        created_at__gte=start,
+        created_at__lt=end
+    )
+    return birthday_customers(today).annotate(
+        sudah_dinotifikasi=Exists(already_notified)
+    ).filter(sudah_dinotifikasi=False)
+
+
+def _chunks(items, size=ID_CHUNK_SIZE):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def top_products_by_customer(pelanggan_ids, limit=TOP_PRODUCT_LIMIT):
+    """
+    {pelanggan_id: [(produk_id, nama_produk), ...]} with the `limit` most
+    purchased products of every customer, one grouped query per id chunk
+    """
+    result = {}
+    for chunk in _chunks(list(pelanggan_ids)):
+        rows = DetailTransaksi.objects.filter(
+            transaksi__pelanggan_id__in=chunk,
+            transaksi__status_transaksi__in=PAID_STATUSES
+        ).values('transaksi__pelanggan_id', 'produk_id', 'produk__nama_produk').annotate(
+            total_quantity=Sum('jumlah_produk')
+        ).order_by('transaksi__pelanggan_id', '-total_quantity', 'produk_id')
+        for row in rows:
+            products = result.setdefault(row['transaksi__pelanggan_id'], [])
+            if len(products) < limit:
+                products.append((row['produk_id'], row['produk__nama_produk']))
+    return result
+
+
+def grant_birthday_discounts(pelanggan_ids, end_time):
+    """
+    Activate a 24h birthday discount on the top products of each customer:
+    existing (pelanggan, produk) discounts are refreshed with one UPDATE per
+    chunk, the missing ones are bulk created. Returns the number of discounts.
+    """
+    top_products = top_products_by_customer(pelanggan_ids)
+    pairs = {
+        (pelanggan_id, produk_id): nama_produk
+        for pelanggan_id, products in top_products.items()
+        for produk_id, nama_produk in products
+    }
+    if not pairs:
+        return 0
+
+    existing = set()
+    refresh_ids = []
+    for chunk in _chunks(list(top_products)):
+        for diskon_id, pelanggan_id, produk_id in DiskonPelanggan.objects.filter(
+            pelanggan_id__in=chunk,
+            produk_id__isnull=False
+        ).values_list('id', 'pelanggan_id', 'produk_id'):
+            if (pelanggan_id, produk_id) in pairs:
+                existing.add((pelanggan_id, produk_id))
+                refresh_ids.append(diskon_id)
+
+    nama_produk = Subquery(Produk.objects.filter(pk=OuterRef('produk_id')).values('nama_produk')[:1])
+    for chunk in _chunks(refresh_ids):
+        DiskonPelanggan.objects.filter(id__in=chunk).update(
+            persen_diskon=BIRTHDAY_DISCOUNT_PERCENT,
+            status='aktif',
+            pesan=Concat(Value('Diskon ulang tahun 10% diperbarui untuk produk favorit '), nama_produk),
+            end_time=end_time
+        )
+
+    DiskonPelanggan.objects.bulk_create([
+        DiskonPelanggan(
+            pelanggan_id=pelanggan_id,
+            produk_id=produk_id,
+            persen_diskon=BIRTHDAY_DISCOUNT_PERCENT,
+            status='aktif',
+            pesan=f'Diskon ulang tahun 10% untuk produk favorit {nama}',
+            end_time=end_time
+        )
+        for (pelanggan_id, produk_id), nama in pairs.items()
+        if (pelanggan_id, produk_id) not in existing
+    ], batch_size=1000)
+    return len(pairs)
+
+
+def run_birthday_campaign(today=None, with_discounts=False, batch_size=1000):
+    """
+    Birthday campaign for all of today's birthday customers in a fixed number
+    of statements:
+
+    1. one query for today's customers not yet notified (anti-join), with
+       their stored spending and loyalty flag from the same rows
+    2. bulk_create of the P2-A (loyal) / P2-B (non-loyal) notifications
+    3. optionally, stored 24h discounts on the top 3 products of the loyal
+       customers (see grant_birthday_discounts)
+
+    Returns a dict with the notified customers, counts and per-step timings
+    in seconds.
+    """
+    today = today or timezone.localdate()
+    timings = {}
+
+    started = time.perf_counter()
+    customers = list(
+        pending_birthday_customers(today).values(
+            'id', 'nama_pelanggan', 'email', 'total_belanja', 'pelanggan_loyal'
+        ).order_by('id')
+    )
+    timings['select'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    discount_count = 0
+    with transaction.atomic():
+        Notifikasi.objects.bulk_create([
+            Notifikasi(
+                pelanggan_id=customer['id'],
+                tipe_pesan=P2A_TIPE_PESAN if customer['pelanggan_loyal'] else P2B_TIPE_PESAN,
+                isi_pesan=P2A_ISI_PESAN if customer['pelanggan_loyal'] else P2B_ISI_PESAN,
+                target_url=CAMPAIGN_URL
+            )
+            for customer in customers
+        ], batch_size=batch_size)
+        timings['notifications'] = time.perf_counter() - started
+
+        if with_discounts:
+            started = time.perf_counter()
+            loyal_ids = [customer['id'] for customer in customers if customer['pelanggan_loyal']]
+            discount_count = grant_birthday_discounts(loyal_ids, timezone.now() + timedelta(hours=24))
+            timings['discounts'] = time.perf_counter() - started
+
+    # bulk_create sends no post_save: recount the unread badges of these customers
+    forget_unread([customer['id'] for customer in customers])
+
+    return {
+        'customers': customers,
+        'notified': len(customers),
+        'loyal': sum(1 for customer in customers if customer['pelanggan_loyal']),
+        'discounts': discount_count,
+        'timings': timings,
+    }
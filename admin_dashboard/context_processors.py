@@ -1,32 +1,43 @@
-from django.apps import apps
+def _per_request(request, name, compute):
+    """
+    A callable the template engine calls when the variable is read: nothing is
+    computed for templates that never show it, and at most once per request
+    """
+    def value():
+        values = request.__dict__.setdefault('_notification_cart_context', {})
+        if name not in values:
+            values[name] = compute(request)
+        return values[name]
+    return value
+
+
+def _unseen_notifications_count(request):
+    pelanggan_id = request.session.get('pelanggan_id')
+    if not pelanggan_id:
+        return 0
+
+    # Import here to avoid circular imports
+    from .notifications import unread_count
+
+    # Unseen personal and broadcast notifications, from the cached counter
+    return unread_count(pelanggan_id)
+
+
+def _cart_item_count(request):
+    if 'pelanggan_id' not in request.session:
+        return 0
+
+    # Count cart items (total quantity of unique items)
+    keranjang = request.session.get('keranjang', {})
+    return sum(keranjang.values())
+
 
 def notification_cart_context(request):
     """
     Context processor to provide notification count and cart item count
-    for the current customer
+    for the current customer, computed lazily when a template reads them
     """
-    context = {
-        'unseen_notifications_count': 0,
-        'cart_item_count': 0
+    return {
+        'unseen_notifications_count': _per_request(request, 'unseen_notifications_count', _unseen_notifications_count),
+        'cart_item_count': _per_request(request, 'cart_item_count', _cart_item_count),
     }
-    
-    # Check if customer is logged in
-    if 'pelanggan_id' in request.session:
-        pelanggan_id = request.session['pelanggan_id']
-        
-        # Get Notifikasi model to avoid circular imports
-        Notifikasi = apps.get_model('admin_dashboard', 'Notifikasi')
-        
-        # Count unseen notifications
-        unseen_count = Notifikasi.objects.filter(
-            pelanggan_id=pelanggan_id,
-            is_read=False
-        ).count()
-        context['unseen_notifications_count'] = unseen_count
-        
-        # Count cart items (total quantity of unique items)
-        keranjang = request.session.get('keranjang', {})
-        cart_count = sum(keranjang.values())
-        context['cart_item_count'] = cart_count
-    
-    return context
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Admin dashboard statistics: computed with a handful of conditional
+aggregates, kept in the cache for STATS_TTL seconds and refilled by a single
+request at a time (single flight). Transactions being created or changing
+status invalidate the cached copy (see signals.py).
+"""
+import time
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from . import rollups
+from .models import Pelanggan, Produk, Transaksi, birthday_key
+
+STATS_CACHE_KEY = 'dashboard_admin:stats'
+# Served while a refill is running, so concurrent admins never wait on the DB
+STALE_CACHE_KEY = 'dashboard_admin:stats:stale'
+LOCK_CACHE_KEY = 'dashboard_admin:stats:lock'
+# Sidebar badge of every admin page, cached on its own so it stays one COUNT
+PENDING_CACHE_KEY = 'dashboard_admin:stats:pending'
+STATS_TTL = 60
+STALE_TTL = 60 * 60
+LOCK_TTL = 30
+# How long a request without a stale copy waits for another request's refill
+REFILL_WAIT = 5
+REFILL_POLL = 0.05
+
+
+def _day_bounds(today):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(today, datetime.min.time()), tz)
+    return start, start + timedelta(days=1)
+
+
+def compute_stats(today=None):
+    """
+    Dashboard numbers straight from the database: one conditional aggregate
+    per table, plus the monthly revenue (one TruncMonth group-by) and the best
+    sellers from the sales rollups
+    """
+    today = today or timezone.localdate()
+    start, end = _day_bounds(today)
+    transactions = Transaksi.objects.aggregate(
+        total=Count('id'),
+        new_today=Count('id', filter=Q(tanggal__gte=start, tanggal__lt=end) & ~Q(status_transaksi='SELESAI')),
+        pending=Count('id', filter=Q(status_transaksi='DIPROSES'))
+    )
+    customers = Pelanggan.objects.aggregate(
+        total=Count('id'),
+        new_today=Count('id', filter=Q(created_at__gte=start, created_at__lt=end)),
+        birthday_today=Count('id', filter=Q(ulang_tahun_mmdd=birthday_key(today)))
+    )
+    return {
+        'date': today,
+        'total_products': Produk.objects.count(),
+        'total_customers': customers['total'],
+        'total_transactions': transactions['total'],
+        'total_revenue': rollups.total_revenue(),
+        'monthly_revenue': rollups.monthly_revenue(months=6, today=today),
+        'best_selling_products': rollups.top_products(limit=5),
+        'new_customer_count': customers['new_today'],
+        'birthday_customer_count': customers['birthday_today'],
+        'new_transaction_count': transactions['new_today'],
+        'pending_transaction_count': transactions['pending'],
+    }
+
+
+def dashboard_stats():
+    """
+    Cached dashboard statistics. On a miss only the request that wins the
+    refill lock queries the database; the others get the stale copy, or
+    wait for the refill when there is none.
+    """
+    today = timezone.localdate()
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is not None and stats['date'] == today:
+        return stats
+
+    if cache.add(LOCK_CACHE_KEY, True, LOCK_TTL):
+        try:
+            stats = compute_stats(today)
+            cache.set(STATS_CACHE_KEY, stats, STATS_TTL)
+            cache.set(STALE_CACHE_KEY, stats, STALE_TTL)
+        finally:
+            cache.delete(LOCK_CACHE_KEY)
+        return stats
+
+    stale = cache.get(STALE_CACHE_KEY)
+    if stale is not None and stale['date'] == today:
+        return stale
+    deadline = time.monotonic() + REFILL_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REFILL_POLL)
+        stats = cache.get(STATS_CACHE_KEY)
+        if stats is not None:
+            return stats
+    # The refill did not finish in time; answer from the database ourselves
+    return compute_stats(today)
+
+
+def pending_transaction_count():
+    """
+    Cached number of orders waiting for payment (DIPROSES)
+    """
+    return cache.get_or_set(
+        PENDING_CACHE_KEY,
+        lambda: Transaksi.objects.filter(status_transaksi='DIPROSES').count(),
+        STATS_TTL
+    )
+
+
+def invalidate_dashboard_stats():
+    """
+    Drop the cached statistics; the stale copy stays for concurrent readers
+    """
+    cache.delete_many([STATS_CACHE_KEY, PENDING_CACHE_KEY])
@@ -0,0 +1,72 @@
+from django.db.models import Min, Q
+from django.utils import timezone
+from .models import DiskonPelanggan
+
+
+def active_discounts(now=None):
+    """
+    Discounts that apply right now: status 'aktif' and no end time or one in
+    the future. Expired rows are switched off by the sweeper (expiry.py); the
+    end time check here covers the ones it has not reached yet.
+    """
+    return DiskonPelanggan.objects.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=now or timezone.now()),
+        status='aktif'
+    )
+
+
+class DiscountResolver:
+    """
+    In-memory lookup of active DiskonPelanggan rows.
+
+    The rows are loaded once and indexed by product id, with the first
+    general discount (produk is NULL) used as fallback. This mirrors the old
+    per-product lookups (product-specific `.first()` then general `.first()`)
+    without issuing a query per product.
+    """
+
+    def __init__(self, discounts):
+        self.by_product = {}
+        self.general = None
+        # Rows arrive ordered by pk, so the first row kept per key matches `.first()`
+        for diskon in discounts:
+            if diskon.produk_id is None:
+                if self.general is None:
+                    self.general = diskon
+            elif diskon.produk_id not in self.by_product:
+                self.by_product[diskon.produk_id] = diskon
+
+    @classmethod
+    def for_customer(cls, pelanggan_id):
+        """
+        Load every valid discount of one customer with a single query
+        """
+        if not pelanggan_id:
+            return cls([])
+        discounts = active_discounts().filter(pelanggan_id=pelanggan_id).order_by('pk')
+        return cls(discounts)
+
+    @classmethod
+    def for_public(cls):
+        """
+        Load the first active discount per product (and the first general one)
+        across all customers, for the public catalog
+        """
+        first_ids = active_discounts().values('produk_id').annotate(first_id=Min('id')).values_list('first_id', flat=True)
+        discounts = DiskonPelanggan.objects.filter(id__in=list(first_ids)).order_by('pk')
+        return cls(discounts)
+
+    def resolve(self, produk_id):
+        """
+        Return the discount for a product, falling back to the general discount
+        """
+        return self.by_product.get(produk_id, self.general)
+
+    def annotate(self, produk_list, attr='diskon_aktif'):
+        """
+        Attach the resolved discount to every product in one pass.
+        Evaluating a queryset here also fills its result cache for the template.
+        """
+        for produk in produk_list:
+            setattr(produk, attr, self.resolve(produk.id))
+        return produk_list
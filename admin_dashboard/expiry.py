@@ -0,0 +1,100 @@
+"""
+Expiry sweepers run by the scheduler (see periodic.py): unpaid orders past
+their payment deadline (every minute) and discounts past their end time.
+
+A batch of expired DIPROSES orders is found on transaksi_status_batas_idx
+and cancelled with one conditional UPDATE; their reserved stock is given
+back with one aggregated F() update per product and the customers are told
+with one bulk INSERT. An order paid or cancelled by someone else meanwhile
+is not touched: the UPDATE only matches rows still DIPROSES, and a batch in
+which not every row matched is rolled back and read again. Running it twice
+changes nothing the second time.
+
+Expired discounts are switched to 'tidak_aktif' a batch per UPDATE, which
+keeps the partial index of active discounts small however many birthday
+discounts were ever granted.
+"""
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from .dashboard_stats import invalidate_dashboard_stats
+from .models import DetailTransaksi, DiskonPelanggan, Notifikasi, Transaksi
+from .notifications import forget_unread
+from .stock import release_stock
+
+# Keeps IN (...) lists below SQLite's bound parameter limit
+BATCH_SIZE = 500
+
+EXPIRED_TIPE_PESAN = "Pesanan Dibatalkan"
+EXPIRED_ISI_PESAN = "Pesanan #{id} telah dibatalkan karena melewati batas waktu pembayaran."
+
+
+class _Changed(Exception):
+    """An order of the batch changed status between the SELECT and the UPDATE"""
+
+
+def expired_orders(now=None):
+    """
+    Orders still waiting for payment after their deadline
+    """
+    return Transaksi.objects.filter(status_transaksi='DIPROSES', batas_waktu_bayar__lt=now or timezone.now())
+
+
+def _expire_batch(now, batch_size):
+    with transaction.atomic():
+        orders = list(
+            expired_orders(now).select_for_update().order_by('batas_waktu_bayar', 'pk').values_list('pk', 'pelanggan_id')[:batch_size]
+        )
+        if not orders:
+            return [], 0
+        ids = [pk for pk, _ in orders]
+        if Transaksi.objects.filter(pk__in=ids, status_transaksi='DIPROSES').update(status_transaksi='DIBATALKAN') != len(ids):
+            raise _Changed
+        lines = list(
+            DetailTransaksi.objects.filter(transaksi_id__in=ids).order_by().values('produk_id').annotate(
+                jumlah=Sum('jumlah_produk')
+            ).values_list('produk_id', 'jumlah')
+        )
+        release_stock(lines)
+        Notifikasi.objects.bulk_create([
+            Notifikasi(pelanggan_id=pelanggan_id, tipe_pesan=EXPIRED_TIPE_PESAN, isi_pesan=EXPIRED_ISI_PESAN.format(id=pk))
+            for pk, pelanggan_id in orders
+        ])
+    return orders, len(lines)
+
+
+def expire_unpaid_orders(now=None, batch_size=BATCH_SIZE):
+    """
+    Cancel every expired unpaid order, a batch per transaction. Returns the
+    number of cancelled orders and of products whose stock was given back.
+    """
+    now = now or timezone.now()
+    cancelled = products = 0
+    while True:
+        try:
+            orders, restocked = _expire_batch(now, batch_size)
+        except _Changed:
+            continue
+        if not orders:
+            break
+        cancelled += len(orders)
+        products += restocked
+        # bulk_create sends no post_save: recount the unread badges of these customers
+        forget_unread({pelanggan_id for _, pelanggan_id in orders})
+    if cancelled:
+        invalidate_dashboard_stats()
+    return {'cancelled': cancelled, 'products': products}
+
+
+def expire_discounts(now=None, batch_size=BATCH_SIZE):
+    """
+    Switch active discounts whose end time has passed to 'tidak_aktif'.
+    Returns the number of discounts switched off.
+    """
+    expired = DiskonPelanggan.objects.filter(status='aktif', end_time__lte=now or timezone.now())
+    switched = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return switched
+        switched += DiskonPelanggan.objects.filter(pk__in=ids, status='aktif').update(status='tidak_aktif')
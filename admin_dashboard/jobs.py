@@ -0,0 +1,203 @@
+"""
+Background job queue stored in the database (TugasLatar).
+
+Request code calls `enqueue('name', **kwargs)` inside its own transaction, so
+a job exists exactly when the change that caused it was committed. The job
+then runs after the response: on commit the web process hands it to a small
+thread pool, and the scheduler (every minute, see periodic.py) or
+`manage.py run_jobs` drains whatever is left (retries, jobs of a process
+that stopped). Both claim jobs with a conditional UPDATE,
+so a job runs once at a time; a claimed job is invisible to other workers
+until its visibility timeout passes, after which it is picked up again.
+Failed jobs are retried with exponential backoff up to `maks_percobaan`.
+
+Job functions are registered with `@task('name')` (see tasks.py) and get
+the JSON keyword arguments they were enqueued with (and, with
+`@task('name', bind=True)`, the TugasLatar row first). Every attempt runs in
+one transaction together with the update that marks the job done, so a
+failed attempt leaves nothing behind, and neither does the attempt of a
+worker whose job was taken over after its visibility timeout: its update
+finds the claim token changed and the attempt is rolled back.
+"""
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import TugasLatar
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed job stays invisible to other workers
+VISIBILITY_TIMEOUT = getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 5 * 60)
+# Seconds before the first retry, doubled on every further attempt
+RETRY_DELAY = getattr(settings, 'JOBS_RETRY_DELAY', 30)
+WORKERS = getattr(settings, 'JOBS_WORKERS', 2)
+
+_registry = {}
+
+
+class _TakenOver(Exception):
+    """Another worker claimed the job while this one was running it"""
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='jobs')
+
+
+def task(name, bind=False):
+    """
+    Register a function as the job `name`; with `bind` it gets the job as
+    first argument
+    """
+    def register(func):
+        _registry[name] = (lambda job, **kwargs: func(job, **kwargs)) if bind else (lambda job, **kwargs: func(**kwargs))
+        return func
+    return register
+
+
+def enqueue(name, dedup_key=None, delay=0, max_attempts=3, **kwargs):
+    """
+    Queue the job `name` with JSON keyword arguments. With `dedup_key`, a job
+    already waiting or running under the same key is returned instead of
+    queueing a second one.
+    """
+    if name not in _registry:
+        raise ValueError(f'Tugas tidak dikenal: {name}')
+    try:
+        with transaction.atomic():
+            job = TugasLatar.objects.create(
+                nama=name,
+                argumen=kwargs,
+                kunci_unik=dedup_key,
+                maks_percobaan=max_attempts,
+                jalankan_setelah=timezone.now() + timedelta(seconds=delay)
+            )
+    except IntegrityError:
+        existing = TugasLatar.objects.filter(kunci_unik=dedup_key, status__in=['menunggu', 'berjalan']).first()
+        if existing is None:
+            raise
+        return existing
+    if not delay and getattr(settings, 'JOBS_RUN_IN_PROCESS', True):
+        transaction.on_commit(_kick)
+    return job
+
+
+def _kick():
+    executor.submit(_drain_in_worker)
+
+
+def _drain_in_worker():
+    try:
+        run_pending(threads=1)
+    except Exception:
+        logger.exception('Background jobs failed')
+    finally:
+        # Worker threads get their own connection; do not leave it open
+        connection.close()
+
+
+def claim(limit, now=None, visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    Claim up to `limit` due jobs (waiting, or claimed by a worker whose
+    visibility timeout has passed) and return them
+    """
+    now = now or timezone.now()
+    due = Q(status='menunggu', jalankan_setelah__lte=now) | Q(status='berjalan', terlihat_lagi_pada__lt=now)
+    ids = list(TugasLatar.objects.filter(due).order_by('jalankan_setelah', 'pk').values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    TugasLatar.objects.filter(due, pk__in=ids).update(
+        status='berjalan',
+        token_klaim=token,
+        terlihat_lagi_pada=now + timedelta(seconds=visibility_timeout),
+        percobaan=F('percobaan') + 1
+    )
+    return list(TugasLatar.objects.filter(token_klaim=token, status='berjalan').order_by('pk'))
+
+
+def run_job(job):
+    """
+    Run one claimed job and record the outcome. The update is conditioned on
+    the claim token, so a worker that overran its visibility timeout does not
+    overwrite the state written by the worker that took the job over, and
+    the work of a successful but overrun attempt is rolled back. Returns the
+    new status ('menunggu' for an overrun attempt: the job is not ours).
+    """
+    claimed = TugasLatar.objects.filter(pk=job.pk, token_klaim=job.token_klaim)
+    try:
+        with transaction.atomic():
+            _registry[job.nama](job, **job.argumen)
+            if not claimed.update(status='selesai', token_klaim='', selesai_pada=timezone.now()):
+                raise _TakenOver
+    except _TakenOver:
+        logger.warning('Job %s #%s was taken over by another worker; attempt %s rolled back', job.nama, job.pk, job.percobaan)
+        return 'menunggu'
+    except Exception as e:
+        logger.warning('Job %s #%s failed (attempt %s): %s', job.nama, job.pk, job.percobaan, e)
+        if job.percobaan >= job.maks_percobaan:
+            status = 'gagal'
+            claimed.update(status=status, token_klaim='', error_terakhir=str(e) or e.__class__.__name__)
+        else:
+            status = 'menunggu'
+            claimed.update(
+                status=status,
+                token_klaim='',
+                error_terakhir=str(e) or e.__class__.__name__,
+                jalankan_setelah=timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.percobaan - 1))
+            )
+        return status
+    return 'selesai'
+
+
+def _run_recorded(job):
+    """
+    run_job() that survives a failure to record the outcome (e.g. the
+    database is busy): the job stays claimed and is taken over once its
+    visibility timeout passes
+    """
+    try:
+        return run_job(job)
+    except Exception:
+        logger.exception('Could not record the outcome of job %s #%s', job.nama, job.pk)
+        return 'menunggu'
+
+
+def _run_in_thread(job):
+    try:
+        return _run_recorded(job)
+    finally:
+        connection.close()
+
+
+def run_pending(threads=WORKERS, max_jobs=None, visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    Run due jobs until none are left (or `max_jobs` ran), `threads` at a time;
+    with threads=1 they run in the calling thread. Returns the count per
+    outcome with the elapsed seconds.
+    """
+    totals = {'selesai': 0, 'menunggu': 0, 'gagal': 0}
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='run-jobs') if threads > 1 else None
+    try:
+        while max_jobs is None or sum(totals.values()) < max_jobs:
+            limit = threads if max_jobs is None else min(threads, max_jobs - sum(totals.values()))
+            jobs = claim(limit, visibility_timeout=visibility_timeout)
+            if not jobs:
+                break
+            if pool:
+                futures = [pool.submit(_run_in_thread, job) for job in jobs]
+                wait(futures)
+                outcomes = [future.result() for future in futures]
+            else:
+                outcomes = [_run_recorded(job) for job in jobs]
+            for status in outcomes:
+                totals[status] += 1
+    finally:
+        if pool:
+            pool.shutdown()
+    totals['detik'] = time.perf_counter() - started
+    return totals
@@ -0,0 +1,88 @@
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+from .dashboard_stats import invalidate_dashboard_stats
+from .models import Pelanggan, Transaksi, PAID_STATUSES, LOYALTY_THRESHOLD
+from .rollups import apply_deltas, queryset_deltas
+
+
+def paid_amount(status_transaksi, total):
+    """
+    Amount a transaction contributes to the loyalty ledger
+    """
+    if status_transaksi in PAID_STATUSES and total:
+        return Decimal(str(total))
+    return Decimal('0')
+
+
+def apply_spending_delta(pelanggan_id, delta, pelanggan=None):
+    """
+    Add `delta` to the customer's stored spending total and refresh the loyalty
+    flag in the same UPDATE. When the in-memory `pelanggan` is given it is kept
+    in sync as well.
+    """
+    delta = Decimal(str(delta))
+    if not pelanggan_id or not delta:
+        return
+    Pelanggan.objects.filter(pk=pelanggan_id).update(
+        total_belanja=F('total_belanja') + delta,
+        # The right-hand side sees the old total, so compare against threshold - delta
+        pelanggan_loyal=Case(
+            When(total_belanja__gte=LOYALTY_THRESHOLD - delta, then=Value(True)),
+            default=Value(False)
+        )
+    )
+    if pelanggan is not None:
+        pelanggan.total_belanja = Decimal(str(pelanggan.total_belanja or 0)) + delta
+        pelanggan.pelanggan_loyal = pelanggan.total_belanja >= LOYALTY_THRESHOLD
+
+
+def change_transaction_status(queryset, status_transaksi):
+    """
+    Bulk status change (e.g. admin actions) that keeps the loyalty ledger and
+    the daily sales rollups in sync. Only transactions that enter or leave the
+    paid statuses move money; their totals are summed per customer (and per
+    day for the rollups) so the cost does not grow with the number of rows.
+    """
+    if status_transaksi in PAID_STATUSES:
+        flipping = queryset.exclude(status_transaksi__in=PAID_STATUSES)
+        sign = 1
+    else:
+        flipping = queryset.filter(status_transaksi__in=PAID_STATUSES)
+        sign = -1
+    deltas = list(
+        flipping.order_by().values('pelanggan_id').annotate(jumlah=Sum('total'))
+    )
+    rollup_deltas = queryset_deltas(flipping)
+    updated_count = queryset.update(status_transaksi=status_transaksi)
+    for row in deltas:
+        apply_spending_delta(row['pelanggan_id'], sign * (row['jumlah'] or 0))
+    apply_deltas(rollup_deltas, sign)
+    invalidate_dashboard_stats()
+    return updated_count
+
+
+def rebuild_spending_ledger(pelanggan_ids=None):
+    """
+    Recompute the spending total and loyalty flag from scratch with one
+    set-based UPDATE, for every customer or only `pelanggan_ids`.
+    Returns the number of customers updated.
+    """
+    spending = Coalesce(
+        Subquery(
+            Transaksi.objects.filter(
+                pelanggan_id=OuterRef('pk'),
+                status_transaksi__in=PAID_STATUSES
+            ).order_by().values('pelanggan_id').annotate(jumlah=Sum('total')).values('jumlah')
+        ),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+    pelanggan_qs = Pelanggan.objects.all()
+    if pelanggan_ids is not None:
+        pelanggan_qs = pelanggan_qs.filter(pk__in=pelanggan_ids)
+    return pelanggan_qs.update(
+        total_belanja=spending,
+        pelanggan_loyal=GreaterThanOrEqual(spending, Value(LOYALTY_THRESHOLD))
+    )
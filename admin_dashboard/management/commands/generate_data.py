@@ -0,0 +1,62 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from admin_dashboard.models import Pelanggan, Produk, Transaksi
+from admin_dashboard.synthetic import BATCH_SIZE, DISCOUNT_RATE, seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic production-scale synthetic data (customers, products, orders, discounts) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=100000, help='Number of orders (default: 100000)')
+        parser.add_argument('--customers', type=int, help='Number of customers (default: transactions / 10)')
+        parser.add_argument('--products', type=int, help='Number of products (default: transactions / 200, 20..5000)')
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many days before --until')
+        parser.add_argument(
+            '--discount-rate',
+            type=float,
+            default=DISCOUNT_RATE,
+            help=f'Share of customers holding a discount (default: {DISCOUNT_RATE})'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument(
+            '--until',
+            help='End of the generated timeline as YYYY-MM-DD (default: now); pin it for fully reproducible data'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Rows per bulk insert (default: {BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        for option in ('transactions', 'customers', 'products', 'days', 'batch_size'):
+            if options[option] is not None and options[option] <= 0:
+                raise CommandError(f"--{option.replace('_', '-')} must be positive")
+        if not 0 <= options['discount_rate'] <= 1:
+            raise CommandError('--discount-rate must be between 0 and 1')
+        if Pelanggan.objects.exists() or Produk.objects.exists() or Transaksi.objects.exists():
+            raise CommandError('The database already holds customers, products or orders; run "manage.py flush" first')
+
+        now = None
+        if options['until']:
+            try:
+                until = datetime.strptime(options['until'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--until must be a date in YYYY-MM-DD format')
+            now = timezone.make_aware(until.replace(hour=23, minute=59, second=59))
+
+        started = time.perf_counter()
+        rows = seed_dataset(
+            options['transactions'],
+            customers=options['customers'],
+            products=options['products'],
+            seed=options['seed'],
+            days=options['days'],
+            discount_rate=options['discount_rate'],
+            batch_size=options['batch_size'],
+            now=now,
+            stdout=self.stdout
+        )
+        elapsed = time.perf_counter() - started
+
+        summary = ', '.join(f'{count} {model}' for model, count in rows.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary} in {elapsed:.1f}s'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from admin_dashboard.loyalty import rebuild_spending_ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored total spending and loyalty flag of every customer from their paid transactions'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding loyalty ledger...')
+        updated = rebuild_spending_ledger()
+        self.stdout.write(
+            self.style.SUCCESS(f'Loyalty ledger rebuilt for {updated} customers')
+        )
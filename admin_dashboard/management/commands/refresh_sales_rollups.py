@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from admin_dashboard.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups from the stored watermark (or from scratch) up to today'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the watermark and rebuild every day since the first transaction'
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Number of days rebuilt per transaction (default: 31)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Refreshing daily sales rollups...')
+        days = refresh_rollups(
+            full=options['full'],
+            chunk_days=max(options['chunk_days'], 1),
+            stdout=self.stdout
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Daily sales rollups rebuilt for {days} days')
+        )
@@ -0,0 +1,80 @@
+import json
+import platform
+import time
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from admin_dashboard.benchmarks import SCALES, run_scenarios
+from admin_dashboard.synthetic import seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'Seed throwaway databases at several scales and benchmark the hot views (queries, wall time, peak memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            action='append',
+            choices=sorted(SCALES),
+            help='Dataset size in transactions; repeat for several (default: 1k)'
+        )
+        parser.add_argument(
+            '--transactions',
+            type=int,
+            action='append',
+            help='Custom dataset size in transactions; may be repeated'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Measured requests per view (default: 3)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data')
+        parser.add_argument('--output', default='benchmark_report.json', help='Path of the JSON report')
+
+    def handle(self, *args, **options):
+        sizes = [(label, SCALES[label]) for label in (options['scale'] or [])]
+        sizes += [(str(count), count) for count in (options['transactions'] or [])]
+        if not sizes:
+            sizes = [('1k', SCALES['1k'])]
+        if any(count <= 0 for _, count in sizes):
+            raise CommandError('Transaction counts must be positive')
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'scales': [],
+        }
+
+        setup_test_environment()
+        try:
+            for label, count in sizes:
+                self.stdout.write(f'Scale {label}: seeding {count} transactions...')
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    started = time.perf_counter()
+                    rows = seed_dataset(count, seed=options['seed'])
+                    seed_seconds = time.perf_counter() - started
+                    views = run_scenarios(repeat=options['repeat'])
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+                report['scales'].append({
+                    'label': label,
+                    'transactions': count,
+                    'rows': rows,
+                    'seed_seconds': round(seed_seconds, 2),
+                    'views': views,
+                })
+                for name, result in views.items():
+                    self.stdout.write(
+                        f"  {name:<22} {result['status']}  {result['queries']:>4} queries  "
+                        f"{result['wall_ms_median']:>9.1f} ms  {result['peak_memory_kib']:>9.1f} KiB"
+                    )
+        finally:
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand
+from admin_dashboard.jobs import VISIBILITY_TIMEOUT, WORKERS, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run the due background jobs (retries included) on a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=WORKERS,
+            help=f'Number of worker threads (default: {WORKERS})'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Stop after this many jobs (default: until no job is due)'
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=VISIBILITY_TIMEOUT,
+            help=f'Seconds a claimed job stays hidden from other workers (default: {VISIBILITY_TIMEOUT})'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new jobs'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls with --loop (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = run_pending(
+                threads=max(options['threads'], 1),
+                max_jobs=options['max_jobs'],
+                visibility_timeout=options['visibility_timeout']
+            )
+            if sum(result[status] for status in ('selesai', 'menunggu', 'gagal')) or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Tugas selesai: {result['selesai']}, dijadwalkan ulang: {result['menunggu']}, "
+                        f"gagal: {result['gagal']} - {result['detik']:.2f} detik"
+                    )
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
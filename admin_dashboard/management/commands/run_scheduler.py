@@ -0,0 +1,70 @@
+"""
+One long-running process for all periodic work (birthday campaign, payment
+and discount expiry, sales rollups, old notifications), replacing separate
+cron entries. Several schedulers may run at once: a job runs on one of them
+only (see admin_dashboard/scheduler.py).
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from admin_dashboard.models import JadwalTugas
+from admin_dashboard.scheduler import registered, run_due, worker_id
+
+
+class Command(BaseCommand):
+    help = 'Run the periodic jobs when they are due, with a database lease per job'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due now and exit'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=30,
+            help='Seconds between checks for due jobs (default: 30)'
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='Show the last run and the next run of every job and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.show_status()
+            return
+
+        worker = worker_id()
+        if not options['once']:
+            self.stdout.write(f'Scheduler {worker} started with {len(registered())} jobs')
+        while True:
+            for name, status, milliseconds in run_due(worker):
+                style = self.style.SUCCESS if status == 'berhasil' else self.style.ERROR
+                self.stdout.write(style(f'[{timezone.localtime():%Y-%m-%d %H:%M:%S}] {name}: {status} ({milliseconds:.1f} ms)'))
+            if options['once']:
+                return
+            # A long-running process must not keep a connection the server dropped
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def show_status(self):
+        rows = {row.nama: row for row in JadwalTugas.objects.all()}
+        for job in registered():
+            row = rows.get(job.name)
+            if row is None:
+                self.stdout.write(f'{job.name}: belum pernah dijalankan')
+                continue
+            last = f'{timezone.localtime(row.mulai_terakhir):%Y-%m-%d %H:%M:%S}' if row.mulai_terakhir else '-'
+            duration = f'{row.durasi_terakhir_ms:.1f} ms' if row.durasi_terakhir_ms is not None else '-'
+            line = (
+                f'{job.name}: {row.status_terakhir}, terakhir {last} ({duration}), '
+                f'berikutnya {timezone.localtime(row.jalankan_berikutnya):%Y-%m-%d %H:%M:%S}, '
+                f'berhasil {row.jumlah_berhasil}, gagal {row.jumlah_gagal}'
+            )
+            if row.error_terakhir:
+                line += f' - {row.error_terakhir}'
+            self.stdout.write(line)
@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from admin_dashboard.outbox import BATCH_SIZE, send_pending
+
+
+class Command(BaseCommand):
+    help = 'Send the queued emails of the outbox in batches over one SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Number of emails claimed per batch (default: {BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (default: until the outbox is empty)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll the outbox for new emails'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help='Seconds between polls with --loop (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                result = send_pending(
+                    batch_size=max(options['batch_size'], 1),
+                    max_batches=options['max_batches']
+                )
+            except OSError as e:
+                if not options['loop']:
+                    raise CommandError(f'SMTP server tidak dapat dihubungi: {e}')
+                self.stderr.write(f'SMTP server tidak dapat dihubungi: {e}')
+            else:
+                if sum(result[status] for status in ('terkirim', 'menunggu', 'gagal')) or not options['loop']:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"Email terkirim: {result['terkirim']}, dijadwalkan ulang: {result['menunggu']}, "
+                            f"gagal: {result['gagal']} - {result['detik']:.2f} detik, "
+                            f"{result['per_detik']:.1f} pesan/detik"
+                        )
+                    )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-17 17:51
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+
+
+def fill_loyalty_ledger(apps, schema_editor):
+    Pelanggan = apps.get_model('admin_dashboard', 'Pelanggan')
+    Transaksi = apps.get_model('admin_dashboard', 'Transaksi')
+    spending = Coalesce(
+        Subquery(
+            Transaksi.objects.filter(
+                pelanggan_id=OuterRef('pk'),
+                status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
+            ).order_by().values('pelanggan_id').annotate(jumlah=Sum('total')).values('jumlah')
+        ),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+    Pelanggan.objects.update(
+        total_belanja=spending,
+        pelanggan_loyal=GreaterThanOrEqual(spending, Value(Decimal('5000000')))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0004_transaksi_keterangan_diskon_transaksi_total_diskon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pelanggan',
+            name='pelanggan_loyal',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Pelanggan Loyal'),
+        ),
+        migrations.AddField(
+            model_name='pelanggan',
+            name='total_belanja',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=14, verbose_name='Total Belanja'),
+        ),
+        migrations.RunPython(fill_loyalty_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2 on 2026-10-17 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0005_pelanggan_loyalty_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RekapPenjualanHarian',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField(unique=True, verbose_name='Tanggal')),
+                ('jumlah_transaksi', models.IntegerField(default=0, verbose_name='Jumlah Transaksi')),
+                ('total_pendapatan', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Total Pendapatan')),
+            ],
+            options={
+                'verbose_name_plural': 'Rekap Penjualan Harian',
+                'db_table': 'rekap_penjualan_harian',
+            },
+        ),
+        migrations.CreateModel(
+            name='RekapWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nama', models.CharField(max_length=100, unique=True, verbose_name='Nama')),
+                ('tanggal', models.DateField(blank=True, null=True, verbose_name='Tanggal')),
+                ('diperbarui', models.DateTimeField(auto_now=True, verbose_name='Diperbarui')),
+            ],
+            options={
+                'verbose_name_plural': 'Rekap Watermark',
+                'db_table': 'rekap_watermark',
+            },
+        ),
+        migrations.CreateModel(
+            name='RekapProdukHarian',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField(verbose_name='Tanggal')),
+                ('jumlah_terjual', models.IntegerField(default=0, verbose_name='Jumlah Terjual')),
+                ('total_pendapatan', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Total Pendapatan')),
+                ('produk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='admin_dashboard.produk', verbose_name='Produk')),
+            ],
+            options={
+                'verbose_name_plural': 'Rekap Produk Harian',
+                'db_table': 'rekap_produk_harian',
+            },
+        ),
+        migrations.CreateModel(
+            name='RekapPelangganHarian',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField(verbose_name='Tanggal')),
+                ('jumlah_transaksi', models.IntegerField(default=0, verbose_name='Jumlah Transaksi')),
+                ('total_belanja', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Total Belanja')),
+                ('pelanggan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='admin_dashboard.pelanggan', verbose_name='Pelanggan')),
+            ],
+            options={
+                'verbose_name_plural': 'Rekap Pelanggan Harian',
+                'db_table': 'rekap_pelanggan_harian',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rekapprodukharian',
+            constraint=models.UniqueConstraint(fields=('tanggal', 'produk'), name='rekap_produk_harian_unik'),
+        ),
+        migrations.AddConstraint(
+            model_name='rekappelangganharian',
+            constraint=models.UniqueConstraint(fields=('tanggal', 'pelanggan'), name='rekap_pelanggan_harian_unik'),
+        ),
+    ]
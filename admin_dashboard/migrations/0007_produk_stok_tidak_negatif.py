@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-17 17:57
+
+from django.db import migrations, models
+
+
+def clamp_negative_stock(apps, schema_editor):
+    # Rows oversold before the constraint existed would make it fail to apply
+    Produk = apps.get_model('admin_dashboard', 'Produk')
+    Produk.objects.filter(stok_produk__lt=0).update(stok_produk=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0006_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_negative_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='produk',
+            constraint=models.CheckConstraint(check=models.Q(('stok_produk__gte', 0)), name='produk_stok_tidak_negatif'),
+        ),
+    ]
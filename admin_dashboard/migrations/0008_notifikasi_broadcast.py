@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-17 17:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0007_produk_stok_tidak_negatif'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotifikasiBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipe_pesan', models.CharField(max_length=50, verbose_name='Tipe Pesan')),
+                ('isi_pesan', models.TextField(verbose_name='Isi Pesan')),
+                ('target_url', models.CharField(blank=True, max_length=255, null=True, verbose_name='URL Tujuan')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Waktu Dibuat')),
+            ],
+            options={
+                'verbose_name_plural': 'Notifikasi Broadcast',
+                'db_table': 'notifikasi_broadcast',
+            },
+        ),
+        migrations.AddField(
+            model_name='notifikasi',
+            name='target_url',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='URL Tujuan'),
+        ),
+        migrations.CreateModel(
+            name='NotifikasiBroadcastDibaca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True, verbose_name='Waktu Dibaca')),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dibaca', to='admin_dashboard.notifikasibroadcast', verbose_name='Broadcast')),
+                ('pelanggan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='admin_dashboard.pelanggan', verbose_name='Pelanggan')),
+            ],
+            options={
+                'verbose_name_plural': 'Notifikasi Broadcast Dibaca',
+                'db_table': 'notifikasi_broadcast_dibaca',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notifikasibroadcastdibaca',
+            constraint=models.UniqueConstraint(fields=('pelanggan', 'broadcast'), name='notifikasi_broadcast_dibaca_unik'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 18:03
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractDay, ExtractMonth
+
+
+def fill_ulang_tahun_mmdd(apps, schema_editor):
+    Pelanggan = apps.get_model('admin_dashboard', 'Pelanggan')
+    Pelanggan.objects.filter(tanggal_lahir__isnull=False).update(
+        ulang_tahun_mmdd=ExtractMonth('tanggal_lahir') * 100 + ExtractDay('tanggal_lahir')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0008_notifikasi_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pelanggan',
+            name='ulang_tahun_mmdd',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Ulang Tahun (MMDD)'),
+        ),
+        migrations.RunPython(fill_ulang_tahun_mmdd, migrations.RunPython.noop),
+    ]
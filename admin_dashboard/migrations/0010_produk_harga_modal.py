@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0009_pelanggan_ulang_tahun_mmdd'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produk',
+            name='harga_modal',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Harga Modal'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-17 18:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0010_produk_harga_modal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diskonpelanggan',
+            index=models.Index(fields=['pelanggan', 'produk', 'status'], name='diskon_plg_produk_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diskonpelanggan',
+            index=models.Index(condition=models.Q(('status', 'aktif')), fields=['produk'], name='diskon_aktif_produk_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notifikasi',
+            index=models.Index(fields=['pelanggan', 'is_read', 'created_at'], name='notifikasi_plg_baca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notifikasi',
+            index=models.Index(fields=['pelanggan', 'created_at'], name='notifikasi_plg_waktu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produk',
+            index=models.Index(fields=['kategori', 'id'], name='produk_kategori_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['tanggal'], name='transaksi_tanggal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['status_transaksi', 'tanggal'], name='transaksi_status_tgl_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['pelanggan', 'status_transaksi'], name='transaksi_plg_status_idx'),
+        ),
+        migrations.AlterField(
+            model_name='diskonpelanggan',
+            name='pelanggan',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='admin_dashboard.pelanggan', verbose_name='Pelanggan'),
+        ),
+        migrations.AlterField(
+            model_name='notifikasi',
+            name='pelanggan',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='admin_dashboard.pelanggan', verbose_name='Pelanggan'),
+        ),
+        migrations.AlterField(
+            model_name='produk',
+            name='kategori',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='admin_dashboard.kategori', verbose_name='Kategori'),
+        ),
+        migrations.AlterField(
+            model_name='transaksi',
+            name='pelanggan',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='admin_dashboard.pelanggan', verbose_name='Pelanggan'),
+        ),
+    ]
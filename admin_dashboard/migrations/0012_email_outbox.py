@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 18:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailKeluar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('penerima', models.EmailField(max_length=254, verbose_name='Penerima')),
+                ('subjek', models.CharField(max_length=255, verbose_name='Subjek')),
+                ('isi_teks', models.TextField(verbose_name='Isi Teks')),
+                ('isi_html', models.TextField(blank=True, verbose_name='Isi HTML')),
+                ('status', models.CharField(choices=[('menunggu', 'Menunggu'), ('mengirim', 'Sedang Dikirim'), ('terkirim', 'Terkirim'), ('gagal', 'Gagal')], default='menunggu', max_length=20, verbose_name='Status')),
+                ('percobaan', models.PositiveSmallIntegerField(default=0, verbose_name='Jumlah Percobaan')),
+                ('kirim_setelah', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Kirim Setelah')),
+                ('token_klaim', models.CharField(blank=True, max_length=32, verbose_name='Token Klaim')),
+                ('diklaim_pada', models.DateTimeField(blank=True, null=True, verbose_name='Diklaim Pada')),
+                ('error_terakhir', models.TextField(blank=True, verbose_name='Error Terakhir')),
+                ('dibuat_pada', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat Pada')),
+                ('terkirim_pada', models.DateTimeField(blank=True, null=True, verbose_name='Terkirim Pada')),
+            ],
+            options={
+                'verbose_name_plural': 'Email Keluar',
+                'db_table': 'email_keluar',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='emailkeluar',
+            index=models.Index(fields=['status', 'kirim_setelah'], name='email_keluar_antrian_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailkeluar',
+            index=models.Index(fields=['token_klaim'], name='email_keluar_token_idx'),
+        ),
+    ]
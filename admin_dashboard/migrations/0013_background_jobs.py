@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 18:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0012_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TugasLatar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nama', models.CharField(max_length=100, verbose_name='Nama Tugas')),
+                ('argumen', models.JSONField(blank=True, default=dict, verbose_name='Argumen')),
+                ('status', models.CharField(choices=[('menunggu', 'Menunggu'), ('berjalan', 'Berjalan'), ('selesai', 'Selesai'), ('gagal', 'Gagal')], default='menunggu', max_length=20, verbose_name='Status')),
+                ('percobaan', models.PositiveSmallIntegerField(default=0, verbose_name='Jumlah Percobaan')),
+                ('maks_percobaan', models.PositiveSmallIntegerField(default=3, verbose_name='Maksimal Percobaan')),
+                ('jalankan_setelah', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Jalankan Setelah')),
+                ('kunci_unik', models.CharField(blank=True, max_length=200, null=True, verbose_name='Kunci Unik')),
+                ('token_klaim', models.CharField(blank=True, max_length=32, verbose_name='Token Klaim')),
+                ('terlihat_lagi_pada', models.DateTimeField(blank=True, null=True, verbose_name='Terlihat Lagi Pada')),
+                ('error_terakhir', models.TextField(blank=True, verbose_name='Error Terakhir')),
+                ('dibuat_pada', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat Pada')),
+                ('selesai_pada', models.DateTimeField(blank=True, null=True, verbose_name='Selesai Pada')),
+            ],
+            options={
+                'verbose_name_plural': 'Tugas Latar',
+                'db_table': 'tugas_latar',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tugaslatar',
+            index=models.Index(fields=['status', 'jalankan_setelah'], name='tugas_latar_antrian_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tugaslatar',
+            index=models.Index(fields=['token_klaim'], name='tugas_latar_token_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tugaslatar',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['menunggu', 'berjalan'])), fields=('kunci_unik',), name='tugas_latar_kunci_aktif_unik'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-17 18:54
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0013_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JadwalTugas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nama', models.CharField(max_length=100, unique=True, verbose_name='Nama Tugas')),
+                ('jalankan_berikutnya', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Jalankan Berikutnya')),
+                ('dikunci_oleh', models.CharField(blank=True, max_length=100, verbose_name='Dikunci Oleh')),
+                ('sewa_berakhir', models.DateTimeField(blank=True, null=True, verbose_name='Sewa Berakhir')),
+                ('status_terakhir', models.CharField(choices=[('belum', 'Belum Pernah'), ('berjalan', 'Berjalan'), ('berhasil', 'Berhasil'), ('gagal', 'Gagal')], default='belum', max_length=20, verbose_name='Status Terakhir')),
+                ('mulai_terakhir', models.DateTimeField(blank=True, null=True, verbose_name='Mulai Terakhir')),
+                ('selesai_terakhir', models.DateTimeField(blank=True, null=True, verbose_name='Selesai Terakhir')),
+                ('durasi_terakhir_ms', models.FloatField(blank=True, null=True, verbose_name='Durasi Terakhir (ms)')),
+                ('hasil_terakhir', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Hasil Terakhir')),
+                ('error_terakhir', models.TextField(blank=True, verbose_name='Error Terakhir')),
+                ('jumlah_berhasil', models.PositiveIntegerField(default=0, verbose_name='Jumlah Berhasil')),
+                ('jumlah_gagal', models.PositiveIntegerField(default=0, verbose_name='Jumlah Gagal')),
+            ],
+            options={
+                'verbose_name_plural': 'Jadwal Tugas',
+                'db_table': 'jadwal_tugas',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0014_periodic_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['status_transaksi', 'batas_waktu_bayar'], name='transaksi_status_batas_idx'),
+        ),
+    ]
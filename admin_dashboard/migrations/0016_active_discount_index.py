@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0015_payment_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diskonpelanggan',
+            index=models.Index(condition=models.Q(('status', 'aktif')), fields=['pelanggan', 'produk'], name='diskon_aktif_plg_produk_idx'),
+        ),
+    ]
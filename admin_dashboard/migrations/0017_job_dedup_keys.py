@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0016_active_discount_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailkeluar',
+            name='kunci_unik',
+            field=models.CharField(blank=True, max_length=200, null=True, unique=True, verbose_name='Kunci Unik'),
+        ),
+        migrations.AddField(
+            model_name='notifikasibroadcast',
+            name='kunci_unik',
+            field=models.CharField(blank=True, max_length=200, null=True, unique=True, verbose_name='Kunci Unik'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0017_job_dedup_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pelanggan',
+            name='pelanggan_loyal',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Pelanggan Loyal'),
+        ),
+        migrations.AlterField(
+            model_name='pelanggan',
+            name='total_belanja',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Total Belanja'),
+        ),
+    ]
@@ -1,6 +1,26 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db.models import Sum
+from django.core.serializers.json import DjangoJSONEncoder
+from decimal import Decimal
+from django.utils import timezone
+
+# Status transaksi yang dihitung sebagai belanja yang sudah dibayar
+PAID_STATUSES = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
+
+# Batas total belanja (Rp) untuk status pelanggan loyal
+LOYALTY_THRESHOLD = Decimal('5000000')
+
+# Kolom ledger loyalitas Pelanggan, hanya diubah lewat admin_dashboard.loyalty
+LEDGER_FIELDS = ('total_belanja', 'pelanggan_loyal')
+
+
+def birthday_key(tanggal):
+    """
+    Month and day of a date as one sortable integer (MMDD), e.g. 15 June -> 615
+    """
+    if not tanggal:
+        return None
+    return tanggal.month * 100 + tanggal.day
 
 # Model Admin (menggantikan User bawaan Django untuk admin)
 class Admin(AbstractUser):
@@ -28,6 +48,14 @@ class Pelanggan(models.Model):
     email = models.EmailField(max_length=254, unique=True, null=False, blank=False, default='')
     # Add created_at field to track when customers are created
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Tanggal Dibuat", null=True)
+    # Loyalty ledger: total of paid transactions, maintained incrementally by
+    # admin_dashboard.loyalty (rebuild with `manage.py rebuild_loyalty_ledger`).
+    # Not written by save() of an existing customer unless named in update_fields.
+    total_belanja = models.DecimalField(max_digits=14, decimal_places=2, default=0, db_index=True, editable=False, verbose_name="Total Belanja")
+    pelanggan_loyal = models.BooleanField(default=False, db_index=True, editable=False, verbose_name="Pelanggan Loyal")  # type: ignore
+    # Bulan dan tanggal lahir (MMDD) yang diindeks, diisi otomatis dari tanggal_lahir saat save.
+    # Query ulang tahun memakai kolom ini (lihat admin_dashboard.birthdays).
+    ulang_tahun_mmdd = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name="Ulang Tahun (MMDD)")
 
     class Meta:
         verbose_name_plural = "Pelanggan"
@@ -36,25 +64,33 @@ class Pelanggan(models.Model):
     def __str__(self):
         return str(self.nama_pelanggan)
     
+    def save(self, *args, **kwargs):
+        self.ulang_tahun_mmdd = birthday_key(self.tanggal_lahir)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'tanggal_lahir' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'ulang_tahun_mmdd'}
+        elif update_fields is None and not self._state.adding and not args and not kwargs.get('force_insert'):
+            # Saldo ledger yang dimuat sebelumnya tidak boleh menimpa delta yang masuk sesudahnya
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in LEDGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
+    def is_birthday_on(self, tanggal):
+        """
+        True when the customer's birthday falls on `tanggal`
+        """
+        key = self.ulang_tahun_mmdd if self.ulang_tahun_mmdd is not None else birthday_key(self.tanggal_lahir)
+        return key is not None and key == birthday_key(tanggal)
+    
     @property
     def total_spending(self):
         """
-        Calculate total spending for this customer based on successful transactions
-        This is computed in real-time to ensure data consistency
+        Total spending of this customer on paid transactions (DIBAYAR/DIKIRIM/SELESAI).
+        Read from the stored loyalty ledger instead of aggregating transactions.
         """
-        from django.apps import apps
-        
-        # Get model to avoid circular imports
-        Transaksi = apps.get_model('admin_dashboard', 'Transaksi')
-        
-        successful_transactions = Transaksi.objects.filter(
-            pelanggan=self,
-            status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        )
-        total = successful_transactions.aggregate(
-            total_belanja=Sum('total')
-        )['total_belanja'] or 0
-        return total
+        return self.total_belanja
     
     @property
     def is_loyal(self):
@@ -62,7 +98,7 @@ class Pelanggan(models.Model):
         Determine if customer is loyal based on total spending threshold
         This ensures consistent logic across the application
         """
-        return self.total_spending >= 5000000
+        return self.pelanggan_loyal
 
     @classmethod
     def get_top_purchased_products(cls, pelanggan_id, limit=3):
@@ -80,7 +116,7 @@ class Pelanggan(models.Model):
         # Get successful transactions for this customer
         successful_transactions = Transaksi.objects.filter(
             pelanggan_id=pelanggan_id,
-            status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
+            status_transaksi__in=PAID_STATUSES
         )
         
         # Get top products based on quantity purchased
@@ -116,11 +152,22 @@ class Produk(models.Model):
     foto_produk = models.ImageField(upload_to='produk_images/', verbose_name="Foto Produk")
     stok_produk = models.IntegerField(verbose_name="Stok Produk")
     harga_produk = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Harga Produk")
-    kategori = models.ForeignKey(Kategori, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="Kategori")
+    # Harga pokok per unit; dipakai untuk margin di laporan produk terlaris
+    harga_modal = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name="Harga Modal")
+    # Tanpa indeks sendiri: diawali oleh indeks produk_kategori_id_idx
+    kategori = models.ForeignKey(Kategori, on_delete=models.SET_NULL, blank=True, null=True, db_index=False, verbose_name="Kategori")
 
     class Meta:
         verbose_name_plural = "Produk"
         db_table = 'produk'
+        constraints = [
+            # Stok tidak boleh negatif, juga saat beberapa checkout berjalan bersamaan
+            models.CheckConstraint(check=models.Q(stok_produk__gte=0), name='produk_stok_tidak_negatif'),
+        ]
+        indexes = [
+            # Katalog per kategori, diurutkan / dipaginasi per id
+            models.Index(fields=['kategori', 'id'], name='produk_kategori_id_idx'),
+        ]
 
     def __str__(self):
         return str(self.nama_produk)
@@ -147,7 +194,8 @@ class Transaksi(models.Model):
         verbose_name="Status Transaksi"
     )
     bukti_bayar = models.FileField(upload_to='bukti_pembayaran/', verbose_name="Bukti Pembayaran", null=True, blank=True)
-    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, verbose_name="Pelanggan")
+    # Tanpa indeks sendiri: diawali oleh indeks transaksi_plg_status_idx
+    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, db_index=False, verbose_name="Pelanggan")
     alamat_pengiriman = models.TextField(verbose_name="Alamat Pengiriman", blank=True, null=True)
     # New fields for customer feedback
     feedback = models.TextField(verbose_name="Feedback", null=True, blank=True)
@@ -164,6 +212,16 @@ class Transaksi(models.Model):
     class Meta:
         verbose_name_plural = "Transaksi"
         db_table = 'transaksi'
+        indexes = [
+            # Daftar transaksi terbaru (keyset pada tanggal, id)
+            models.Index(fields=['tanggal'], name='transaksi_tanggal_idx'),
+            # Filter status (daftar admin, laporan, pesanan diproses) dengan rentang / urutan tanggal
+            models.Index(fields=['status_transaksi', 'tanggal'], name='transaksi_status_tgl_idx'),
+            # Pesanan belum dibayar yang melewati batas waktu pembayaran (expiry.py)
+            models.Index(fields=['status_transaksi', 'batas_waktu_bayar'], name='transaksi_status_batas_idx'),
+            # Transaksi lunas per pelanggan (total belanja, produk favorit) dan pesanan pelanggan
+            models.Index(fields=['pelanggan', 'status_transaksi'], name='transaksi_plg_status_idx'),
+        ]
 
     def __str__(self):
         pelanggan_nama = getattr(self.pelanggan, 'nama_pelanggan', 'Pelanggan')
@@ -192,7 +250,8 @@ STATUS_DISKON_CHOICES = [
 
 # Model DiskonPelanggan
 class DiskonPelanggan(models.Model):
-    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, verbose_name="Pelanggan")
+    # Tanpa indeks sendiri: diawali oleh indeks diskon_plg_produk_status_idx
+    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, db_index=False, verbose_name="Pelanggan")
     produk = models.ForeignKey(Produk, on_delete=models.CASCADE, verbose_name="Produk", null=True, blank=True)
     persen_diskon = models.IntegerField(verbose_name="Persen Diskon")
     status = models.CharField(
@@ -208,6 +267,15 @@ class DiskonPelanggan(models.Model):
     class Meta:
         verbose_name_plural = "Diskon Pelanggan"
         db_table = 'diskon_pelanggan'
+        indexes = [
+            # Diskon seorang pelanggan (per produk dan status) saat menghitung harga
+            models.Index(fields=['pelanggan', 'produk', 'status'], name='diskon_plg_produk_status_idx'),
+            # Hanya diskon aktif, per produk, untuk katalog publik
+            models.Index(fields=['produk'], condition=models.Q(status='aktif'), name='diskon_aktif_produk_idx'),
+            # Hanya diskon aktif seorang pelanggan (per produk); diskon kedaluwarsa
+            # dinonaktifkan oleh sweeper sehingga indeks ini tetap kecil
+            models.Index(fields=['pelanggan', 'produk'], condition=models.Q(status='aktif'), name='diskon_aktif_plg_produk_idx'),
+        ]
 
     def __str__(self):
         pelanggan_nama = getattr(self.pelanggan, 'nama_pelanggan', 'Pelanggan')
@@ -221,16 +289,242 @@ class DiskonPelanggan(models.Model):
 
 # Model Notifikasi
 class Notifikasi(models.Model):
-    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, verbose_name="Pelanggan")
+    # Tanpa indeks sendiri: diawali oleh indeks notifikasi_plg_*
+    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, db_index=False, verbose_name="Pelanggan")
     tipe_pesan = models.CharField(max_length=50, verbose_name="Tipe Pesan")
     isi_pesan = models.TextField(verbose_name="Isi Pesan")
     is_read = models.BooleanField(default=False, verbose_name="Sudah Dibaca")  # type: ignore
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Waktu Dibuat")
+    target_url = models.CharField(max_length=255, null=True, blank=True, verbose_name="URL Tujuan")
 
     class Meta:
         verbose_name_plural = "Notifikasi"
         db_table = 'notifikasi'
+        indexes = [
+            # Jumlah dan daftar notifikasi belum dibaca
+            models.Index(fields=['pelanggan', 'is_read', 'created_at'], name='notifikasi_plg_baca_idx'),
+            # Halaman notifikasi pelanggan, terbaru dahulu
+            models.Index(fields=['pelanggan', 'created_at'], name='notifikasi_plg_waktu_idx'),
+        ]
     
     def __str__(self):
         pelanggan_nama = getattr(self.pelanggan, 'nama_pelanggan', 'Pelanggan')
-        return f"Notifikasi untuk {pelanggan_nama}"
\ No newline at end of file
+        return f"Notifikasi untuk {pelanggan_nama}"
+
+# Model NotifikasiBroadcast: satu baris untuk pesan yang ditujukan ke SEMUA pelanggan
+class NotifikasiBroadcast(models.Model):
+    tipe_pesan = models.CharField(max_length=50, verbose_name="Tipe Pesan")
+    isi_pesan = models.TextField(verbose_name="Isi Pesan")
+    target_url = models.CharField(max_length=255, null=True, blank=True, verbose_name="URL Tujuan")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Waktu Dibuat")
+    # Dibuat oleh tugas latar: tugas yang dijalankan ulang tidak menyiarkan pesan yang sama dua kali
+    kunci_unik = models.CharField(max_length=200, null=True, blank=True, unique=True, verbose_name="Kunci Unik")
+
+    class Meta:
+        verbose_name_plural = "Notifikasi Broadcast"
+        db_table = 'notifikasi_broadcast'
+
+    def __str__(self):
+        return f"Broadcast: {self.tipe_pesan}"
+
+# Model NotifikasiBroadcastDibaca: tanda baca per pelanggan untuk NotifikasiBroadcast
+class NotifikasiBroadcastDibaca(models.Model):
+    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, verbose_name="Pelanggan")
+    broadcast = models.ForeignKey(NotifikasiBroadcast, on_delete=models.CASCADE, related_name='dibaca', verbose_name="Broadcast")
+    read_at = models.DateTimeField(auto_now_add=True, verbose_name="Waktu Dibaca")
+
+    class Meta:
+        verbose_name_plural = "Notifikasi Broadcast Dibaca"
+        db_table = 'notifikasi_broadcast_dibaca'
+        constraints = [
+            models.UniqueConstraint(fields=['pelanggan', 'broadcast'], name='notifikasi_broadcast_dibaca_unik'),
+        ]
+
+    def __str__(self):
+        return f"{self.pelanggan_id} membaca {self.broadcast_id}"
+
+# --- Rekap (rollup) penjualan harian ---
+# Diisi secara inkremental oleh admin_dashboard.rollups dari perubahan status
+# Transaksi, dan dibangun ulang oleh `manage.py refresh_sales_rollups`.
+
+# Model RekapPenjualanHarian
+class RekapPenjualanHarian(models.Model):
+    tanggal = models.DateField(unique=True, verbose_name="Tanggal")
+    jumlah_transaksi = models.IntegerField(default=0, verbose_name="Jumlah Transaksi")
+    total_pendapatan = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Total Pendapatan")
+
+    class Meta:
+        verbose_name_plural = "Rekap Penjualan Harian"
+        db_table = 'rekap_penjualan_harian'
+
+    def __str__(self):
+        return f"Rekap {self.tanggal}"
+
+# Model RekapProdukHarian
+class RekapProdukHarian(models.Model):
+    tanggal = models.DateField(verbose_name="Tanggal")
+    produk = models.ForeignKey(Produk, on_delete=models.CASCADE, verbose_name="Produk")
+    jumlah_terjual = models.IntegerField(default=0, verbose_name="Jumlah Terjual")
+    total_pendapatan = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Total Pendapatan")
+
+    class Meta:
+        verbose_name_plural = "Rekap Produk Harian"
+        db_table = 'rekap_produk_harian'
+        constraints = [
+            models.UniqueConstraint(fields=['tanggal', 'produk'], name='rekap_produk_harian_unik'),
+        ]
+
+    def __str__(self):
+        return f"Rekap {self.produk_id} {self.tanggal}"
+
+# Model RekapPelangganHarian
+class RekapPelangganHarian(models.Model):
+    tanggal = models.DateField(verbose_name="Tanggal")
+    pelanggan = models.ForeignKey(Pelanggan, on_delete=models.CASCADE, verbose_name="Pelanggan")
+    jumlah_transaksi = models.IntegerField(default=0, verbose_name="Jumlah Transaksi")
+    total_belanja = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Total Belanja")
+
+    class Meta:
+        verbose_name_plural = "Rekap Pelanggan Harian"
+        db_table = 'rekap_pelanggan_harian'
+        constraints = [
+            models.UniqueConstraint(fields=['tanggal', 'pelanggan'], name='rekap_pelanggan_harian_unik'),
+        ]
+
+    def __str__(self):
+        return f"Rekap {self.pelanggan_id} {self.tanggal}"
+
+# Model RekapWatermark: tanggal terakhir yang sudah dibangun ulang oleh backfill
+class RekapWatermark(models.Model):
+    nama = models.CharField(max_length=100, unique=True, verbose_name="Nama")
+    tanggal = models.DateField(null=True, blank=True, verbose_name="Tanggal")
+    diperbarui = models.DateTimeField(auto_now=True, verbose_name="Diperbarui")
+
+    class Meta:
+        verbose_name_plural = "Rekap Watermark"
+        db_table = 'rekap_watermark'
+
+    def __str__(self):
+        return f"{self.nama}: {self.tanggal}"
+
+# --- Email keluar (outbox) ---
+# Email diantrekan di sini lalu dikirim oleh `manage.py send_outbox` secara
+# bertahap melalui satu koneksi SMTP, dengan percobaan ulang (lihat outbox.py).
+STATUS_EMAIL_CHOICES = [
+    ('menunggu', 'Menunggu'),
+    ('mengirim', 'Sedang Dikirim'),
+    ('terkirim', 'Terkirim'),
+    ('gagal', 'Gagal'),
+]
+
+# Model EmailKeluar
+class EmailKeluar(models.Model):
+    penerima = models.EmailField(verbose_name="Penerima")
+    subjek = models.CharField(max_length=255, verbose_name="Subjek")
+    isi_teks = models.TextField(verbose_name="Isi Teks")
+    isi_html = models.TextField(blank=True, verbose_name="Isi HTML")
+    status = models.CharField(max_length=20, choices=STATUS_EMAIL_CHOICES, default='menunggu', verbose_name="Status")
+    percobaan = models.PositiveSmallIntegerField(default=0, verbose_name="Jumlah Percobaan")
+    kirim_setelah = models.DateTimeField(default=timezone.now, verbose_name="Kirim Setelah")
+    # Penanda worker yang sedang mengirim, dan sejak kapan
+    token_klaim = models.CharField(max_length=32, blank=True, verbose_name="Token Klaim")
+    diklaim_pada = models.DateTimeField(null=True, blank=True, verbose_name="Diklaim Pada")
+    error_terakhir = models.TextField(blank=True, verbose_name="Error Terakhir")
+    dibuat_pada = models.DateTimeField(auto_now_add=True, verbose_name="Dibuat Pada")
+    terkirim_pada = models.DateTimeField(null=True, blank=True, verbose_name="Terkirim Pada")
+    # Diantrekan oleh tugas latar: tugas yang dijalankan ulang tidak mengantrekan email yang sama dua kali
+    kunci_unik = models.CharField(max_length=200, null=True, blank=True, unique=True, verbose_name="Kunci Unik")
+
+    class Meta:
+        verbose_name_plural = "Email Keluar"
+        db_table = 'email_keluar'
+        indexes = [
+            # Antrian worker: email yang menunggu dan sudah waktunya dikirim
+            models.Index(fields=['status', 'kirim_setelah'], name='email_keluar_antrian_idx'),
+            models.Index(fields=['token_klaim'], name='email_keluar_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subjek} untuk {self.penerima} ({self.status})"
+
+# --- Tugas latar (background job queue) ---
+# Efek samping lambat dari request (notifikasi, email) dijalankan setelah
+# response oleh admin_dashboard.jobs, di thread pool proses web atau oleh
+# `manage.py run_jobs`.
+STATUS_TUGAS_CHOICES = [
+    ('menunggu', 'Menunggu'),
+    ('berjalan', 'Berjalan'),
+    ('selesai', 'Selesai'),
+    ('gagal', 'Gagal'),
+]
+
+# Model TugasLatar
+class TugasLatar(models.Model):
+    nama = models.CharField(max_length=100, verbose_name="Nama Tugas")
+    argumen = models.JSONField(default=dict, blank=True, verbose_name="Argumen")
+    status = models.CharField(max_length=20, choices=STATUS_TUGAS_CHOICES, default='menunggu', verbose_name="Status")
+    percobaan = models.PositiveSmallIntegerField(default=0, verbose_name="Jumlah Percobaan")
+    maks_percobaan = models.PositiveSmallIntegerField(default=3, verbose_name="Maksimal Percobaan")
+    jalankan_setelah = models.DateTimeField(default=timezone.now, verbose_name="Jalankan Setelah")
+    # Tugas aktif dengan kunci yang sama hanya diantrekan sekali
+    kunci_unik = models.CharField(max_length=200, null=True, blank=True, verbose_name="Kunci Unik")
+    # Worker yang sedang menjalankan; setelah terlihat_lagi_pada tugas boleh diambil worker lain
+    token_klaim = models.CharField(max_length=32, blank=True, verbose_name="Token Klaim")
+    terlihat_lagi_pada = models.DateTimeField(null=True, blank=True, verbose_name="Terlihat Lagi Pada")
+    error_terakhir = models.TextField(blank=True, verbose_name="Error Terakhir")
+    dibuat_pada = models.DateTimeField(auto_now_add=True, verbose_name="Dibuat Pada")
+    selesai_pada = models.DateTimeField(null=True, blank=True, verbose_name="Selesai Pada")
+
+    class Meta:
+        verbose_name_plural = "Tugas Latar"
+        db_table = 'tugas_latar'
+        indexes = [
+            # Antrian worker: tugas yang menunggu dan sudah waktunya dijalankan
+            models.Index(fields=['status', 'jalankan_setelah'], name='tugas_latar_antrian_idx'),
+            models.Index(fields=['token_klaim'], name='tugas_latar_token_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kunci_unik'],
+                condition=models.Q(status__in=['menunggu', 'berjalan']),
+                name='tugas_latar_kunci_aktif_unik'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nama} ({self.status})"
+
+# --- Jadwal tugas berkala (scheduler) ---
+# Satu baris per tugas berkala yang didaftarkan di admin_dashboard.periodic.
+# `manage.py run_scheduler` mengambil sewa (lease) atas baris ini sebelum
+# menjalankan tugas, sehingga beberapa worker tidak menjalankan tugas yang sama
+# dua kali, lalu mencatat hasil dan durasi run terakhir untuk pemantauan.
+STATUS_JADWAL_CHOICES = [
+    ('belum', 'Belum Pernah'),
+    ('berjalan', 'Berjalan'),
+    ('berhasil', 'Berhasil'),
+    ('gagal', 'Gagal'),
+]
+
+# Model JadwalTugas
+class JadwalTugas(models.Model):
+    nama = models.CharField(max_length=100, unique=True, verbose_name="Nama Tugas")
+    jalankan_berikutnya = models.DateTimeField(default=timezone.now, verbose_name="Jalankan Berikutnya")
+    # Worker pemegang sewa; setelah sewa_berakhir worker lain boleh mengambil alih
+    dikunci_oleh = models.CharField(max_length=100, blank=True, verbose_name="Dikunci Oleh")
+    sewa_berakhir = models.DateTimeField(null=True, blank=True, verbose_name="Sewa Berakhir")
+    status_terakhir = models.CharField(max_length=20, choices=STATUS_JADWAL_CHOICES, default='belum', verbose_name="Status Terakhir")
+    mulai_terakhir = models.DateTimeField(null=True, blank=True, verbose_name="Mulai Terakhir")
+    selesai_terakhir = models.DateTimeField(null=True, blank=True, verbose_name="Selesai Terakhir")
+    durasi_terakhir_ms = models.FloatField(null=True, blank=True, verbose_name="Durasi Terakhir (ms)")
+    hasil_terakhir = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Hasil Terakhir")
+    error_terakhir = models.TextField(blank=True, verbose_name="Error Terakhir")
+    jumlah_berhasil = models.PositiveIntegerField(default=0, verbose_name="Jumlah Berhasil")
+    jumlah_gagal = models.PositiveIntegerField(default=0, verbose_name="Jumlah Gagal")
+
+    class Meta:
+        verbose_name_plural = "Jadwal Tugas"
+        db_table = 'jadwal_tugas'
+
+    def __str__(self):
+        return f"{self.nama} ({self.status_terakhir})"
@@ -0,0 +1,222 @@
+import heapq
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Notifikasi, NotifikasiBroadcast, NotifikasiBroadcastDibaca, Pelanggan
+from .pagination import KeysetPage, decode_cursor, encode_cursor
+
+# Customers without a join date (created before the field existed) see every broadcast
+_EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+# Per-customer unread counters live in the cache under the current broadcast
+# generation: a new broadcast starts a new generation instead of touching
+# every customer's counter
+UNREAD_CACHE_TTL = 10 * 60
+GENERATION_CACHE_KEY = 'notifications:generation'
+
+# Read personal notifications older than this many days are removed by the
+# scheduler (see periodic.py)
+RETENTION_DAYS = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 180)
+DELETE_BATCH_SIZE = 1000
+
+
+def broadcast(tipe_pesan, isi_pesan, target_url=None, dedup_key=None):
+    """
+    Send one message to every customer. Stored as a single row: the cost does
+    not depend on the number of customers. With `dedup_key`, a broadcast
+    already sent under that key is returned instead of sending it again.
+    """
+    fields = {'tipe_pesan': tipe_pesan, 'isi_pesan': isi_pesan, 'target_url': target_url}
+    if dedup_key:
+        notification, created = NotifikasiBroadcast.objects.get_or_create(kunci_unik=dedup_key, defaults=fields)
+        if not created:
+            return notification
+    else:
+        notification = NotifikasiBroadcast.objects.create(**fields)
+    cache.set(GENERATION_CACHE_KEY, time.time_ns(), None)
+    return notification
+
+
+def visible_broadcasts(pelanggan_id):
+    """
+    Broadcasts a customer can see: those sent since the customer registered,
+    annotated with `is_read` from the read receipts
+    """
+    joined = Pelanggan.objects.filter(pk=pelanggan_id).values('created_at')
+    return NotifikasiBroadcast.objects.filter(
+        created_at__gte=Coalesce(Subquery(joined), Value(_EPOCH))
+    ).annotate(
+        is_read=Exists(
+            NotifikasiBroadcastDibaca.objects.filter(pelanggan_id=pelanggan_id, broadcast_id=OuterRef('pk'))
+        )
+    )
+
+
+def _generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        # Lost from the cache: a fresh generation, so no old counter is reused
+        cache.add(GENERATION_CACHE_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_CACHE_KEY)
+    return generation
+
+
+def _unread_key(pelanggan_id, generation=None):
+    return f'notifications:unread:{generation or _generation()}:{pelanggan_id}'
+
+
+def count_unread(pelanggan_id):
+    """
+    Unread personal notifications plus unread broadcasts, from the database
+    """
+    personal = Notifikasi.objects.filter(pelanggan_id=pelanggan_id, is_read=False).count()
+    broadcasts = visible_broadcasts(pelanggan_id).filter(is_read=False).count()
+    return personal + broadcasts
+
+
+def unread_count(pelanggan_id):
+    """
+    Unread personal notifications plus unread broadcasts, from the cached
+    counter when there is one
+    """
+    key = _unread_key(pelanggan_id)
+    count = cache.get(key)
+    if count is None:
+        count = count_unread(pelanggan_id)
+        cache.set(key, count, UNREAD_CACHE_TTL)
+    return count
+
+
+def adjust_unread(pelanggan_id, delta):
+    """
+    Add `delta` to a cached counter; without one the next read counts again
+    """
+    key = _unread_key(pelanggan_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+
+
+def forget_unread(pelanggan_ids):
+    """
+    Drop the cached counters of these customers
+    """
+    generation = _generation()
+    cache.delete_many([_unread_key(pelanggan_id, generation) for pelanggan_id in pelanggan_ids])
+
+
+def notifications_for(pelanggan_id, unread_only=False):
+    """
+    Personal notifications and broadcasts of a customer merged newest first.
+    Broadcast rows carry `is_broadcast = True`.
+    """
+    personal = Notifikasi.objects.filter(pelanggan_id=pelanggan_id)
+    broadcasts = visible_broadcasts(pelanggan_id)
+    if unread_only:
+        personal = personal.filter(is_read=False)
+        broadcasts = broadcasts.filter(is_read=False)
+
+    personal = list(personal.order_by('-created_at'))
+    broadcasts = list(broadcasts.order_by('-created_at'))
+    for notification in personal:
+        notification.is_broadcast = False
+    for notification in broadcasts:
+        notification.is_broadcast = True
+    return list(heapq.merge(personal, broadcasts, key=lambda n: n.created_at, reverse=True))
+
+
+# Rank of each source in the merged order (created_at, rank, id), newest first
+_PERSONAL, _BROADCAST = 0, 1
+
+
+def _after(queryset, rank, position):
+    """
+    Rows of one source that come after `position` = (created_at, rank, id)
+    in the merged newest-first order
+    """
+    created_at, position_rank, pk = position
+    if rank < position_rank:
+        return queryset.filter(created_at__lte=created_at)
+    if rank > position_rank:
+        return queryset.filter(created_at__lt=created_at)
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+
+def notifications_page(pelanggan_id, cursor=None, per_page=20):
+    """
+    One keyset page (newest first, forward only) of the customer's personal
+    notifications and broadcasts merged: each source is read with a keyset
+    WHERE and LIMIT per_page + 1, whatever the page depth
+    """
+    position = None
+    decoded = decode_cursor(cursor)
+    if decoded:
+        try:
+            created_at, rank, pk = decoded[1]
+            position = (datetime.fromisoformat(created_at), int(rank), int(pk))
+        except (ValueError, TypeError):
+            position = None
+
+    sources = []
+    for rank, queryset in (
+        (_PERSONAL, Notifikasi.objects.filter(pelanggan_id=pelanggan_id)),
+        (_BROADCAST, visible_broadcasts(pelanggan_id)),
+    ):
+        if position:
+            queryset = _after(queryset, rank, position)
+        rows = list(queryset.order_by('-created_at', '-pk')[:per_page + 1])
+        for notification in rows:
+            notification.is_broadcast = rank == _BROADCAST
+        sources.append(rows)
+
+    merged = list(heapq.merge(
+        *sources, key=lambda n: (n.created_at, int(n.is_broadcast), n.pk), reverse=True
+    ))
+    has_next = len(merged) > per_page
+    rows = merged[:per_page]
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor([last.created_at, int(last.is_broadcast), last.pk])
+    return KeysetPage(rows, has_next, position is not None, next_cursor=next_cursor)
+
+
+def mark_all_read(pelanggan_id):
+    """
+    Mark every personal notification and visible broadcast as read
+    """
+    Notifikasi.objects.filter(pelanggan_id=pelanggan_id, is_read=False).update(is_read=True)
+    unread_ids = visible_broadcasts(pelanggan_id).filter(is_read=False).values_list('pk', flat=True)
+    NotifikasiBroadcastDibaca.objects.bulk_create(
+        [NotifikasiBroadcastDibaca(pelanggan_id=pelanggan_id, broadcast_id=pk) for pk in unread_ids],
+        ignore_conflicts=True
+    )
+    cache.set(_unread_key(pelanggan_id), 0, UNREAD_CACHE_TTL)
+
+
+def mark_broadcast_read(pelanggan_id, broadcast_id):
+    _, created = NotifikasiBroadcastDibaca.objects.get_or_create(pelanggan_id=pelanggan_id, broadcast_id=broadcast_id)
+    if created:
+        adjust_unread(pelanggan_id, -1)
+
+
+def delete_old_read(days=RETENTION_DAYS, now=None):
+    """
+    Delete read personal notifications older than `days`, a batch per
+    statement so other writers are not blocked for long. Unread
+    notifications and broadcasts are kept. Returns the number deleted.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    old = Notifikasi.objects.filter(is_read=True, created_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(old.values_list('pk', flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += Notifikasi.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,186 @@
+"""
+Email outbox.
+
+Messages are rendered and stored as EmailKeluar rows when they are queued,
+so an admin save never waits on SMTP. The scheduler (every minute, see
+periodic.py) or `manage.py send_outbox` claims due messages in batches and sends them one by one over a single reused SMTP
+connection. Every message gets its own status, written right after its
+send and only while the message is still claimed by the sending worker:
+sent, retried later with an exponential backoff, or failed after
+MAX_ATTEMPTS. A worker that dies mid-batch leaves only its unsent messages
+to be claimed again.
+"""
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+from .models import EmailKeluar
+
+BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+# Seconds before the first retry, doubled on every further attempt
+RETRY_DELAY = getattr(settings, 'OUTBOX_RETRY_DELAY', 60)
+# A claimed message not finished within this many seconds is claimed again
+CLAIM_TIMEOUT = 10 * 60
+INSERT_BATCH_SIZE = 500
+
+
+def render_email(template_name, context, url_target='#'):
+    """
+    (plain text, HTML) of an email template
+    """
+    context = dict(context)
+    if url_target and url_target != '#':
+        context['cta_url'] = url_target
+    html_message = render_to_string(template_name, context)
+    return strip_tags(html_message), html_message
+
+
+def _outgoing(penerima, subject, rendered, kunci_unik=None):
+    isi_teks, isi_html = rendered
+    return EmailKeluar(penerima=penerima, subjek=subject, isi_teks=isi_teks, isi_html=isi_html, kunci_unik=kunci_unik)
+
+
+def enqueue_email(subject, template_name, context, recipient_list, url_target='#'):
+    """
+    Queue one message per recipient, all with the same content.
+    Returns the number of queued messages.
+    """
+    rendered = render_email(template_name, context, url_target)
+    emails = [_outgoing(penerima, subject, rendered) for penerima in recipient_list if penerima]
+    EmailKeluar.objects.bulk_create(emails, batch_size=INSERT_BATCH_SIZE)
+    return len(emails)
+
+
+def enqueue_for_customers(subject, template_name, context, customers, url_target='#', dedup_key=None):
+    """
+    Queue a personalised message (the template gets `customer`) for every
+    customer of the `customers` queryset that has an email address. With
+    `dedup_key`, a customer already queued under that key is skipped.
+    Returns the number of messages rendered for queueing.
+    """
+    customers = customers.exclude(email__isnull=True).exclude(email='').only('id', 'nama_pelanggan', 'email')
+    count = 0
+    emails = []
+    for customer in customers.order_by('pk').iterator(chunk_size=INSERT_BATCH_SIZE):
+        rendered = render_email(template_name, {**context, 'customer': customer}, url_target)
+        kunci_unik = f'{dedup_key}:{customer.pk}' if dedup_key else None
+        emails.append(_outgoing(customer.email, subject, rendered, kunci_unik))
+        if len(emails) == INSERT_BATCH_SIZE:
+            EmailKeluar.objects.bulk_create(emails, ignore_conflicts=bool(dedup_key))
+            count += len(emails)
+            emails = []
+    EmailKeluar.objects.bulk_create(emails, ignore_conflicts=bool(dedup_key))
+    return count + len(emails)
+
+
+def claim_batch(batch_size=BATCH_SIZE, now=None):
+    """
+    Mark up to `batch_size` due messages as being sent by this worker and
+    return them. The conditional UPDATE makes sure two workers never claim
+    the same message.
+    """
+    now = now or timezone.now()
+    due = (
+        Q(status='menunggu', kirim_setelah__lte=now)
+        | Q(status='mengirim', diklaim_pada__lt=now - timedelta(seconds=CLAIM_TIMEOUT))
+    )
+    ids = list(EmailKeluar.objects.filter(due).order_by('kirim_setelah', 'pk').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    EmailKeluar.objects.filter(due, pk__in=ids).update(status='mengirim', token_klaim=token, diklaim_pada=now)
+    return list(EmailKeluar.objects.filter(token_klaim=token, status='mengirim').order_by('pk'))
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subjek,
+        body=email.isi_teks,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.penerima],
+        connection=connection
+    )
+    if email.isi_html:
+        message.attach_alternative(email.isi_html, 'text/html')
+    return message
+
+
+def _record_failure(email, error, now):
+    """
+    Schedule a retry with exponential backoff, or give up after MAX_ATTEMPTS.
+    Nothing is written if another worker has claimed the message since.
+    Returns the new status.
+    """
+    percobaan = email.percobaan + 1
+    fields = {'percobaan': percobaan, 'error_terakhir': str(error) or error.__class__.__name__, 'token_klaim': ''}
+    if percobaan >= MAX_ATTEMPTS:
+        fields['status'] = 'gagal'
+    else:
+        fields['status'] = 'menunggu'
+        fields['kirim_setelah'] = now + timedelta(seconds=RETRY_DELAY * 2 ** (percobaan - 1))
+    EmailKeluar.objects.filter(pk=email.pk, token_klaim=email.token_klaim).update(**fields)
+    return fields['status']
+
+
+def send_batch(emails, connection, now=None):
+    """
+    Send claimed messages over an open connection, one SMTP transaction each,
+    so one bad address does not fail the others. Each message is marked as
+    soon as it is sent, conditioned on its claim token. Returns a count per
+    new status.
+    """
+    now = now or timezone.now()
+    counts = {'terkirim': 0, 'menunggu': 0, 'gagal': 0}
+    for email in emails:
+        try:
+            if not connection.send_messages([_message(email, connection)]):
+                raise RuntimeError('Email tidak terkirim')
+        except Exception as e:
+            counts[_record_failure(email, e, now)] += 1
+            # The server may have dropped the connection: start a new one
+            connection.close()
+            try:
+                connection.open()
+            except Exception:
+                pass
+        else:
+            EmailKeluar.objects.filter(pk=email.pk, token_klaim=email.token_klaim).update(
+                status='terkirim', terkirim_pada=timezone.now(), percobaan=F('percobaan') + 1,
+                token_klaim='', error_terakhir=''
+            )
+            counts['terkirim'] += 1
+    return counts
+
+
+def send_pending(batch_size=BATCH_SIZE, max_batches=None, connection=None):
+    """
+    Send due messages batch by batch over one SMTP connection until the
+    outbox has none left (or `max_batches` were sent). Returns the counts per
+    status with the elapsed time and the throughput in messages per second.
+    """
+    connection = connection or get_connection(fail_silently=False)
+    totals = {'terkirim': 0, 'menunggu': 0, 'gagal': 0}
+    started = time.perf_counter()
+    batches = 0
+    connection.open()
+    try:
+        while max_batches is None or batches < max_batches:
+            emails = claim_batch(batch_size)
+            if not emails:
+                break
+            for status, count in send_batch(emails, connection).items():
+                totals[status] += count
+            batches += 1
+    finally:
+        connection.close()
+    seconds = time.perf_counter() - started
+    processed = sum(totals.values())
+    totals['detik'] = seconds
+    totals['per_detik'] = processed / seconds if processed and seconds else 0
+    return totals
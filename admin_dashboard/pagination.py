@@ -0,0 +1,208 @@
+"""
+Keyset (cursor) pagination for long lists.
+
+Instead of COUNT(*) plus OFFSET, a page is read with a WHERE on the sort key
+of the last row shown, e.g. `(tanggal, id) < (last tanggal, last id)`, so
+every page costs the same however deep it is. The position travels in an
+opaque `cursor` query parameter. A row count is optional: exact, or an
+estimate that is cheap on big tables.
+"""
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+CURSOR_PARAM = 'cursor'
+# Exact counts behind an estimate are reused for this many seconds
+COUNT_CACHE_TTL = 60
+
+
+def encode_cursor(values, direction='next'):
+    payload = [direction, [_dump(value) for value in values]]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (direction, raw values) of a cursor, or None when it is missing or invalid
+    """
+    if not cursor:
+        return None
+    try:
+        direction, values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'previous') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+def _dump(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def keyset_filter(fields, values, descending):
+    """
+    Q selecting the rows that come after `values` in the order of `fields`
+    (each compared descending or ascending as given)
+    """
+    condition = Q()
+    equal = Q()
+    for field, value, desc in zip(fields, values, descending):
+        condition |= equal & Q(**{f'{field}__{"lt" if desc else "gt"}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+class KeysetPage:
+    """
+    One page of a keyset paginated list; iterates like a Paginator page
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None,
+                 count=None, count_is_estimate=False):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_is_estimate = count_is_estimate
+        self.first_url = self.next_url = self.previous_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def set_urls(self, params):
+        """
+        Navigation links keeping the other query parameters (filters)
+        """
+        params = params.copy()
+        params.pop(CURSOR_PARAM, None)
+        params.pop('page', None)
+        self.first_url = '?' + params.urlencode()
+        if self.next_cursor:
+            params[CURSOR_PARAM] = self.next_cursor
+            self.next_url = '?' + params.urlencode()
+        if self.previous_cursor:
+            params[CURSOR_PARAM] = self.previous_cursor
+            self.previous_url = '?' + params.urlencode()
+
+
+class KeysetPaginator:
+    """
+    Paginate `queryset` on `ordering`, a tuple of non-null model fields
+    ending with a unique one, e.g. ('-tanggal', '-id')
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-id',), count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = [name.startswith('-') for name in ordering]
+        self.model_fields = [queryset.model._meta.get_field(name) for name in self.fields]
+        # None: no count, 'exact': COUNT(*), 'estimate': estimated_count()
+        self.count_mode = count
+
+    def _order(self, reverse=False):
+        return [
+            f'{"-" if desc != reverse else ""}{field}'
+            for field, desc in zip(self.fields, self.descending)
+        ]
+
+    def _values(self, obj):
+        return [getattr(obj, field.attname) for field in self.model_fields]
+
+    def _parse(self, raw_values):
+        if len(raw_values) != len(self.model_fields):
+            raise ValueError('cursor does not match the ordering')
+        return [field.to_python(value) for field, value in zip(self.model_fields, raw_values)]
+
+    def page(self, cursor=None):
+        decoded = decode_cursor(cursor)
+        values = None
+        if decoded:
+            try:
+                values = self._parse(decoded[1])
+            except (ValueError, TypeError, ValidationError):
+                values = None
+        direction = decoded[0] if values is not None else 'next'
+
+        queryset = self.queryset
+        if values is not None:
+            descending = self.descending if direction == 'next' else [not desc for desc in self.descending]
+            queryset = queryset.filter(keyset_filter(self.fields, values, descending))
+        rows = list(queryset.order_by(*self._order(reverse=direction == 'previous'))[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'previous':
+            rows.reverse()
+            has_previous, has_next = more, True
+        else:
+            has_previous, has_next = values is not None, more
+
+        next_cursor = encode_cursor(self._values(rows[-1]), 'next') if rows and has_next else None
+        previous_cursor = encode_cursor(self._values(rows[0]), 'previous') if rows and has_previous else None
+
+        count = None
+        if self.count_mode == 'exact':
+            count = self.queryset.count()
+        elif self.count_mode == 'estimate':
+            count = estimated_count(self.queryset)
+        return KeysetPage(
+            rows, has_next, has_previous, next_cursor, previous_cursor,
+            count=count, count_is_estimate=self.count_mode == 'estimate'
+        )
+
+
+def estimated_count(queryset):
+    """
+    Row count that is cheap on big tables: the planner's estimate for an
+    unfiltered PostgreSQL table, otherwise an exact COUNT(*) reused from the
+    cache for COUNT_CACHE_TTL seconds
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    sql, params = queryset.query.sql_with_params()
+    key = 'pagination:count:' + hashlib.sha1(f'{sql}{params}'.encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_TTL)
+
+
+def keyset_page(request, queryset, per_page, ordering=('-id',), count=None):
+    """
+    The page of `queryset` selected by the request's cursor parameter, with
+    navigation URLs that keep the request's other parameters
+    """
+    page = KeysetPaginator(queryset, per_page, ordering, count).page(request.GET.get(CURSOR_PARAM))
+    page.set_urls(request.GET)
+    return page
@@ -0,0 +1,72 @@
+"""
+Periodic jobs run by `manage.py run_scheduler` (see scheduler.py). Each
+returns a small summary that is stored with its last run.
+"""
+from datetime import time, timedelta
+from . import jobs, notifications, outbox, rollups
+from .birthdays import run_birthday_campaign
+from .expiry import expire_discounts, expire_unpaid_orders
+from .scheduler import periodic
+
+
+@periodic('ulang_tahun', at=time(1, 0))
+def birthday_campaign():
+    """
+    Birthday notifications of the day (what `check_birthdays` runs)
+    """
+    result = run_birthday_campaign()
+    return {
+        'notified': result['notified'],
+        'loyal': result['loyal'],
+        'timings_ms': {step: round(seconds * 1000, 1) for step, seconds in result['timings'].items()},
+    }
+
+
+@periodic('pembayaran_kedaluwarsa', every=timedelta(minutes=1))
+def expire_payments():
+    """
+    Cancel orders whose payment deadline has passed and give their stock back
+    """
+    return expire_unpaid_orders()
+
+
+@periodic('email_keluar', every=timedelta(minutes=1))
+def send_outbox():
+    """
+    Send the queued emails that are due (what `send_outbox` runs)
+    """
+    return outbox.send_pending()
+
+
+@periodic('tugas_latar', every=timedelta(minutes=1))
+def run_background_jobs():
+    """
+    Run the background jobs that are due: retries and jobs left behind by
+    a stopped process (what `run_jobs` runs), one at a time in the scheduler
+    thread
+    """
+    return jobs.run_pending(threads=1)
+
+
+@periodic('diskon_kedaluwarsa', every=timedelta(minutes=5))
+def sweep_discounts():
+    """
+    Switch off active discounts whose end time has passed
+    """
+    return {'expired': expire_discounts()}
+
+
+@periodic('rekap_penjualan', every=timedelta(minutes=15))
+def refresh_sales_rollups():
+    """
+    Rebuild the daily sales rollups from the watermark up to today
+    """
+    return {'days': rollups.refresh_rollups()}
+
+
+@periodic('notifikasi_lama', at=time(3, 0))
+def delete_old_notifications():
+    """
+    Remove read personal notifications past the retention period
+    """
+    return {'deleted': notifications.delete_old_read()}
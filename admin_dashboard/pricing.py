@@ -0,0 +1,175 @@
+from decimal import Decimal
+from datetime import date
+from .models import Pelanggan, Produk, LOYALTY_THRESHOLD
+from .discounts import DiscountResolver
+
+BIRTHDAY_DISCOUNT_PERCENT = 10
+
+
+class BirthdayDiscount:
+    """
+    Automatic birthday discount (P2-A/P2-B). It has the same attributes the
+    templates read from a DiskonPelanggan but is never stored.
+    """
+    is_birthday_discount = True
+
+    def __init__(self, pesan, persen_diskon=BIRTHDAY_DISCOUNT_PERCENT):
+        self.persen_diskon = persen_diskon
+        self.pesan = pesan
+
+
+class PricingEngine:
+    """
+    Prices a whole cart for one customer from a single preloaded snapshot of
+    the customer's discounts, loyalty state and cart products.
+
+    Discount hierarchy (see DISCOUNT_LOGIC_ANALYSIS.md):
+    1. Manual discount for the product
+    2. Manual general discount
+    3. Birthday discount: P2-A (loyal, top 3 favorite products) or
+       P2-B (cart total >= Rp 5.000.000, all products)
+
+    Use `for_request` so the cart, checkout and payment code of one request
+    share the same snapshot instead of pricing the cart repeatedly.
+    """
+
+    def __init__(self, pelanggan, today=None):
+        self.pelanggan = pelanggan
+        today = today or date.today()
+        self.is_birthday = pelanggan.is_birthday_on(today)
+        # Loyalty state comes from the stored ledger on Pelanggan
+        self.total_spending = pelanggan.total_spending
+        self.is_loyal = pelanggan.is_loyal
+        self.resolver = DiscountResolver.for_customer(pelanggan.id)
+        self._produk_map = {}
+        self._top_product_ids = None
+
+    @classmethod
+    def for_request(cls, request, pelanggan):
+        """
+        Return the engine cached on the request, creating it on first use
+        """
+        engine = getattr(request, '_pricing_engine', None)
+        if engine is None or engine.pelanggan.pk != pelanggan.pk:
+            engine = cls(pelanggan)
+            request._pricing_engine = engine
+        return engine
+
+    @property
+    def qualifies_for_p2a(self):
+        # P2-A: Loyalitas Permanen (Loyal + Birthday)
+        return self.is_birthday and self.is_loyal
+
+    @property
+    def top_product_ids(self):
+        """
+        Ids of the customer's 3 most purchased products, loaded only for P2-A
+        """
+        if self._top_product_ids is None:
+            if self.qualifies_for_p2a:
+                top_products = Pelanggan.get_top_purchased_products(self.pelanggan.id, limit=3)
+                self._top_product_ids = {p.id for p in top_products}
+            else:
+                self._top_product_ids = set()
+        return self._top_product_ids
+
+    def load_products(self, produk_ids):
+        """
+        Fetch all products not yet in the snapshot with one query
+        """
+        missing = [pk for pk in produk_ids if pk not in self._produk_map]
+        if missing:
+            self._produk_map.update(Produk.objects.in_bulk(missing))
+        return self._produk_map
+
+    def price_cart(self, cart_data):
+        """
+        Price a cart {product_id: quantity}.
+
+        Returns a dictionary with the per-line prices in `produk_di_keranjang`
+        and the cart totals. Items whose product no longer exists are skipped.
+        """
+        cart_items = []
+        for produk_id_str, jumlah in cart_data.items():
+            try:
+                cart_items.append((int(produk_id_str), int(jumlah)))
+            except (TypeError, ValueError):
+                pass  # Skip invalid items
+
+        produk_map = self.load_products([produk_id for produk_id, _ in cart_items])
+        cart_items = [(produk_map[produk_id], jumlah) for produk_id, jumlah in cart_items if produk_id in produk_map]
+
+        # Calculate total cart value before discounts for P2-B check
+        total_cart_value = Decimal('0')
+        for produk, jumlah in cart_items:
+            total_cart_value += Decimal(str(produk.harga_produk)) * jumlah
+
+        # P2-B: Birthday + Cart Total >= 5,000,000 (regardless of loyalty status)
+        qualifies_for_p2b = self.is_birthday and total_cart_value >= LOYALTY_THRESHOLD
+
+        produk_di_keranjang = []
+        total_sebelum_diskon = Decimal('0')
+        total_diskon = Decimal('0')
+        birthday_discount_amount = Decimal('0')
+
+        for produk, jumlah in cart_items:
+            diskon = self.resolver.resolve(produk.id)
+            if diskon is None:
+                if self.qualifies_for_p2a and produk.id in self.top_product_ids:
+                    diskon = BirthdayDiscount('Diskon Ulang Tahun untuk Pelanggan Loyal')
+                elif qualifies_for_p2b:
+                    diskon = BirthdayDiscount('Diskon Ulang Tahun Instan')
+
+            harga_asli = Decimal(str(produk.harga_produk)) * jumlah
+            potongan_harga = Decimal('0')
+            if diskon:
+                # Discounts are rounded down to whole rupiah
+                potongan_harga = Decimal(int(harga_asli * Decimal(str(diskon.persen_diskon)) / 100))
+                if getattr(diskon, 'is_birthday_discount', False):
+                    birthday_discount_amount += potongan_harga
+            harga_setelah_diskon = harga_asli - potongan_harga
+
+            total_sebelum_diskon += harga_asli
+            total_diskon += potongan_harga
+
+            produk_di_keranjang.append({
+                'produk': produk,
+                'jumlah': jumlah,
+                'harga_satuan': produk.harga_produk,
+                'sub_total': harga_setelah_diskon,
+                'harga_asli': harga_asli,
+                'diskon': diskon,
+                'potongan_harga': potongan_harga,
+                'harga_setelah_diskon': harga_setelah_diskon
+            })
+
+        # Determine discount description
+        keterangan_diskon = ""
+        if total_diskon > 0:
+            if birthday_discount_amount > 0:
+                if self.is_loyal:
+                    keterangan_diskon = "Diskon Ulang Tahun Permanen (10%)"
+                else:
+                    keterangan_diskon = "Diskon Ulang Tahun Instan (10%)"
+            else:
+                keterangan_diskon = "Diskon Reguler"
+
+        total_setelah_diskon = total_sebelum_diskon - total_diskon
+        return {
+            'produk_di_keranjang': produk_di_keranjang,
+            'total_sebelum_diskon': total_sebelum_diskon,
+            'total_diskon': total_diskon,
+            'total_setelah_diskon': total_setelah_diskon,
+            'total_belanja': total_setelah_diskon,
+            'keterangan_diskon': keterangan_diskon,
+            'is_birthday': self.is_birthday,
+            'is_loyal': self.is_loyal,
+            'total_spending': self.total_spending,
+            'total_cart_value': total_cart_value,
+            'qualifies_for_p2a': self.qualifies_for_p2a,
+            'qualifies_for_p2b': qualifies_for_p2b,
+            'has_active_birthday_discount': birthday_discount_amount > 0,
+            'qualifies_for_conditional_discount': qualifies_for_p2b and not self.is_loyal,
+            'conditional_discount_amount': max(LOYALTY_THRESHOLD - Decimal(str(self.total_spending)), Decimal('0')),
+            'birthday_discount_amount': birthday_discount_amount
+        }
@@ -0,0 +1,417 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+from .models import (
+    DetailTransaksi, RekapPelangganHarian, RekapPenjualanHarian,
+    RekapProdukHarian, RekapWatermark, Transaksi, PAID_STATUSES
+)
+
+WATERMARK_NAME = 'rekap_penjualan'
+
+
+def rollup_date(tanggal):
+    """
+    Local calendar day a transaction timestamp is booked on
+    """
+    if tanggal is None:
+        return timezone.localdate()
+    if isinstance(tanggal, datetime):
+        return timezone.localdate(tanggal) if timezone.is_aware(tanggal) else tanggal.date()
+    return tanggal
+
+
+def _bump(model, lookup, **deltas):
+    """
+    Add `deltas` to the rollup row identified by `lookup`, creating it if needed.
+    A removal without a row is dropped: the row was either never built or is
+    being deleted together with its product/customer.
+    """
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    if all(value <= 0 for value in deltas.values()):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently by another request
+        model.objects.filter(**lookup).update(**updates)
+
+
+def transaction_lines(transaksi_id):
+    """
+    Quantity and revenue per product of one transaction
+    """
+    return DetailTransaksi.objects.filter(transaksi_id=transaksi_id).order_by().values(
+        'produk_id'
+    ).annotate(jumlah=Sum('jumlah_produk'), pendapatan=Sum('sub_total')).values_list(
+        'produk_id', 'jumlah', 'pendapatan'
+    )
+
+
+def apply_line_delta(tanggal, produk_id, jumlah, pendapatan, sign=1):
+    """
+    Book (sign=1) or remove (sign=-1) one product line on its day
+    """
+    _bump(
+        RekapProdukHarian,
+        {'tanggal': rollup_date(tanggal), 'produk_id': produk_id},
+        jumlah_terjual=sign * (jumlah or 0),
+        total_pendapatan=sign * Decimal(str(pendapatan or 0))
+    )
+
+
+def apply_transaction_delta(tanggal, pelanggan_id, total, sign=1, transaksi_id=None):
+    """
+    Book (sign=1) or remove (sign=-1) a paid transaction on the daily revenue
+    and customer rollups. With `transaksi_id` its product lines move as well.
+    """
+    hari = rollup_date(tanggal)
+    total = sign * Decimal(str(total or 0))
+    _bump(RekapPenjualanHarian, {'tanggal': hari}, jumlah_transaksi=sign, total_pendapatan=total)
+    _bump(
+        RekapPelangganHarian,
+        {'tanggal': hari, 'pelanggan_id': pelanggan_id},
+        jumlah_transaksi=sign,
+        total_belanja=total
+    )
+    if transaksi_id is not None:
+        for produk_id, jumlah, pendapatan in transaction_lines(transaksi_id):
+            apply_line_delta(hari, produk_id, jumlah, pendapatan, sign)
+
+
+def queryset_deltas(transaksi_qs):
+    """
+    Aggregate what a set of transactions contributes to the rollups, grouped
+    per day (and customer / product). Evaluated immediately so it can be
+    collected before a bulk UPDATE changes the rows.
+    """
+    tz = timezone.get_current_timezone()
+    transaksi_qs = transaksi_qs.order_by().annotate(hari=TruncDate('tanggal', tzinfo=tz))
+    lines = DetailTransaksi.objects.filter(
+        transaksi__in=transaksi_qs.values('pk')
+    ).order_by().annotate(hari=TruncDate('transaksi__tanggal', tzinfo=tz))
+    return {
+        'pelanggan': list(transaksi_qs.values('hari', 'pelanggan_id').annotate(
+            jumlah=Count('id'), total=Sum('total')
+        )),
+        'produk': list(lines.values('hari', 'produk_id').annotate(
+            jumlah=Sum('jumlah_produk'), pendapatan=Sum('sub_total')
+        )),
+    }
+
+
+def apply_deltas(deltas, sign=1):
+    """
+    Book (sign=1) or remove (sign=-1) the output of `queryset_deltas`
+    """
+    per_day = {}
+    for row in deltas['pelanggan']:
+        total = Decimal(str(row['total'] or 0))
+        jumlah, pendapatan = per_day.get(row['hari'], (0, Decimal('0')))
+        per_day[row['hari']] = (jumlah + row['jumlah'], pendapatan + total)
+        _bump(
+            RekapPelangganHarian,
+            {'tanggal': row['hari'], 'pelanggan_id': row['pelanggan_id']},
+            jumlah_transaksi=sign * row['jumlah'],
+            total_belanja=sign * total
+        )
+    for hari, (jumlah, pendapatan) in per_day.items():
+        _bump(RekapPenjualanHarian, {'tanggal': hari}, jumlah_transaksi=sign * jumlah, total_pendapatan=sign * pendapatan)
+    for row in deltas['produk']:
+        apply_line_delta(row['hari'], row['produk_id'], row['jumlah'], row['pendapatan'], sign)
+
+
+def rebuild_range(start_date, end_date):
+    """
+    Recompute all rollups for the days start_date..end_date (inclusive) from the
+    raw tables with set-based aggregates. Idempotent.
+    """
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end_dt = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    paid = Transaksi.objects.filter(
+        status_transaksi__in=PAID_STATUSES,
+        tanggal__gte=start_dt,
+        tanggal__lt=end_dt
+    ).order_by().annotate(hari=TruncDate('tanggal', tzinfo=tz))
+    lines = DetailTransaksi.objects.filter(
+        transaksi__status_transaksi__in=PAID_STATUSES,
+        transaksi__tanggal__gte=start_dt,
+        transaksi__tanggal__lt=end_dt
+    ).order_by().annotate(hari=TruncDate('transaksi__tanggal', tzinfo=tz))
+    day_range = {'tanggal__gte': start_date, 'tanggal__lte': end_date}
+
+    with transaction.atomic():
+        RekapPenjualanHarian.objects.filter(**day_range).delete()
+        RekapPelangganHarian.objects.filter(**day_range).delete()
+        RekapProdukHarian.objects.filter(**day_range).delete()
+
+        RekapPenjualanHarian.objects.bulk_create([
+            RekapPenjualanHarian(tanggal=row['hari'], jumlah_transaksi=row['jumlah'], total_pendapatan=row['total'] or 0)
+            for row in paid.values('hari').annotate(jumlah=Count('id'), total=Sum('total'))
+        ], batch_size=1000)
+        RekapPelangganHarian.objects.bulk_create([
+            RekapPelangganHarian(
+                tanggal=row['hari'], pelanggan_id=row['pelanggan_id'],
+                jumlah_transaksi=row['jumlah'], total_belanja=row['total'] or 0
+            )
+            for row in paid.values('hari', 'pelanggan_id').annotate(jumlah=Count('id'), total=Sum('total')).iterator()
+        ], batch_size=1000)
+        RekapProdukHarian.objects.bulk_create([
+            RekapProdukHarian(
+                tanggal=row['hari'], produk_id=row['produk_id'],
+                jumlah_terjual=row['jumlah'] or 0, total_pendapatan=row['pendapatan'] or 0
+            )
+            for row in lines.values('hari', 'produk_id').annotate(
+                jumlah=Sum('jumlah_produk'), pendapatan=Sum('sub_total')
+            ).iterator()
+        ], batch_size=1000)
+
+
+def refresh_rollups(full=False, chunk_days=31, today=None, stdout=None):
+    """
+    Watermark-based backfill: rebuild every day from the stored watermark (or
+    from the first transaction when `full`) up to today in chunks, then move
+    the watermark to today. The watermark day itself is rebuilt again on the
+    next run because it may have been partial.
+    """
+    today = today or timezone.localdate()
+    watermark, _ = RekapWatermark.objects.get_or_create(nama=WATERMARK_NAME)
+
+    start = None if full else watermark.tanggal
+    if start is None:
+        first = Transaksi.objects.order_by('tanggal').values_list('tanggal', flat=True).first()
+        start = rollup_date(first) if first else today
+
+    days = 0
+    while start <= today:
+        end = min(start + timedelta(days=chunk_days - 1), today)
+        rebuild_range(start, end)
+        days += (end - start).days + 1
+        if stdout:
+            stdout.write(f'  Rebuilt {start} .. {end}')
+        start = end + timedelta(days=1)
+
+    watermark.tanggal = today
+    watermark.save()
+    return days
+
+
+# --- Query helpers for dashboard, analytics and reports ---
+
+def month_starts(months, today=None):
+    """
+    First day of each of the last `months` calendar months, oldest first
+    """
+    today = today or timezone.localdate()
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(starts))
+
+
+def monthly_revenue(months=6, today=None):
+    """
+    Revenue per calendar month for the last `months` months (including the
+    current one), with empty months filled with 0
+    """
+    starts = month_starts(months, today)
+    totals = {
+        rollup_date(row['bulan']): row['total']
+        for row in RekapPenjualanHarian.objects.filter(tanggal__gte=starts[0]).annotate(
+            bulan=TruncMonth('tanggal')
+        ).values('bulan').annotate(total=Sum('total_pendapatan')).order_by('bulan')
+    }
+    return [
+        {'month': start.strftime('%B %Y'), 'total': float(totals.get(start) or 0)}
+        for start in starts
+    ]
+
+
+GRANULARITIES = ('day', 'week', 'month')
+METRICS = ('revenue', 'units', 'orders', 'aov')
+
+
+def bucket_start(tanggal, granularity):
+    """
+    First day of the day/week (Monday)/month bucket containing `tanggal`
+    """
+    if granularity == 'week':
+        return tanggal - timedelta(days=tanggal.weekday())
+    if granularity == 'month':
+        return tanggal.replace(day=1)
+    return tanggal
+
+
+def bucket_starts(start_date, end_date, granularity):
+    """
+    Start of every bucket that overlaps start_date..end_date, oldest first
+    """
+    starts = []
+    current = bucket_start(start_date, granularity)
+    while current <= end_date:
+        starts.append(current)
+        if granularity == 'month':
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=7 if granularity == 'week' else 1)
+    return starts
+
+
+def sales_series(start_date, end_date, granularity='day', metric='revenue'):
+    """
+    One value of `metric` per day/week/month bucket in start_date..end_date
+    (inclusive), with empty buckets as 0, grouped in the database over the
+    daily rollups:
+
+    - revenue: paid revenue, orders: paid orders, aov: revenue / orders
+    - units: product units sold
+    """
+    if metric == 'units':
+        rows = RekapProdukHarian.objects.all()
+        values = {'value': Sum('jumlah_terjual')}
+    else:
+        rows = RekapPenjualanHarian.objects.all()
+        values = {'revenue': Sum('total_pendapatan'), 'orders': Sum('jumlah_transaksi')}
+    rows = rows.filter(tanggal__gte=start_date, tanggal__lte=end_date)
+    if granularity == 'week':
+        rows = rows.annotate(bucket=TruncWeek('tanggal'))
+    elif granularity == 'month':
+        rows = rows.annotate(bucket=TruncMonth('tanggal'))
+    else:
+        rows = rows.annotate(bucket=F('tanggal'))
+    totals = {
+        rollup_date(row.pop('bucket')): row
+        for row in rows.values('bucket').annotate(**values).order_by('bucket')
+    }
+
+    series = []
+    for start in bucket_starts(start_date, end_date, granularity):
+        row = totals.get(start, {})
+        if metric == 'units':
+            value = int(row.get('value') or 0)
+        elif metric == 'orders':
+            value = int(row.get('orders') or 0)
+        else:
+            revenue = row.get('revenue') or Decimal('0')
+            if metric == 'aov':
+                orders = row.get('orders') or 0
+                revenue = revenue / orders if orders else Decimal('0')
+            value = float(round(revenue, 2))
+        series.append({'start': start.isoformat(), 'value': value})
+    return series
+
+
+def total_revenue():
+    return RekapPenjualanHarian.objects.aggregate(total=Sum('total_pendapatan'))['total'] or 0
+
+
+def top_products(limit=5, start_date=None, end_date=None):
+    """
+    Best selling products by quantity, ready for Chart.js
+    """
+    rows = RekapProdukHarian.objects.all()
+    if start_date:
+        rows = rows.filter(tanggal__gte=start_date)
+    if end_date:
+        rows = rows.filter(tanggal__lte=end_date)
+    rows = rows.values('produk_id', 'produk__nama_produk').annotate(
+        total_quantity=Sum('jumlah_terjual'),
+        total_revenue=Sum('total_pendapatan')
+    ).filter(total_quantity__gt=0).order_by('-total_quantity')[:limit]
+    return [
+        {
+            'produk__nama_produk': row['produk__nama_produk'],
+            'total_quantity': int(row['total_quantity']),
+            'total_revenue': float(row['total_revenue'] or 0)
+        }
+        for row in rows
+    ]
+
+
+def top_customers(limit=3, start_date=None, end_date=None):
+    """
+    Customers with the highest paid spending, grouped by customer id
+    """
+    rows = RekapPelangganHarian.objects.all()
+    if start_date:
+        rows = rows.filter(tanggal__gte=start_date)
+    if end_date:
+        rows = rows.filter(tanggal__lte=end_date)
+    return rows.values('pelanggan_id', 'pelanggan__nama_pelanggan').annotate(
+        total_spent=Sum('total_belanja')
+    ).filter(total_spent__gt=0).order_by('-total_spent')[:limit]
+
+
+# Sort options of the best products report
+PRODUCT_SALES_SORTS = {
+    'quantity': 'kuantitas',
+    'revenue': 'pendapatan',
+    'margin': 'margin',
+}
+
+
+def _product_rollup(start_date=None, end_date=None):
+    rows = RekapProdukHarian.objects.all()
+    if start_date:
+        rows = rows.filter(tanggal__gte=start_date)
+    if end_date:
+        rows = rows.filter(tanggal__lte=end_date)
+    return rows
+
+
+def product_sales(start_date=None, end_date=None, sort='quantity'):
+    """
+    Quantity sold, revenue and margin per product in the date range, grouped
+    over the product rollup (one row per product id, best first). Margin uses
+    the product's current cost price and is None when that is unknown.
+    """
+    field = PRODUCT_SALES_SORTS.get(sort, PRODUCT_SALES_SORTS['quantity'])
+    return _product_rollup(start_date, end_date).values('produk_id').annotate(
+        kuantitas=Sum('jumlah_terjual'),
+        pendapatan=Sum('total_pendapatan'),
+        margin=Sum(
+            F('total_pendapatan') - F('jumlah_terjual') * F('produk__harga_modal'),
+            output_field=DecimalField(max_digits=16, decimal_places=2)
+        )
+    ).filter(kuantitas__gt=0).order_by(F(field).desc(nulls_last=True), 'produk_id')
+
+
+def product_sales_summary(start_date=None, end_date=None):
+    """
+    Revenue, units and number of products sold in the date range, in one
+    aggregate over the product rollup
+    """
+    summary = _product_rollup(start_date, end_date).aggregate(
+        pendapatan=Sum('total_pendapatan'),
+        kuantitas=Sum('jumlah_terjual'),
+        jumlah_produk=Count('produk', distinct=True, filter=Q(jumlah_terjual__gt=0))
+    )
+    return {
+        'pendapatan': summary['pendapatan'] or Decimal('0'),
+        'kuantitas': summary['kuantitas'] or 0,
+        'jumlah_produk': summary['jumlah_produk'],
+    }
+
+
+def product_sales_for(produk_ids, start_date=None, end_date=None):
+    """
+    {produk_id: (quantity, revenue)} of the given products in the date range
+    """
+    rows = _product_rollup(start_date, end_date).filter(produk_id__in=produk_ids).values('produk_id').annotate(
+        kuantitas=Sum('jumlah_terjual'),
+        pendapatan=Sum('total_pendapatan')
+    )
+    return {
+        row['produk_id']: (row['kuantitas'], row['pendapatan'])
+        for row in rows
+    }
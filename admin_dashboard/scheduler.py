@@ -0,0 +1,147 @@
+"""
+Periodic jobs with database leases.
+
+Jobs are registered with `@periodic('name', every=timedelta(...))` or
+`@periodic('name', at=time(1, 0))` (daily, local time), see periodic.py, and
+run by `manage.py run_scheduler`. Each job has one JadwalTugas row. Before
+running a job a scheduler takes its lease with a conditional UPDATE (the job
+is due and no unexpired lease is held), so any number of schedulers can run
+side by side and every run happens on exactly one of them; the lease of a
+scheduler that died expires after `lease` seconds. After the run the
+scheduler records the status, duration and summary of the job and moves its
+next run forward. A job that has never run is due right away.
+"""
+import logging
+import os
+import socket
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import JadwalTugas
+
+logger = logging.getLogger(__name__)
+
+# Seconds a scheduler holds a job before others may take it over
+LEASE = getattr(settings, 'SCHEDULER_LEASE', 15 * 60)
+# Seconds before a failed job is tried again (sooner than its next regular run)
+RETRY_DELAY = getattr(settings, 'SCHEDULER_RETRY_DELAY', 5 * 60)
+
+PeriodicJob = namedtuple('PeriodicJob', ['name', 'func', 'every', 'at', 'lease'])
+
+_registry = {}
+
+
+def periodic(name, every=None, at=None, lease=LEASE):
+    """
+    Register a function as the periodic job `name`, run every `every`
+    (a timedelta) or daily at `at` (a time, local time zone). The function
+    returns a JSON-serialisable summary that is stored with the run.
+    """
+    if (every is None) == (at is None):
+        raise ValueError('Tentukan salah satu dari every atau at')
+
+    def register(func):
+        _registry[name] = PeriodicJob(name, func, every, at, lease)
+        return func
+    return register
+
+
+def registered():
+    return [_registry[name] for name in sorted(_registry)]
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def next_run(job, after):
+    """
+    First run time of `job` after `after`
+    """
+    if job.every is not None:
+        return after + job.every
+    tz = timezone.get_current_timezone()
+    day = timezone.localtime(after, tz).date()
+    candidate = timezone.make_aware(datetime.combine(day, job.at), tz)
+    if candidate <= after:
+        candidate = timezone.make_aware(datetime.combine(day + timedelta(days=1), job.at), tz)
+    return candidate
+
+
+def _free(now):
+    return Q(sewa_berakhir__isnull=True) | Q(sewa_berakhir__lt=now)
+
+
+def acquire(job, worker, now=None):
+    """
+    Take the lease of `job` if it is due and nobody else holds it
+    """
+    now = now or timezone.now()
+    return JadwalTugas.objects.filter(
+        _free(now), nama=job.name, jalankan_berikutnya__lte=now
+    ).update(
+        dikunci_oleh=worker,
+        sewa_berakhir=now + timedelta(seconds=job.lease),
+        status_terakhir='berjalan',
+        mulai_terakhir=now
+    ) == 1
+
+
+def run_job(job, worker, now=None):
+    """
+    Run a job whose lease `worker` holds and record the outcome. The update
+    is conditioned on the lease, so a scheduler that overran it does not
+    overwrite the run of the scheduler that took over. Returns
+    (status, milliseconds).
+    """
+    now = now or timezone.now()
+    started = time.perf_counter()
+    try:
+        result = job.func()
+    except Exception as e:
+        logger.exception('Periodic job %s failed', job.name)
+        status, error, result = 'gagal', str(e) or e.__class__.__name__, None
+        following = min(next_run(job, now), timezone.now() + timedelta(seconds=RETRY_DELAY))
+        counter = 'jumlah_gagal'
+    else:
+        status, error = 'berhasil', ''
+        following = next_run(job, now)
+        counter = 'jumlah_berhasil'
+    milliseconds = (time.perf_counter() - started) * 1000
+    JadwalTugas.objects.filter(nama=job.name, dikunci_oleh=worker).update(
+        status_terakhir=status,
+        selesai_terakhir=timezone.now(),
+        durasi_terakhir_ms=milliseconds,
+        hasil_terakhir=result,
+        error_terakhir=error,
+        jalankan_berikutnya=following,
+        dikunci_oleh='',
+        sewa_berakhir=None,
+        **{counter: F(counter) + 1}
+    )
+    return status, milliseconds
+
+
+def run_due(worker=None, now=None):
+    """
+    Run every registered job that is due and not leased by another
+    scheduler. Returns a list of (name, status, milliseconds).
+    """
+    worker = worker or worker_id()
+    now = now or timezone.now()
+    # Rows for jobs registered since the last run (due right away)
+    JadwalTugas.objects.bulk_create(
+        [JadwalTugas(nama=job.name, jalankan_berikutnya=now) for job in registered()],
+        ignore_conflicts=True
+    )
+    due = set(JadwalTugas.objects.filter(
+        _free(now), nama__in=list(_registry), jalankan_berikutnya__lte=now
+    ).values_list('nama', flat=True))
+    runs = []
+    for job in registered():
+        if job.name in due and acquire(job, worker, now):
+            runs.append((job.name, *run_job(job, worker)))
+    return runs
@@ -1,8 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_init, post_delete
 from django.dispatch import receiver
 from django.apps import apps
 from django.utils import timezone
-from datetime import date
 
 @receiver(post_save, sender=apps.get_model('admin_dashboard', 'Produk'))
 def notify_new_product(sender, instance, created, **kwargs):
@@ -10,23 +9,12 @@ def notify_new_product(sender, instance, created, **kwargs):
     Notifikasi Produk Baru:
     - Target: post_save pada Model Produk.
     - Kondisi: Dipicu HANYA ketika objek baru dibuat.
-    - Aksi: Buat Notifikasi untuk SEMUA Pelanggan: "Produk baru telah ditambahkan: [Nama Produk]".
+    - Aksi: Buat satu NotifikasiBroadcast untuk SEMUA Pelanggan: "Produk baru telah ditambahkan: [Nama Produk]".
     """
     if created:
-        # Get models to avoid circular imports
-        Pelanggan = apps.get_model('admin_dashboard', 'Pelanggan')
-        Notifikasi = apps.get_model('admin_dashboard', 'Notifikasi')
-        
-        # Get all customers
-        customers = Pelanggan.objects.all()
+        from .notifications import broadcast
         
-        # Create notification for all customers
-        for customer in customers:
-            Notifikasi.objects.create(
-                pelanggan=customer,
-                tipe_pesan="Produk Baru",
-                isi_pesan=f"Produk baru telah ditambahkan: {instance.nama_produk}"
-            )
+        broadcast("Produk Baru", f"Produk baru telah ditambahkan: {instance.nama_produk}")
 
 @receiver(post_save, sender=apps.get_model('admin_dashboard', 'Produk'))
 def notify_stock_update(sender, instance, created, update_fields=None, **kwargs):
@@ -35,7 +23,7 @@ def notify_stock_update(sender, instance, created, update_fields=None, **kwargs)
     - Target: post_save pada Model Produk.
     - Kondisi: Dipicu ketika objek diperbarui (created=False) DAN instance.stok_produk 
       lebih besar dari stok lama.
-    - Aksi: Buat Notifikasi untuk SEMUA Pelanggan: "Stok [Nama Produk] telah ditambahkan kembali!".
+    - Aksi: Buat satu NotifikasiBroadcast untuk SEMUA Pelanggan: "Stok [Nama Produk] telah ditambahkan kembali!".
     """
     # Only for updates, not new creations
     if not created:
@@ -46,20 +34,9 @@ def notify_stock_update(sender, instance, created, update_fields=None, **kwargs)
             
             # Only send notification if stock has actually increased
             if instance.stok_produk > old_stock:
-                # Get models to avoid circular imports
-                Pelanggan = apps.get_model('admin_dashboard', 'Pelanggan')
-                Notifikasi = apps.get_model('admin_dashboard', 'Notifikasi')
-                
-                # Get all customers
-                customers = Pelanggan.objects.all()
+                from .notifications import broadcast
                 
-                # Create notification for all customers
-                for customer in customers:
-                    Notifikasi.objects.create(
-                        pelanggan=customer,
-                        tipe_pesan="Update Stok",
-                        isi_pesan=f"Stok {instance.nama_produk} telah ditambahkan kembali!"
-                    )
+                broadcast("Update Stok", f"Stok {instance.nama_produk} telah ditambahkan kembali!")
         except sender.DoesNotExist:
             # If the instance doesn't exist (somehow), skip notification
             pass
@@ -104,49 +81,249 @@ def notify_completion_status(sender, instance, created, **kwargs):
             isi_pesan=f"Pesanan #{instance.id} telah selesai. Berikan feedback Anda di sini!"
         )
 
+LEDGER_FIELDS = ('pelanggan_id', 'status_transaksi', 'total', 'tanggal')
+ROLLUP_LINE_FIELDS = ('transaksi_id', 'produk_id', 'jumlah_produk', 'sub_total')
+
+@receiver(post_init, sender=apps.get_model('admin_dashboard', 'Transaksi'))
+def remember_ledger_state(sender, instance, **kwargs):
+    """
+    Simpan status, total, pelanggan dan tanggal Transaksi seperti saat dimuat,
+    agar perubahan saat disimpan dapat dibukukan sebagai delta pada loyalty
+    ledger dan rekap penjualan harian.
+    Field yang di-defer dicatat sebagai None (state tidak diketahui).
+    """
+    if all(field in instance.__dict__ for field in LEDGER_FIELDS):
+        instance._ledger_state = tuple(instance.__dict__[field] for field in LEDGER_FIELDS)
+    else:
+        instance._ledger_state = None
+
+@receiver(post_save, sender=apps.get_model('admin_dashboard', 'Transaksi'))
+def update_spending_ledger(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Loyalty Ledger:
+    - Target: post_save pada Model Transaksi.
+    - Kondisi: Transaksi masuk/keluar status lunas (DIBAYAR/DIKIRIM/SELESAI),
+      total berubah, atau pelanggan berubah.
+    - Aksi: Tambahkan selisihnya ke Pelanggan.total_belanja dan perbarui
+      Pelanggan.pelanggan_loyal dengan satu UPDATE.
+    """
+    from .loyalty import apply_spending_delta, paid_amount, rebuild_spending_ledger
+    
+    if update_fields is not None and not {'status_transaksi', 'total', 'pelanggan'} & set(update_fields):
+        return
+    
+    new_amount = paid_amount(instance.status_transaksi, instance.total)
+    pelanggan = instance.pelanggan if sender.pelanggan.is_cached(instance) else None
+    old_state = getattr(instance, '_ledger_state', None)
+    
+    if created:
+        apply_spending_delta(instance.pelanggan_id, new_amount, pelanggan)
+    elif old_state is None:
+        # Previous state unknown (deferred fields): recompute this customer only
+        rebuild_spending_ledger(pelanggan_ids=[instance.pelanggan_id])
+    else:
+        old_pelanggan_id, old_status, old_total, _ = old_state
+        old_amount = paid_amount(old_status, old_total)
+        if old_pelanggan_id == instance.pelanggan_id:
+            apply_spending_delta(instance.pelanggan_id, new_amount - old_amount, pelanggan)
+        else:
+            apply_spending_delta(old_pelanggan_id, -old_amount)
+            apply_spending_delta(instance.pelanggan_id, new_amount, pelanggan)
+
+@receiver(post_save, sender=apps.get_model('admin_dashboard', 'Transaksi'))
+def update_sales_rollups(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Rekap Penjualan Harian:
+    - Target: post_save pada Model Transaksi.
+    - Kondisi: Transaksi masuk/keluar status lunas, atau total, pelanggan atau
+      tanggal Transaksi lunas berubah.
+    - Aksi: Bukukan selisihnya pada rekap harian pendapatan dan pelanggan;
+      baris produk ikut dipindahkan saat status lunas atau tanggal berubah.
+    """
+    from .models import PAID_STATUSES
+    from .rollups import apply_transaction_delta, rebuild_range, rollup_date
+    
+    if update_fields is not None and not {'status_transaksi', 'total', 'pelanggan', 'tanggal'} & set(update_fields):
+        return
+    
+    new_paid = instance.status_transaksi in PAID_STATUSES
+    old_state = getattr(instance, '_ledger_state', None)
+    
+    if created:
+        if new_paid:
+            apply_transaction_delta(instance.tanggal, instance.pelanggan_id, instance.total, 1, instance.pk)
+        return
+    if old_state is None:
+        # Previous state unknown (deferred fields): recompute the day from scratch
+        hari = rollup_date(instance.tanggal)
+        rebuild_range(hari, hari)
+        return
+    
+    old_pelanggan_id, old_status, old_total, old_tanggal = old_state
+    old_paid = old_status in PAID_STATUSES
+    if not old_paid and not new_paid:
+        return
+    day_moved = rollup_date(old_tanggal) != rollup_date(instance.tanggal)
+    if old_paid and new_paid and not day_moved and (
+        old_pelanggan_id == instance.pelanggan_id and old_total == instance.total
+    ):
+        return
+    
+    move_lines = not (old_paid and new_paid) or day_moved
+    if old_paid:
+        apply_transaction_delta(old_tanggal, old_pelanggan_id, old_total, -1, instance.pk if move_lines else None)
+    if new_paid:
+        apply_transaction_delta(instance.tanggal, instance.pelanggan_id, instance.total, 1, instance.pk if move_lines else None)
+
+@receiver(post_save, sender=apps.get_model('admin_dashboard', 'Transaksi'))
+def invalidate_dashboard_stats_on_save(sender, instance, created, **kwargs):
+    """
+    Statistik Dasbor:
+    - Target: post_save pada Model Transaksi.
+    - Kondisi: Transaksi baru, atau status Transaksi berubah (atau tidak diketahui).
+    - Aksi: Hapus statistik dasbor admin dari cache.
+    Harus terdaftar sebelum refresh_ledger_state.
+    """
+    from .dashboard_stats import invalidate_dashboard_stats
+    
+    old_state = getattr(instance, '_ledger_state', None)
+    if created or old_state is None or old_state[1] != instance.status_transaksi:
+        invalidate_dashboard_stats()
+
+@receiver(post_save, sender=apps.get_model('admin_dashboard', 'Transaksi'))
+def refresh_ledger_state(sender, instance, **kwargs):
+    """
+    Perbarui snapshot setelah ledger dan rekap dibukukan, sehingga save
+    berikutnya pada instance yang sama hanya membukukan selisih barunya.
+    Harus terdaftar setelah update_spending_ledger dan update_sales_rollups.
+    """
+    instance._ledger_state = tuple(getattr(instance, field) for field in LEDGER_FIELDS)
+
+@receiver(post_delete, sender=apps.get_model('admin_dashboard', 'Transaksi'))
+def remove_from_spending_ledger(sender, instance, **kwargs):
+    """
+    Loyalty Ledger dan Rekap Penjualan Harian:
+    - Target: post_delete pada Model Transaksi.
+    - Aksi: Kurangi Pelanggan.total_belanja dan rekap harian dengan total
+      Transaksi lunas yang dihapus. Baris produk sudah dikurangi oleh
+      post_delete DetailTransaksi yang dihapus lebih dulu.
+    """
+    from .loyalty import apply_spending_delta, paid_amount
+    from .rollups import apply_transaction_delta
+    
+    state = getattr(instance, '_ledger_state', None) or tuple(getattr(instance, field) for field in LEDGER_FIELDS)
+    pelanggan_id, status_transaksi, total, tanggal = state
+    amount = paid_amount(status_transaksi, total)
+    apply_spending_delta(pelanggan_id, -amount)
+    if amount:
+        apply_transaction_delta(tanggal, pelanggan_id, total, -1)
+
+def _paid_transaction_date(transaksi_id):
+    """
+    Tanggal Transaksi bila berstatus lunas, selain itu None
+    """
+    from .models import PAID_STATUSES
+    Transaksi = apps.get_model('admin_dashboard', 'Transaksi')
+    
+    return Transaksi.objects.filter(
+        pk=transaksi_id,
+        status_transaksi__in=PAID_STATUSES
+    ).values_list('tanggal', flat=True).first()
+
+@receiver(post_delete, sender=apps.get_model('admin_dashboard', 'Transaksi'))
+def invalidate_dashboard_stats_on_delete(sender, instance, **kwargs):
+    """
+    Statistik Dasbor: Transaksi yang dihapus mengubah jumlah dan pendapatan.
+    """
+    from .dashboard_stats import invalidate_dashboard_stats
+    
+    invalidate_dashboard_stats()
+
+@receiver(post_init, sender=apps.get_model('admin_dashboard', 'DetailTransaksi'))
+def remember_rollup_line_state(sender, instance, **kwargs):
+    """
+    Simpan transaksi, produk, jumlah dan sub total DetailTransaksi seperti saat
+    dimuat untuk rekap produk harian.
+    """
+    if all(field in instance.__dict__ for field in ROLLUP_LINE_FIELDS):
+        instance._rollup_state = tuple(instance.__dict__[field] for field in ROLLUP_LINE_FIELDS)
+    else:
+        instance._rollup_state = None
+
+@receiver(post_save, sender=apps.get_model('admin_dashboard', 'DetailTransaksi'))
+def update_product_rollup(sender, instance, created, **kwargs):
+    """
+    Rekap Produk Harian:
+    - Target: post_save pada Model DetailTransaksi.
+    - Kondisi: Baris milik Transaksi lunas ditambah atau diubah.
+    - Aksi: Kurangi nilai lama dan tambahkan nilai baru pada rekap produk harian.
+    """
+    from .rollups import apply_line_delta, rebuild_range, rollup_date
+    
+    old_state = getattr(instance, '_rollup_state', None)
+    if not created and old_state is None:
+        tanggal = _paid_transaction_date(instance.transaksi_id)
+        if tanggal:
+            hari = rollup_date(tanggal)
+            rebuild_range(hari, hari)
+    else:
+        if not created:
+            old_transaksi_id, old_produk_id, old_jumlah, old_sub_total = old_state
+            old_tanggal = _paid_transaction_date(old_transaksi_id)
+            if old_tanggal:
+                apply_line_delta(old_tanggal, old_produk_id, old_jumlah, old_sub_total, -1)
+        tanggal = _paid_transaction_date(instance.transaksi_id)
+        if tanggal:
+            apply_line_delta(tanggal, instance.produk_id, instance.jumlah_produk, instance.sub_total)
+    
+    instance._rollup_state = tuple(getattr(instance, field) for field in ROLLUP_LINE_FIELDS)
+
+@receiver(post_delete, sender=apps.get_model('admin_dashboard', 'DetailTransaksi'))
+def remove_from_product_rollup(sender, instance, **kwargs):
+    """
+    Rekap Produk Harian:
+    - Target: post_delete pada Model DetailTransaksi.
+    - Aksi: Kurangi rekap produk harian bila Transaksi-nya lunas.
+    """
+    from .rollups import apply_line_delta
+    
+    state = getattr(instance, '_rollup_state', None) or tuple(getattr(instance, field) for field in ROLLUP_LINE_FIELDS)
+    transaksi_id, produk_id, jumlah_produk, sub_total = state
+    tanggal = _paid_transaction_date(transaksi_id)
+    if tanggal:
+        apply_line_delta(tanggal, produk_id, jumlah_produk, sub_total, -1)
+
+@receiver(post_save, sender=apps.get_model('admin_dashboard', 'Notifikasi'))
+def update_unread_counter(sender, instance, created, **kwargs):
+    """
+    Penghitung Notifikasi Belum Dibaca:
+    - Target: post_save pada Model Notifikasi.
+    - Aksi: Notifikasi baru yang belum dibaca menambah penghitung pelanggan di
+      cache; perubahan lain (mis. ditandai dibaca) membuangnya agar dihitung ulang.
+    """
+    from .notifications import adjust_unread, forget_unread
+    
+    if created:
+        if not instance.is_read:
+            adjust_unread(instance.pelanggan_id, 1)
+    else:
+        forget_unread([instance.pelanggan_id])
+
+@receiver(post_delete, sender=apps.get_model('admin_dashboard', 'Notifikasi'))
+def forget_unread_counter(sender, instance, **kwargs):
+    """
+    Penghitung Notifikasi Belum Dibaca: dihitung ulang setelah notifikasi dihapus.
+    """
+    from .notifications import forget_unread
+    
+    forget_unread([instance.pelanggan_id])
+
 # Check for birthday notifications daily (this would typically be run by a cron job or management command)
 def check_birthday_notifications():
     """
-    Check for customers with birthdays today and send appropriate notifications
+    Check for customers with birthdays today and send appropriate notifications.
+    Delegates to the set-based birthday campaign (admin_dashboard.birthdays).
     """
-    # Get models to avoid circular imports
-    Pelanggan = apps.get_model('admin_dashboard', 'Pelanggan')
-    Transaksi = apps.get_model('admin_dashboard', 'Transaksi')
-    Notifikasi = apps.get_model('admin_dashboard', 'Notifikasi')
-    
-    # Get all customers with birthdays today
-    today = date.today()
-    birthday_customers = Pelanggan.objects.filter(
-        tanggal_lahir__month=today.month,
-        tanggal_lahir__day=today.day
-    )
-    
-    for customer in birthday_customers:
-        # Check if customer has already received a birthday notification today
-        existing_notification = Notifikasi.objects.filter(
-            pelanggan=customer,
-            tipe_pesan__in=["Selamat Ulang Tahun!", "Diskon Ulang Tahun Permanen", "Diskon Ulang Tahun Instan"],
-            created_at__date=today
-        ).first()
-        
-        # If no birthday notification sent today, create one
-        if not existing_notification:
-            # Use the refactored property method to check loyalty status
-            # This ensures consistent logic across the application
-            is_loyal = customer.is_loyal
-            
-            # Send appropriate notification based on loyalty status
-            if is_loyal:
-                # P2-A: Loyalitas Permanen (Loyal + Birthday)
-                Notifikasi.objects.create(
-                    pelanggan=customer,
-                    tipe_pesan="Diskon Ulang Tahun Permanen",
-                    isi_pesan="Selamat ulang tahun! Diskon 10% otomatis aktif pada 3 produk terfavorit Anda."
-                )
-            else:
-                # P2-B: Loyalitas Instan (Non-Loyal + Birthday)
-                Notifikasi.objects.create(
-                    pelanggan=customer,
-                    tipe_pesan="Diskon Ulang Tahun Instan",
-                    isi_pesan="Selamat ulang tahun! Raih Diskon 10% untuk SEMUA belanjaan hari ini jika total keranjang Anda mencapai Rp 5.000.000."
-                )
\ No newline at end of file
+    from .birthdays import run_birthday_campaign
+    
+    return run_birthday_campaign()
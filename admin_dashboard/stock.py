@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from django.db import transaction
+from django.db.models import F
+from .models import Produk
+
+
+class InsufficientStock(ValueError):
+    """
+    Raised when a reservation would take a product's stock below zero.
+    The message is ready to be shown to the customer.
+    """
+
+    def __init__(self, produk_id, nama_produk, stok_produk):
+        self.produk_id = produk_id
+        self.stok_produk = stok_produk
+        super().__init__(f'Stok produk {nama_produk} tidak mencukupi. Hanya tersisa {stok_produk}.')
+
+
+def _quantities(lines):
+    """
+    Sum (produk or produk_id, jumlah) pairs per product id, in ascending id
+    order so concurrent reservations always lock rows in the same order
+    """
+    totals = {}
+    for produk, jumlah in lines:
+        produk_id = getattr(produk, 'pk', produk)
+        totals[produk_id] = totals.get(produk_id, 0) + int(jumlah)
+    return OrderedDict(sorted(totals.items()))
+
+
+def reserve_stock(lines):
+    """
+    Take stock for every (produk, jumlah) line, all or nothing.
+
+    Each product is decremented with a conditional UPDATE
+    (`stok_produk >= jumlah`), so two checkouts racing for the last units
+    cannot both succeed: the second UPDATE matches no row and
+    InsufficientStock is raised, rolling back every line already reserved.
+    """
+    with transaction.atomic():
+        for produk_id, jumlah in _quantities(lines).items():
+            updated = Produk.objects.filter(pk=produk_id, stok_produk__gte=jumlah).update(
+                stok_produk=F('stok_produk') - jumlah
+            )
+            if not updated:
+                produk = Produk.objects.filter(pk=produk_id).values('nama_produk', 'stok_produk').first()
+                if produk is None:
+                    raise InsufficientStock(produk_id, f'#{produk_id}', 0)
+                raise InsufficientStock(produk_id, produk['nama_produk'], produk['stok_produk'])
+
+
+def release_stock(lines):
+    """
+    Give the stock of every (produk, jumlah) line back, e.g. for a cancelled order
+    """
+    with transaction.atomic():
+        for produk_id, jumlah in _quantities(lines).items():
+            Produk.objects.filter(pk=produk_id).update(stok_produk=F('stok_produk') + jumlah)
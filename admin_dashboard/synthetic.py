@@ -0,0 +1,284 @@
+"""
+Deterministic synthetic data at production scale, for benchmarks and load
+tests. Everything is drawn from one seeded random generator, so the same
+parameters (and `now`) always produce the same rows.
+"""
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from django.db import transaction
+from django.utils import timezone
+from .loyalty import rebuild_spending_ledger
+from .models import (
+    DetailTransaksi, DiskonPelanggan, Kategori, Pelanggan, Produk, Transaksi,
+    birthday_key
+)
+from .rollups import refresh_rollups
+
+BATCH_SIZE = 5000
+KATEGORI_NAMES = ['Tiang Teras Jadi', 'Roster Minimalis', 'Cincin Tiang Teras', 'Paving Block']
+PRICES = [35000, 250000, 300000, 450000, 1000000]
+
+# Share of orders per status; unpaid orders are only left open near `now`
+STATUS_MIX = {
+    'SELESAI': 0.55,
+    'DIKIRIM': 0.10,
+    'DIBAYAR': 0.12,
+    'DIPROSES': 0.08,
+    'DIBATALKAN': 0.15,
+}
+# Product popularity and customer activity follow Zipf laws with these exponents
+PRODUCT_ZIPF = 1.1
+CUSTOMER_ZIPF = 0.7
+# Lines per order and units per line
+LINE_WEIGHTS = [55, 30, 10, 5]
+UNIT_WEIGHTS = [50, 25, 12, 8, 5]
+# Customer ages at `now`, in years
+AGE_RANGE = (18, 70)
+# Share of customers holding discounts, and how those discounts look
+DISCOUNT_RATE = 0.05
+DISCOUNT_PERCENTS = [5, 10, 15, 20]
+DISCOUNT_STATES = {'aktif': 0.5, 'kedaluwarsa': 0.3, 'tidak_aktif': 0.2}
+GENERAL_DISCOUNT_SHARE = 0.2
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """
+    Let bulk_create keep the given auto_now_add values instead of "now", so
+    generated rows can be spread over time
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def _batches(total, size=BATCH_SIZE):
+    start = 0
+    while start < total:
+        yield start, min(size, total - start)
+        start += size
+
+
+def zipf_weights(count, exponent):
+    """
+    Cumulative weights of ranks 1..count under a Zipf law, for random.choices
+    """
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class _Picker:
+    """
+    Weighted draws from a fixed population, with the popularity ranks shuffled
+    so that popularity does not follow primary key order
+    """
+
+    def __init__(self, rng, population, exponent):
+        self.rng = rng
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = zipf_weights(len(self.population), exponent)
+
+    def draw(self, k=1):
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=k)
+
+    def draw_distinct(self, k):
+        k = min(k, len(self.population))
+        picked = []
+        while len(picked) < k:
+            for item in self.draw(k - len(picked)):
+                if item not in picked:
+                    picked.append(item)
+        return picked
+
+
+def _weighted(rng, mapping):
+    return rng.choices(list(mapping), weights=list(mapping.values()))[0]
+
+
+def _distribution(mapping):
+    return list(mapping), list(accumulate(mapping.values()))
+
+
+def _create_products(rng, count, batch_size):
+    kategori_list = [Kategori.objects.create(nama_kategori=nama) for nama in KATEGORI_NAMES]
+    for start, size in _batches(count, batch_size):
+        Produk.objects.bulk_create([
+            Produk(
+                nama_produk=f'{kategori_list[i % len(kategori_list)].nama_kategori} {i + 1}',
+                deskripsi_produk=f'Produk sintetis {i + 1}',
+                foto_produk='produk_images/sintetis.jpg',
+                stok_produk=rng.randint(0, 500),
+                harga_produk=rng.choice(PRICES),
+                kategori=kategori_list[i % len(kategori_list)]
+            )
+            for i in range(start, start + size)
+        ])
+    return len(kategori_list)
+
+
+def _create_customers(rng, count, now, days, batch_size):
+    year = timezone.localtime(now).year
+    oldest = date(year - AGE_RANGE[1], 1, 1)
+    age_span = (date(year - AGE_RANGE[0], 12, 31) - oldest).days + 1
+    with explicit_timestamps(Pelanggan, 'created_at'):
+        for start, size in _batches(count, batch_size):
+            batch = []
+            for i in range(start, start + size):
+                # Uniform over the age range: every calendar day (29 Feb included) gets birthdays
+                tanggal_lahir = oldest + timedelta(days=rng.randrange(age_span))
+                batch.append(Pelanggan(
+                    nama_pelanggan=f'Pelanggan {i + 1}',
+                    alamat='Kupang',
+                    tanggal_lahir=tanggal_lahir,
+                    ulang_tahun_mmdd=birthday_key(tanggal_lahir),
+                    no_hp=f'08{i:010d}',
+                    username=f'pelanggan{i + 1}',
+                    password='sintetis',
+                    email=f'pelanggan{i + 1}@example.com',
+                    created_at=now - timedelta(days=days + 30)
+                ))
+            with transaction.atomic():
+                Pelanggan.objects.bulk_create(batch)
+
+
+def _create_transactions(rng, count, products, customers, now, days, batch_size, stdout):
+    open_statuses = _distribution(STATUS_MIX)
+    closed_statuses = _distribution({status: share for status, share in STATUS_MIX.items() if status != 'DIPROSES'})
+    line_counts = range(1, len(LINE_WEIGHTS) + 1)
+    line_weights = list(accumulate(LINE_WEIGHTS))
+    units = range(1, len(UNIT_WEIGHTS) + 1)
+    unit_weights = list(accumulate(UNIT_WEIGHTS))
+    detail_count = 0
+    with explicit_timestamps(Transaksi, 'tanggal'):
+        for start, size in _batches(count, batch_size):
+            orders = []
+            lines = []
+            for _ in range(size):
+                tanggal = now - timedelta(seconds=rng.randrange(days * 86400))
+                # Open (unpaid) orders only make sense within their 24h payment window
+                choices, cum_weights = open_statuses if now - tanggal < timedelta(hours=24) else closed_statuses
+                status = rng.choices(choices, cum_weights=cum_weights)[0]
+                line_count = rng.choices(line_counts, cum_weights=line_weights)[0]
+                order_lines = []
+                total = Decimal('0')
+                for produk_id, harga in products.draw_distinct(line_count):
+                    jumlah = rng.choices(units, cum_weights=unit_weights)[0]
+                    sub_total = harga * jumlah
+                    total += sub_total
+                    order_lines.append((produk_id, jumlah, sub_total))
+                orders.append(Transaksi(
+                    pelanggan_id=customers.draw()[0],
+                    tanggal=tanggal,
+                    total=total,
+                    status_transaksi=status,
+                    alamat_pengiriman='Kupang',
+                    waktu_checkout=tanggal,
+                    batas_waktu_bayar=tanggal + timedelta(hours=24)
+                ))
+                lines.append(order_lines)
+            with transaction.atomic():
+                Transaksi.objects.bulk_create(orders)
+                details = [
+                    DetailTransaksi(transaksi_id=order.pk, produk_id=produk_id, jumlah_produk=jumlah, sub_total=sub_total)
+                    for order, order_lines in zip(orders, lines)
+                    for produk_id, jumlah, sub_total in order_lines
+                ]
+                DetailTransaksi.objects.bulk_create(details, batch_size=batch_size)
+            detail_count += len(details)
+            if stdout:
+                stdout.write(f'  {start + size}/{count} transactions')
+    return detail_count
+
+
+def _create_discounts(rng, pelanggan_ids, products, rate, now, batch_size):
+    holders = [pelanggan_id for pelanggan_id in pelanggan_ids if rng.random() < rate]
+    created = 0
+    with explicit_timestamps(DiskonPelanggan, 'tanggal_dibuat'):
+        for start, size in _batches(len(holders), batch_size):
+            batch = []
+            for pelanggan_id in holders[start:start + size]:
+                state = _weighted(rng, DISCOUNT_STATES)
+                dibuat = now - timedelta(hours=rng.randint(1, 24 * 30))
+                if state == 'kedaluwarsa':
+                    # Still flagged aktif but past its end time
+                    end_time = now - timedelta(hours=rng.randint(1, 24 * 7))
+                else:
+                    end_time = now + timedelta(hours=rng.randint(1, 24 * 7))
+                produk_id = None if rng.random() < GENERAL_DISCOUNT_SHARE else products.draw()[0][0]
+                persen = rng.choice(DISCOUNT_PERCENTS)
+                batch.append(DiskonPelanggan(
+                    pelanggan_id=pelanggan_id,
+                    produk_id=produk_id,
+                    persen_diskon=persen,
+                    status='tidak_aktif' if state == 'tidak_aktif' else 'aktif',
+                    pesan=f'Diskon {persen}% sintetis',
+                    tanggal_dibuat=min(dibuat, end_time),
+                    end_time=end_time
+                ))
+            DiskonPelanggan.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def seed_dataset(transactions, customers=None, products=None, seed=0, days=365,
+                 discount_rate=DISCOUNT_RATE, batch_size=BATCH_SIZE, now=None, stdout=None):
+    """
+    Fill an empty database with `transactions` orders plus customers, products,
+    detail lines and customer discounts, using chunked bulk_create:
+
+    - product popularity and customer activity follow Zipf laws
+    - birthdays are spread uniformly over every day of the year
+    - order statuses follow STATUS_MIX, lines and units are skewed to small orders
+    - about `discount_rate` of customers hold a discount (active, expired or off)
+
+    Afterwards the loyalty ledger and sales rollups the signals would normally
+    maintain are rebuilt. The output depends only on the arguments (pass `now`
+    to pin the timeline). Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    customers = customers or max(50, transactions // 10)
+    products = products or min(5000, max(20, transactions // 200))
+    now = now or timezone.now()
+
+    def report(message):
+        if stdout:
+            stdout.write(message)
+
+    report(f'Creating {products} products...')
+    kategori_count = _create_products(rng, products, batch_size)
+    product_picker = _Picker(rng, Produk.objects.order_by('pk').values_list('pk', 'harga_produk'), PRODUCT_ZIPF)
+
+    report(f'Creating {customers} customers...')
+    _create_customers(rng, customers, now, days, batch_size)
+    pelanggan_ids = list(Pelanggan.objects.order_by('pk').values_list('pk', flat=True))
+    customer_picker = _Picker(rng, pelanggan_ids, CUSTOMER_ZIPF)
+
+    report(f'Creating {transactions} transactions...')
+    detail_count = _create_transactions(
+        rng, transactions, product_picker, customer_picker, now, days, batch_size, stdout
+    )
+
+    report('Creating discounts...')
+    discount_count = _create_discounts(rng, pelanggan_ids, product_picker, discount_rate, now, batch_size)
+
+    # bulk_create skips the signals that maintain these
+    report('Rebuilding loyalty ledger and sales rollups...')
+    rebuild_spending_ledger()
+    refresh_rollups(full=True)
+    return {
+        'kategori': kategori_count,
+        'produk': products,
+        'pelanggan': customers,
+        'transaksi': transactions,
+        'detail_transaksi': detail_count,
+        'diskon_pelanggan': discount_count,
+    }
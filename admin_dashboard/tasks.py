@@ -0,0 +1,83 @@
+"""
+Background jobs (see jobs.py): side effects of checkout and admin saves that
+run after the response.
+"""
+from django.urls import reverse
+from . import jobs, notifications
+from .models import Pelanggan, Produk, Transaksi
+from .outbox import enqueue_for_customers
+
+# jenis: (notification type, notification text, email subject, email template)
+PRODUCT_ANNOUNCEMENTS = {
+    'baru': (
+        "Produk Baru", "Produk baru telah tersedia: {nama}.",
+        'Produk Baru Tersedia!', 'emails/new_product_email.html'
+    ),
+    'stok_kembali': (
+        "Stok Diperbarui", "Stok produk {nama} telah diperbarui.",
+        'Stok Produk Bertambah!', 'emails/stock_update_email.html'
+    ),
+    'stok_bertambah': (
+        "Stok Produk Bertambah", "Stok produk {nama} telah bertambah.",
+        'Stok Produk Bertambah!', 'emails/stock_update_email.html'
+    ),
+}
+
+
+@jobs.task('notifikasi.pelanggan')
+def notify_customer(pelanggan_id, tipe_pesan, isi_pesan, url_target='#'):
+    """
+    One notification for one customer
+    """
+    from .views import create_notification
+
+    pelanggan = Pelanggan.objects.filter(pk=pelanggan_id).first()
+    if pelanggan is None:
+        return
+    if not create_notification(pelanggan, tipe_pesan, isi_pesan, url_target):
+        raise RuntimeError(f'Notifikasi untuk pelanggan {pelanggan_id} gagal dibuat')
+
+
+@jobs.task('notifikasi.pesanan_selesai')
+def notify_completed_orders(transaksi_ids):
+    """
+    "Pesanan Selesai" notification, with a feedback link, for every order
+    """
+    from .views import create_notification
+
+    for transaksi in Transaksi.objects.select_related('pelanggan').filter(pk__in=transaksi_ids).order_by('pk'):
+        detail_url = reverse('detail_pesanan', args=[transaksi.pk])
+        create_notification(
+            transaksi.pelanggan,
+            "Pesanan Selesai",
+            f"Pesanan Anda dengan ID {transaksi.id} telah SELESAI. <a href='{detail_url}' class='alert-link'>Beri Feedback</a>"
+        )
+
+
+@jobs.task('produk.umumkan', bind=True)
+def announce_product(job, produk_id, jenis):
+    """
+    Tell every customer about a new or restocked product: one broadcast
+    notification plus a personalised email per customer in the outbox.
+    Both are keyed on the job, so a job run twice announces once.
+    """
+    produk = Produk.objects.filter(pk=produk_id).first()
+    if produk is None:
+        return
+    tipe_pesan, isi_pesan, subject, template_name = PRODUCT_ANNOUNCEMENTS[jenis]
+    url_target = f'/produk_detail/{produk.id}/'
+    dedup_key = f'tugas:{job.pk}'
+    notifications.broadcast(
+        tipe_pesan,
+        f"{isi_pesan.format(nama=produk.nama_produk)} <a href='{url_target}' class='alert-link'>Lihat detail</a>",
+        target_url=url_target,
+        dedup_key=dedup_key
+    )
+    enqueue_for_customers(
+        subject=subject,
+        template_name=template_name,
+        context={'product': produk},
+        customers=Pelanggan.objects.all(),
+        url_target=url_target,
+        dedup_key=dedup_key
+    )
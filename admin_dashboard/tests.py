@@ -1,4 +1,8 @@
-from django.test import TestCase
+import json
+import tempfile
+from unittest.mock import patch
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.admin.sites import AdminSite
 from django.urls import reverse
 from django.test import Client
@@ -271,4 +275,1889 @@ class DiscountTestCase(TestCase):
         self.assertEqual(diskon.status, 'aktif')
         
         # Verify is_active() returns True
-        self.assertTrue(diskon.is_active())
\ No newline at end of file
+        self.assertTrue(diskon.is_active())
+
+class ProdukListQueryCountTestCase(TestCase):
+    """
+    The product list must cost a fixed number of queries regardless of catalog size
+    """
+    def setUp(self):
+        self.client = Client()
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Catalog Customer",
+            alamat="Test Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081234567899",
+            username="cataloguser",
+            password="testpass123",
+            email="catalog@example.com"
+        )
+        session = self.client.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session.save()
+
+    def _create_products(self, count):
+        produk_list = []
+        for i in range(count):
+            produk_list.append(Produk.objects.create(
+                nama_produk=f"Produk {Produk.objects.count() + 1}",
+                harga_produk=10000,
+                stok_produk=10,
+                deskripsi_produk="Deskripsi",
+                foto_produk="test.jpg"
+            ))
+        return produk_list
+
+    def _count_queries(self, url_name):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_produk_list_query_count_is_constant(self):
+        produk_list = self._create_products(3)
+        DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=produk_list[0], persen_diskon=15, status='aktif'
+        )
+        small = self._count_queries('produk_list')
+        self._create_products(30)
+        large = self._count_queries('produk_list')
+        self.assertEqual(small, large)
+
+    def test_produk_list_public_query_count_is_constant(self):
+        self._create_products(3)
+        small = self._count_queries('produk_list_public')
+        self._create_products(30)
+        large = self._count_queries('produk_list_public')
+        self.assertEqual(small, large)
+
+    def test_product_specific_discount_wins_over_general(self):
+        produk_list = self._create_products(2)
+        general = DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=None, persen_diskon=5, status='aktif'
+        )
+        specific = DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=produk_list[0], persen_diskon=20, status='aktif'
+        )
+        DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=produk_list[1], persen_diskon=30, status='tidak_aktif'
+        )
+        response = self.client.get(reverse('produk_list'))
+        diskon_by_id = {p.id: p.diskon_aktif for p in response.context['produk']}
+        self.assertEqual(diskon_by_id[produk_list[0].id], specific)
+        self.assertEqual(diskon_by_id[produk_list[1].id], general)
+
+
+class PricingEngineTestCase(TestCase):
+    """
+    Shared pricing engine used by cart, checkout and payment
+    """
+    def setUp(self):
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Pricing Customer",
+            alamat="Test Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081234567898",
+            username="pricinguser",
+            password="testpass123",
+            email="pricing@example.com"
+        )
+        self.produk_list = [
+            Produk.objects.create(
+                nama_produk=f"Produk {i}",
+                harga_produk=10000,
+                stok_produk=100,
+                deskripsi_produk="Deskripsi",
+                foto_produk="test.jpg"
+            )
+            for i in range(40)
+        ]
+
+    def _price(self, cart_data):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from admin_dashboard.pricing import PricingEngine
+        with CaptureQueriesContext(connection) as ctx:
+            cart_totals = PricingEngine(self.pelanggan).price_cart(cart_data)
+        return cart_totals, len(ctx.captured_queries)
+
+    def test_query_count_is_flat_as_cart_grows(self):
+        DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=self.produk_list[0], persen_diskon=10, status='aktif'
+        )
+        _, small = self._price({str(p.id): 1 for p in self.produk_list[:2]})
+        _, large = self._price({str(p.id): 1 for p in self.produk_list})
+        self.assertEqual(small, large)
+
+    def test_manual_discount_hierarchy(self):
+        DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=None, persen_diskon=5, status='aktif'
+        )
+        DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=self.produk_list[0], persen_diskon=20, status='aktif'
+        )
+        cart_totals, _ = self._price({str(self.produk_list[0].id): 2, str(self.produk_list[1].id): 1})
+        self.assertEqual(cart_totals['total_sebelum_diskon'], Decimal('30000'))
+        self.assertEqual(cart_totals['total_diskon'], Decimal('4500'))
+        self.assertEqual(cart_totals['total_belanja'], Decimal('25500'))
+        self.assertEqual(cart_totals['keterangan_diskon'], "Diskon Reguler")
+
+    def test_p2b_birthday_discount_applies_to_large_cart(self):
+        # 1992 is a leap year, so this also works on 29 February
+        self.pelanggan.tanggal_lahir = date.today().replace(year=1992)
+        self.pelanggan.save()
+        cart_totals, _ = self._price({str(self.produk_list[0].id): 500})
+        self.assertTrue(cart_totals['qualifies_for_p2b'])
+        self.assertEqual(cart_totals['total_diskon'], Decimal('500000'))
+        self.assertEqual(cart_totals['keterangan_diskon'], "Diskon Ulang Tahun Instan (10%)")
+
+    def test_proses_pembayaran_uses_engine_totals(self):
+        DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=self.produk_list[0], persen_diskon=10, status='aktif'
+        )
+        client = Client()
+        session = client.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session['keranjang'] = {str(self.produk_list[0].id): 3}
+        session.save()
+        bukti_bayar = SimpleUploadedFile('bukti.png', b'bukti', content_type='image/png')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = client.post(reverse('proses_pembayaran'), {
+                'alamat_pengiriman': 'Jl. Test',
+                'bukti_bayar': bukti_bayar
+            })
+        self.assertRedirects(response, reverse('daftar_pesanan'), fetch_redirect_response=False)
+        transaksi = Transaksi.objects.get(pelanggan=self.pelanggan)
+        self.assertEqual(transaksi.total, Decimal('27000'))
+        self.assertEqual(transaksi.total_diskon, Decimal('3000'))
+        self.assertEqual(transaksi.detailtransaksi_set.get().sub_total, Decimal('27000'))
+        self.produk_list[0].refresh_from_db()
+        self.assertEqual(self.produk_list[0].stok_produk, 97)
+
+    def test_keranjang_and_payment_form_render(self):
+        client = Client()
+        session = client.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session['keranjang'] = {str(self.produk_list[0].id): 2}
+        session.save()
+        response = client.get(reverse('keranjang'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_belanja'], Decimal('20000'))
+        response = client.get(reverse('proses_pembayaran'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_belanja'], Decimal('20000'))
+
+
+class LoyaltyLedgerTestCase(TestCase):
+    """
+    Pelanggan.total_belanja / pelanggan_loyal are maintained as deltas
+    """
+    def setUp(self):
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Ledger Customer",
+            alamat="Test Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081234567897",
+            username="ledgeruser",
+            password="testpass123",
+            email="ledger@example.com"
+        )
+
+    def _ledger(self):
+        pelanggan = Pelanggan.objects.get(pk=self.pelanggan.pk)
+        return pelanggan.total_belanja, pelanggan.pelanggan_loyal
+
+    def test_status_changes_move_spending(self):
+        transaksi = Transaksi.objects.create(pelanggan=self.pelanggan, total=3000000, status_transaksi='DIPROSES')
+        self.assertEqual(self._ledger(), (Decimal('0'), False))
+
+        transaksi.status_transaksi = 'DIBAYAR'
+        transaksi.save()
+        self.assertEqual(self._ledger(), (Decimal('3000000'), False))
+
+        transaksi.total = 6000000
+        transaksi.save()
+        self.assertEqual(self._ledger(), (Decimal('6000000'), True))
+
+        transaksi = Transaksi.objects.get(pk=transaksi.pk)
+        transaksi.status_transaksi = 'DIBATALKAN'
+        transaksi.save()
+        self.assertEqual(self._ledger(), (Decimal('0'), False))
+
+    def test_delete_and_bulk_status_change(self):
+        from admin_dashboard.loyalty import change_transaction_status
+        Transaksi.objects.create(pelanggan=self.pelanggan, total=2000000, status_transaksi='DIPROSES')
+        Transaksi.objects.create(pelanggan=self.pelanggan, total=3000000, status_transaksi='DIPROSES')
+        change_transaction_status(Transaksi.objects.filter(pelanggan=self.pelanggan), 'DIBAYAR')
+        self.assertEqual(self._ledger(), (Decimal('5000000'), True))
+
+        Transaksi.objects.filter(pelanggan=self.pelanggan).first().delete()
+        self.assertEqual(self._ledger(), (Decimal('3000000'), False))
+
+    def test_saving_a_stale_customer_keeps_the_ledger(self):
+        stale = Pelanggan.objects.get(pk=self.pelanggan.pk)
+        Transaksi.objects.create(pelanggan=self.pelanggan, total=6000000, status_transaksi='DIBAYAR')
+        stale.alamat = "Alamat Baru"
+        stale.save()
+        self.assertEqual(self._ledger(), (Decimal('6000000'), True))
+        self.assertEqual(Pelanggan.objects.get(pk=self.pelanggan.pk).alamat, "Alamat Baru")
+        # Written only when named explicitly
+        stale.save(update_fields=['total_belanja', 'pelanggan_loyal'])
+        self.assertEqual(self._ledger(), (Decimal('0'), False))
+
+    def test_rebuild_restores_ledger(self):
+        from django.core.management import call_command
+        from io import StringIO
+        Transaksi.objects.create(pelanggan=self.pelanggan, total=7000000, status_transaksi='SELESAI')
+        Pelanggan.objects.update(total_belanja=0, pelanggan_loyal=False)
+        call_command('rebuild_loyalty_ledger', stdout=StringIO())
+        self.assertEqual(self._ledger(), (Decimal('7000000'), True))
+
+
+class SalesRollupTestCase(TestCase):
+    """
+    Daily sales rollups follow status changes and match a full rebuild
+    """
+
+    def setUp(self):
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Rollup Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000099",
+            username="rollupuser",
+            password="pass",
+            email="rollup@example.com"
+        )
+        self.produk_a = Produk.objects.create(nama_produk="Rollup A", harga_produk=10000, stok_produk=100)
+        self.produk_b = Produk.objects.create(nama_produk="Rollup B", harga_produk=20000, stok_produk=100)
+
+    def _create_order(self, status='DIPROSES'):
+        # Same flow as checkout: lines are bulk created before the order is paid
+        transaksi = Transaksi.objects.create(pelanggan=self.pelanggan, total=50000, status_transaksi='DIPROSES')
+        DetailTransaksi.objects.bulk_create([
+            DetailTransaksi(transaksi=transaksi, produk=self.produk_a, jumlah_produk=3, sub_total=30000),
+            DetailTransaksi(transaksi=transaksi, produk=self.produk_b, jumlah_produk=1, sub_total=20000),
+        ])
+        if status != 'DIPROSES':
+            transaksi.status_transaksi = status
+            transaksi.save()
+        return transaksi
+
+    def _snapshot(self):
+        from admin_dashboard.models import RekapPelangganHarian, RekapPenjualanHarian, RekapProdukHarian
+        return (
+            sorted(RekapPenjualanHarian.objects.filter(jumlah_transaksi__gt=0).values_list(
+                'tanggal', 'jumlah_transaksi', 'total_pendapatan')),
+            sorted(RekapProdukHarian.objects.filter(jumlah_terjual__gt=0).values_list(
+                'tanggal', 'produk_id', 'jumlah_terjual', 'total_pendapatan')),
+            sorted(RekapPelangganHarian.objects.filter(jumlah_transaksi__gt=0).values_list(
+                'tanggal', 'pelanggan_id', 'jumlah_transaksi', 'total_belanja')),
+        )
+
+    def test_status_changes_update_rollups(self):
+        from admin_dashboard import rollups
+        transaksi = self._create_order()
+        self.assertEqual(rollups.total_revenue(), 0)
+
+        transaksi.status_transaksi = 'DIBAYAR'
+        transaksi.save()
+        self.assertEqual(rollups.total_revenue(), Decimal('50000'))
+        self.assertEqual(
+            [(row['produk__nama_produk'], row['total_quantity']) for row in rollups.top_products()],
+            [('Rollup A', 3), ('Rollup B', 1)]
+        )
+        self.assertEqual(rollups.top_customers()[0]['total_spent'], Decimal('50000'))
+
+        # Moving between paid statuses changes nothing
+        transaksi.status_transaksi = 'DIKIRIM'
+        transaksi.save()
+        self.assertEqual(rollups.total_revenue(), Decimal('50000'))
+
+        transaksi.status_transaksi = 'DIBATALKAN'
+        transaksi.save()
+        self.assertEqual(rollups.total_revenue(), 0)
+        self.assertEqual(rollups.top_products(), [])
+
+    def test_incremental_rollups_match_rebuild(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from admin_dashboard.loyalty import change_transaction_status
+        paid = self._create_order('DIBAYAR')
+        DetailTransaksi.objects.create(transaksi=paid, produk=self.produk_a, jumlah_produk=2, sub_total=20000)
+        self._create_order('SELESAI').delete()
+        bulk = [self._create_order() for _ in range(3)]
+        change_transaction_status(Transaksi.objects.filter(pk__in=[t.pk for t in bulk]), 'DIBAYAR')
+        DetailTransaksi.objects.filter(transaksi=bulk[0], produk=self.produk_b).get().delete()
+
+        incremental = self._snapshot()
+        call_command('refresh_sales_rollups', '--full', stdout=StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertEqual(incremental[0][0][1:], (4, Decimal('200000')))
+
+    def test_monthly_revenue_uses_calendar_months(self):
+        from admin_dashboard import rollups
+        from admin_dashboard.models import RekapPenjualanHarian
+        RekapPenjualanHarian.objects.create(tanggal=date(2024, 1, 31), jumlah_transaksi=1, total_pendapatan=100)
+        RekapPenjualanHarian.objects.create(tanggal=date(2024, 3, 1), jumlah_transaksi=1, total_pendapatan=250)
+        result = rollups.monthly_revenue(months=3, today=date(2024, 3, 15))
+        self.assertEqual(
+            result,
+            [
+                {'month': 'January 2024', 'total': 100.0},
+                {'month': 'February 2024', 'total': 0.0},
+                {'month': 'March 2024', 'total': 250.0},
+            ]
+        )
+
+
+class StockReservationTestCase(TestCase):
+    """
+    Checkout stock is taken with conditional atomic decrements
+    """
+
+    def setUp(self):
+        self.produk_a = Produk.objects.create(nama_produk="Stock A", harga_produk=10000, stok_produk=5)
+        self.produk_b = Produk.objects.create(nama_produk="Stock B", harga_produk=10000, stok_produk=1)
+
+    def test_reservation_is_all_or_nothing(self):
+        from admin_dashboard.stock import InsufficientStock, reserve_stock
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve_stock([(self.produk_a, 2), (self.produk_b, 2)])
+        self.assertIn('Hanya tersisa 1', str(ctx.exception))
+        self.produk_a.refresh_from_db()
+        self.assertEqual(self.produk_a.stok_produk, 5)
+
+        reserve_stock([(self.produk_a, 2), (self.produk_a.pk, 3), (self.produk_b, 1)])
+        self.assertEqual(
+            dict(Produk.objects.values_list('nama_produk', 'stok_produk')),
+            {'Stock A': 0, 'Stock B': 0}
+        )
+
+    def test_database_rejects_negative_stock(self):
+        from django.db import IntegrityError, transaction
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Produk.objects.filter(pk=self.produk_b.pk).update(stok_produk=-1)
+
+
+class StockReservationStressTestCase(TransactionTestCase):
+    """
+    Many parallel checkouts for the last units of one product never oversell
+    """
+    THREADS = 16
+    ATTEMPTS_PER_THREAD = 10
+    STOCK = 50
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        import threading
+        import time
+        from django.db import OperationalError, connection, transaction
+        from admin_dashboard.stock import InsufficientStock, reserve_stock
+
+        pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Stress Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000098",
+            username="stressuser",
+            password="pass",
+            email="stress@example.com"
+        )
+        produk = Produk.objects.create(nama_produk="Hot Item", harga_produk=10000, stok_produk=self.STOCK)
+        results = {'sold': 0, 'rejected': 0}
+        lock = threading.Lock()
+
+        def checkout():
+            with transaction.atomic():
+                transaksi = Transaksi.objects.create(pelanggan_id=pelanggan.pk, total=10000, status_transaksi='DIPROSES')
+                reserve_stock([(produk.pk, 1)])
+                DetailTransaksi.objects.create(transaksi=transaksi, produk_id=produk.pk, jumlah_produk=1, sub_total=10000)
+
+        def worker():
+            try:
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    while True:
+                        try:
+                            checkout()
+                            outcome = 'sold'
+                        except InsufficientStock:
+                            outcome = 'rejected'
+                        except OperationalError:
+                            # SQLite allows one writer at a time; try again
+                            time.sleep(0.001)
+                            continue
+                        break
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        produk.refresh_from_db()
+        self.assertEqual(results['sold'], self.STOCK)
+        self.assertEqual(results['rejected'], self.THREADS * self.ATTEMPTS_PER_THREAD - self.STOCK)
+        self.assertEqual(produk.stok_produk, 0)
+        self.assertEqual(DetailTransaksi.objects.filter(produk=produk).count(), self.STOCK)
+        # Rejected checkouts roll back their order as well
+        self.assertEqual(Transaksi.objects.filter(pelanggan=pelanggan).count(), self.STOCK)
+        # 160 checkouts should finish well within a few seconds
+        self.assertLess(elapsed, 30)
+
+
+class BroadcastNotificationTestCase(TestCase):
+    """
+    Notifications for all customers are stored once with per-customer read receipts
+    """
+
+    def setUp(self):
+        self.customers = [
+            Pelanggan.objects.create(
+                nama_pelanggan=f"Broadcast Customer {i}",
+                alamat="Address",
+                tanggal_lahir=date(1990, 1, 1),
+                no_hp=f"0812000001{i:02d}",
+                username=f"broadcastuser{i}",
+                password="pass",
+                email=f"broadcast{i}@example.com"
+            )
+            for i in range(20)
+        ]
+        self.pelanggan = self.customers[0]
+
+    def test_new_product_writes_one_row(self):
+        from admin_dashboard.models import Notifikasi, NotifikasiBroadcast
+        with self.assertNumQueries(2):
+            Produk.objects.create(nama_produk="Broadcast Product", harga_produk=10000, stok_produk=5)
+        self.assertEqual(NotifikasiBroadcast.objects.count(), 1)
+        self.assertEqual(Notifikasi.objects.count(), 0)
+
+    def test_unread_count_and_list_merge_personal_and_broadcast(self):
+        from admin_dashboard.models import Notifikasi
+        from admin_dashboard.views import create_notification_for_all_customers, get_notification_count
+        create_notification_for_all_customers("Promo", "Promo untuk semua")
+        Notifikasi.objects.create(pelanggan=self.pelanggan, tipe_pesan="Pesanan Baru", isi_pesan="Pesanan #1")
+        self.assertEqual(get_notification_count(self.pelanggan.id), 2)
+        self.assertEqual(get_notification_count(self.customers[1].id), 1)
+
+        client = Client()
+        session = client.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session.save()
+        response = client.get(reverse('notifikasi'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [n.tipe_pesan for n in response.context['notifikasi_list']],
+            ['Pesanan Baru', 'Promo']
+        )
+        self.assertContains(response, 'Promo untuk semua')
+        self.assertEqual(get_notification_count(self.pelanggan.id), 0)
+        # Other customers keep their own unread state
+        self.assertEqual(get_notification_count(self.customers[1].id), 1)
+
+    def test_mark_read_tells_broadcast_and_personal_ids_apart(self):
+        from django.contrib.sessions.backends.db import SessionStore
+        from django.test import RequestFactory
+        from admin_dashboard.models import Notifikasi, NotifikasiBroadcast, NotifikasiBroadcastDibaca
+        from admin_dashboard.notifications import broadcast
+        from admin_dashboard.views import fetch_unread_notifications, mark_notification_as_read
+        promo = broadcast("Promo", "Promo untuk semua")
+        personal = Notifikasi.objects.create(pelanggan=self.pelanggan, tipe_pesan="Pesanan Baru", isi_pesan="Pesanan #1")
+        # Both id sequences start at 1
+        self.assertEqual(promo.pk, personal.pk)
+
+        def call(view, method='get', **data):
+            request = getattr(RequestFactory(), method)('/api/notifications/', data)
+            request.session = SessionStore()
+            request.session['pelanggan_id'] = self.pelanggan.id
+            return json.loads(view(request).content)
+
+        unread = call(fetch_unread_notifications)['notifications']
+        self.assertEqual({(n['id'], n['broadcast']) for n in unread}, {(promo.pk, True), (personal.pk, False)})
+
+        self.assertTrue(call(mark_notification_as_read, 'post', id=promo.pk, broadcast=1)['success'])
+        self.assertTrue(NotifikasiBroadcastDibaca.objects.filter(pelanggan=self.pelanggan, broadcast=promo).exists())
+        personal.refresh_from_db()
+        self.assertFalse(personal.is_read)
+
+        self.assertTrue(call(mark_notification_as_read, 'post', id=personal.pk, broadcast=0)['success'])
+        personal.refresh_from_db()
+        self.assertTrue(personal.is_read)
+        self.assertEqual(NotifikasiBroadcast.objects.count(), 1)
+
+    def test_customers_do_not_see_broadcasts_from_before_they_registered(self):
+        from admin_dashboard.notifications import broadcast, unread_count
+        broadcast("Promo", "Promo lama")
+        Pelanggan.objects.filter(pk=self.pelanggan.pk).update(created_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(unread_count(self.pelanggan.id), 0)
+        self.assertEqual(unread_count(self.customers[1].id), 1)
+
+
+    def test_notification_pages_merge_both_sources_in_order(self):
+        from admin_dashboard.models import Notifikasi, NotifikasiBroadcast
+        from admin_dashboard.notifications import broadcast, notifications_page
+        base = timezone.now() - timedelta(days=1)
+        Pelanggan.objects.filter(pk=self.pelanggan.pk).update(created_at=base - timedelta(days=1))
+        for i in range(7):
+            personal = Notifikasi.objects.create(pelanggan=self.pelanggan, tipe_pesan=f"Pribadi {i}", isi_pesan="x")
+            Notifikasi.objects.filter(pk=personal.pk).update(created_at=base + timedelta(minutes=i))
+            shared = broadcast(f"Promo {i}", "x")
+            # Every other broadcast shares its timestamp with a personal notification
+            NotifikasiBroadcast.objects.filter(pk=shared.pk).update(created_at=base + timedelta(minutes=i, seconds=i % 2 * 30))
+
+        expected = [n.pk for n in sorted(
+            list(Notifikasi.objects.filter(pelanggan=self.pelanggan)) + list(NotifikasiBroadcast.objects.all()),
+            key=lambda n: (n.created_at, isinstance(n, NotifikasiBroadcast), n.pk), reverse=True
+        )]
+        seen, cursor = [], None
+        while True:
+            # One keyset query per source, whatever the page depth
+            with self.assertNumQueries(2):
+                page = notifications_page(self.pelanggan.id, cursor, per_page=4)
+            seen.extend(n.pk for n in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 14)
+
+        client = Client()
+        session = client.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session.save()
+        response = client.get(reverse('notifikasi'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['notifikasi_list']), 14)
+
+
+class UnreadCounterTestCase(TestCase):
+    """
+    The badge counts come from a cached per-customer counter and are only
+    computed when a template reads them
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Counter Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000500",
+            username="counteruser",
+            password="pass",
+            email="counter@example.com"
+        )
+        Pelanggan.objects.filter(pk=self.pelanggan.pk).update(created_at=timezone.now() - timedelta(days=1))
+        self.client = Client()
+        session = self.client.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session['keranjang'] = {'1': 2, '2': 3}
+        session.save()
+
+    def _notify(self, tipe_pesan="Info"):
+        from admin_dashboard.models import Notifikasi
+        return Notifikasi.objects.create(pelanggan=self.pelanggan, tipe_pesan=tipe_pesan, isi_pesan=tipe_pesan)
+
+    def test_counter_follows_create_and_read(self):
+        from admin_dashboard.notifications import broadcast, count_unread, mark_all_read, mark_broadcast_read, unread_count
+        first = self._notify()
+        self.assertEqual(unread_count(self.pelanggan.id), 1)
+        self._notify()
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.pelanggan.id), 2)
+
+        promo = broadcast("Promo", "Promo")
+        self.assertEqual(unread_count(self.pelanggan.id), 3)
+        mark_broadcast_read(self.pelanggan.id, promo.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.pelanggan.id), 2)
+
+        first.is_read = True
+        first.save()
+        self.assertEqual(unread_count(self.pelanggan.id), 1)
+        mark_all_read(self.pelanggan.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.pelanggan.id), 0)
+        self.assertEqual(count_unread(self.pelanggan.id), 0)
+
+    def test_birthday_campaign_resets_the_counter(self):
+        from admin_dashboard.birthdays import run_birthday_campaign
+        from admin_dashboard.notifications import unread_count
+        self.assertEqual(unread_count(self.pelanggan.id), 0)
+        today = timezone.localdate()
+        Pelanggan.objects.filter(pk=self.pelanggan.pk).update(tanggal_lahir=today.replace(year=1990))
+        Pelanggan.objects.get(pk=self.pelanggan.pk).save()
+        run_birthday_campaign(today)
+        self.assertEqual(unread_count(self.pelanggan.id), 1)
+
+    def test_context_values_are_lazy_and_memoized(self):
+        from django.test import RequestFactory
+        from admin_dashboard.context_processors import notification_cart_context
+        self._notify()
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        with self.assertNumQueries(0):
+            context = notification_cart_context(request)
+        with patch('admin_dashboard.notifications.count_unread', return_value=1) as count_unread:
+            self.assertEqual(context['unseen_notifications_count'](), 1)
+            self.assertEqual(context['unseen_notifications_count'](), 1)
+        self.assertEqual(count_unread.call_count, 1)
+        self.assertEqual(context['cart_item_count'](), 5)
+
+    def test_pages_render_the_badges_from_the_counter(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._notify()
+        response = self.client.get(reverse('akun'))
+        self.assertContains(response, '<span class="notification-badge">1</span>', html=True)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('akun'))
+        self.assertContains(response, '<span id="cart-badge" class="badge bg-danger rounded-pill cart-badge">5</span>', html=True)
+        self.assertFalse([query for query in queries.captured_queries if 'FROM "notifikasi' in query['sql']])
+
+
+class _SmtpStandIn:
+    """
+    Minimal local SMTP server: records messages and connections, and refuses
+    the recipients listed in `reject`
+    """
+
+    def __init__(self, reject=()):
+        import socketserver
+        import threading
+        stand_in = self
+        self.reject = set(reject)
+        self.messages = []
+        self.connections = 0
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b'\r\n')
+
+            def handle(self):
+                stand_in.connections += 1
+                self.reply('220 localhost')
+                recipients = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode().strip()
+                    verb = command[:4].upper()
+                    if verb in ('EHLO', 'HELO', 'NOOP', 'RSET'):
+                        self.reply('250 localhost')
+                    elif verb == 'MAIL':
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        address = command.split(':', 1)[1].strip().strip('<>')
+                        if address in stand_in.reject:
+                            self.reply('550 No such user')
+                        else:
+                            recipients.append(address)
+                            self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        data = []
+                        for data_line in iter(self.rfile.readline, b''):
+                            if data_line == b'.\r\n':
+                                break
+                            data.append(data_line)
+                        stand_in.messages.append((recipients, b''.join(data).decode()))
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Not implemented')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        self.settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD=''
+        )
+        self.settings.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.settings.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class EmailOutboxTestCase(TestCase):
+    """
+    Emails are queued in the outbox and sent in batches over one SMTP connection
+    """
+
+    def setUp(self):
+        self.customers = [
+            Pelanggan.objects.create(
+                nama_pelanggan=f"Outbox Customer {i}",
+                alamat="Address",
+                tanggal_lahir=date(1990, 1, 1),
+                no_hp=f"0812000006{i:02d}",
+                username=f"outboxuser{i}",
+                password="pass",
+                email=f"outbox{i}@example.com" if i < 12 else ""
+            )
+            for i in range(13)
+        ]
+        self.produk = Produk.objects.create(
+            nama_produk="Outbox Product", deskripsi_produk="Baru", foto_produk='produk_images/test.jpg',
+            harga_produk=25000, stok_produk=10
+        )
+
+    def _enqueue(self):
+        from admin_dashboard.outbox import enqueue_for_customers
+        return enqueue_for_customers(
+            'Produk Baru Tersedia!', 'emails/new_product_email.html', {'product': self.produk},
+            Pelanggan.objects.all(), url_target=f'/produk_detail/{self.produk.id}/'
+        )
+
+    def test_batches_share_one_connection(self):
+        from admin_dashboard.models import EmailKeluar
+        from admin_dashboard.outbox import send_pending
+        self.assertEqual(self._enqueue(), 12)
+        with _SmtpStandIn() as smtp:
+            result = send_pending(batch_size=5)
+        self.assertEqual((result['terkirim'], result['menunggu'], result['gagal']), (12, 0, 0))
+        self.assertGreater(result['per_detik'], 0)
+        self.assertEqual(smtp.connections, 1)
+        self.assertEqual(len(smtp.messages), 12)
+        recipients, body = smtp.messages[3]
+        self.assertEqual(recipients, ['outbox3@example.com'])
+        self.assertIn('Hai Outbox Customer 3,', body)
+        self.assertIn('Rp 25.000', body)
+        self.assertEqual(set(EmailKeluar.objects.values_list('status', 'percobaan')), {('terkirim', 1)})
+
+    def test_refused_recipient_is_retried_with_backoff(self):
+        from admin_dashboard import outbox
+        from admin_dashboard.models import EmailKeluar
+        self._enqueue()
+        with _SmtpStandIn(reject={'outbox2@example.com'}) as smtp:
+            result = outbox.send_pending()
+            self.assertEqual((result['terkirim'], result['menunggu']), (11, 1))
+            # The refused message does not stop the batch; the connection is reopened once
+            self.assertEqual(smtp.connections, 2)
+            failed = EmailKeluar.objects.get(penerima='outbox2@example.com')
+            self.assertEqual((failed.status, failed.percobaan), ('menunggu', 1))
+            self.assertIn('No such user', failed.error_terakhir)
+            self.assertGreater(failed.kirim_setelah, timezone.now() + timedelta(seconds=outbox.RETRY_DELAY - 5))
+
+            delays = []
+            for attempt in range(2, outbox.MAX_ATTEMPTS + 1):
+                EmailKeluar.objects.filter(pk=failed.pk).update(kirim_setelah=timezone.now())
+                before = timezone.now()
+                outbox.send_pending()
+                failed.refresh_from_db()
+                self.assertEqual(failed.percobaan, attempt)
+                delays.append((failed.kirim_setelah - before).total_seconds())
+        self.assertEqual(failed.status, 'gagal')
+        self.assertAlmostEqual(delays[1] / delays[0], 2, places=1)
+
+    def test_each_message_is_marked_as_soon_as_it_is_sent(self):
+        from unittest.mock import Mock
+        from admin_dashboard import outbox
+        from admin_dashboard.models import EmailKeluar
+
+        class WorkerDied(BaseException):
+            pass
+
+        self._enqueue()
+        emails = outbox.claim_batch(batch_size=3)
+        # A second worker took the last message over after the claim timeout
+        EmailKeluar.objects.filter(pk=emails[2].pk).update(token_klaim='pekerja-lain')
+        connection = Mock()
+        connection.send_messages.side_effect = [1, WorkerDied()]
+        with self.assertRaises(WorkerDied):
+            outbox.send_batch(emails, connection)
+        # The delivered message is not sent again; the other one is claimed again later
+        self.assertEqual(EmailKeluar.objects.get(pk=emails[0].pk).status, 'terkirim')
+        self.assertEqual(EmailKeluar.objects.get(pk=emails[1].pk).status, 'mengirim')
+
+        connection.send_messages.side_effect = [0]
+        self.assertEqual(outbox.send_batch(emails[2:], connection)['menunggu'], 1)
+        # The failure of a message claimed by another worker is not recorded
+        taken_over = EmailKeluar.objects.get(pk=emails[2].pk)
+        self.assertEqual((taken_over.status, taken_over.token_klaim, taken_over.percobaan), ('mengirim', 'pekerja-lain', 0))
+
+    def test_sending_a_notification_only_enqueues(self):
+        from django.core import mail
+        from admin_dashboard.models import EmailKeluar
+        from admin_dashboard.views import send_notification_email
+        recipients = [customer.email for customer in self.customers if customer.email]
+        with self.assertNumQueries(1):
+            self.assertTrue(send_notification_email(
+                'Stok Produk Bertambah!', 'emails/stock_update_email.html', {'product': self.produk}, recipients
+            ))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailKeluar.objects.filter(status='menunggu').count(), 12)
+
+    def test_command_reports_throughput(self):
+        from io import StringIO
+        from django.core.management import call_command
+        self._enqueue()
+        output = StringIO()
+        with _SmtpStandIn() as smtp:
+            call_command('send_outbox', batch_size=4, stdout=output)
+        self.assertEqual(len(smtp.messages), 12)
+        self.assertRegex(output.getvalue(), r'Email terkirim: 12, dijadwalkan ulang: 0, gagal: 0 - [\d.]+ detik, [\d.]+ pesan/detik')
+
+
+
+class BackgroundJobTestCase(TestCase):
+    """
+    Side effects of checkout and admin saves run as background jobs
+    """
+
+    def setUp(self):
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Job Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000701",
+            username="jobuser",
+            password="pass",
+            email="job@example.com"
+        )
+        self.produk = Produk.objects.create(
+            nama_produk="Job Product", deskripsi_produk="Baru", foto_produk='produk_images/test.jpg',
+            harga_produk=10000, stok_produk=10
+        )
+
+    def _register_failing_task(self):
+        from admin_dashboard import jobs
+
+        @jobs.task('test.gagal')
+        def fail(**kwargs):
+            raise RuntimeError('boom')
+        self.addCleanup(jobs._registry.pop, 'test.gagal')
+
+    def test_checkout_notification_runs_after_the_response(self):
+        from admin_dashboard.jobs import run_pending
+        from admin_dashboard.models import Notifikasi, TugasLatar
+        client = Client()
+        session = client.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session['keranjang'] = {str(self.produk.id): 2}
+        session.save()
+        bukti_bayar = SimpleUploadedFile('bukti.png', b'bukti', content_type='image/png')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks() as callbacks:
+                client.post(reverse('proses_pembayaran'), {'alamat_pengiriman': 'Jl. Test', 'bukti_bayar': bukti_bayar})
+        # The job is handed to the web process' thread pool once the order is committed
+        self.assertEqual(len(callbacks), 1)
+        job = TugasLatar.objects.get()
+        self.assertEqual((job.nama, job.status), ('notifikasi.pelanggan', 'menunggu'))
+        self.assertFalse(Notifikasi.objects.exists())
+
+        self.assertEqual(run_pending(threads=1)['selesai'], 1)
+        notifikasi = Notifikasi.objects.get(pelanggan=self.pelanggan)
+        self.assertEqual(notifikasi.tipe_pesan, "Pesanan Baru")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.percobaan), ('selesai', 1))
+
+    def test_dedup_key_returns_the_active_job(self):
+        from admin_dashboard import jobs
+        from admin_dashboard.models import EmailKeluar, NotifikasiBroadcast, TugasLatar
+        key = f'produk.umumkan:{self.produk.pk}:baru'
+        broadcasts = NotifikasiBroadcast.objects.count()
+        first = jobs.enqueue('produk.umumkan', dedup_key=key, produk_id=self.produk.pk, jenis='baru')
+        second = jobs.enqueue('produk.umumkan', dedup_key=key, produk_id=self.produk.pk, jenis='baru')
+        self.assertEqual(first.pk, second.pk)
+        jobs.run_pending(threads=1)
+        self.assertEqual(NotifikasiBroadcast.objects.count(), broadcasts + 1)
+        self.assertEqual(EmailKeluar.objects.get().penerima, 'job@example.com')
+        # Once the job is done the same key can be queued again
+        third = jobs.enqueue('produk.umumkan', dedup_key=key, produk_id=self.produk.pk, jenis='baru')
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(TugasLatar.objects.count(), 2)
+
+    def test_failed_announcement_is_retried_without_duplicates(self):
+        from unittest.mock import patch
+        from admin_dashboard import jobs, tasks
+        from admin_dashboard.models import EmailKeluar, NotifikasiBroadcast, TugasLatar
+        for i in range(2):
+            Pelanggan.objects.create(
+                nama_pelanggan=f"Job Customer {i}", alamat="Address", tanggal_lahir=date(1990, 1, 1),
+                no_hp=f"08120000071{i}", username=f"jobuser{i}", password="pass", email=f"job{i}@example.com"
+            )
+        broadcasts = NotifikasiBroadcast.objects.count()
+        enqueue_for_customers = tasks.enqueue_for_customers
+        attempts = []
+
+        def fail_after_queueing(*args, **kwargs):
+            # The broadcast and the emails are written, then the attempt fails
+            enqueue_for_customers(*args, **kwargs)
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError('SMTP template error')
+
+        job = jobs.enqueue('produk.umumkan', produk_id=self.produk.pk, jenis='stok_bertambah')
+        with patch.object(tasks, 'enqueue_for_customers', side_effect=fail_after_queueing):
+            with self.assertLogs('admin_dashboard.jobs', 'WARNING'):
+                self.assertEqual(jobs.run_pending(threads=1)['menunggu'], 1)
+            # The failed attempt left nothing behind
+            self.assertEqual(NotifikasiBroadcast.objects.count(), broadcasts)
+            self.assertFalse(EmailKeluar.objects.exists())
+
+            TugasLatar.objects.filter(pk=job.pk).update(jalankan_setelah=timezone.now())
+            self.assertEqual(jobs.run_pending(threads=1)['selesai'], 1)
+        # A worker that took the job over after its visibility timeout runs it again
+        job.refresh_from_db()
+        jobs._registry['produk.umumkan'](job, **job.argumen)
+
+        self.assertEqual(NotifikasiBroadcast.objects.count(), broadcasts + 1)
+        self.assertEqual(
+            sorted(EmailKeluar.objects.values_list('penerima', flat=True)),
+            ['job0@example.com', 'job1@example.com', 'job@example.com']
+        )
+
+    def test_unknown_task_is_rejected(self):
+        from admin_dashboard import jobs
+        with self.assertRaises(ValueError):
+            jobs.enqueue('tidak.ada')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        from admin_dashboard import jobs
+        from admin_dashboard.models import TugasLatar
+        self._register_failing_task()
+        job = jobs.enqueue('test.gagal', max_attempts=3)
+        delays = []
+        for attempt in range(1, 4):
+            TugasLatar.objects.filter(pk=job.pk).update(jalankan_setelah=timezone.now())
+            before = timezone.now()
+            with self.assertLogs('admin_dashboard.jobs', 'WARNING'):
+                result = jobs.run_pending(threads=1)
+            job.refresh_from_db()
+            self.assertEqual(job.percobaan, attempt)
+            self.assertEqual(job.error_terakhir, 'boom')
+            if attempt < 3:
+                self.assertEqual((result['menunggu'], job.status), (1, 'menunggu'))
+                delays.append((job.jalankan_setelah - before).total_seconds())
+                # Not due yet: nothing runs
+                self.assertEqual(jobs.run_pending(threads=1)['menunggu'], 0)
+        self.assertEqual((result['gagal'], job.status), (1, 'gagal'))
+        self.assertAlmostEqual(delays[1] / delays[0], 2, places=1)
+
+    def test_job_of_a_stalled_worker_is_claimed_again(self):
+        from admin_dashboard import jobs
+        from admin_dashboard.models import Notifikasi
+        jobs.enqueue('notifikasi.pelanggan', pelanggan_id=self.pelanggan.pk, tipe_pesan="Tes", isi_pesan="Halo")
+        stalled = jobs.claim(1, visibility_timeout=60)
+        self.assertEqual(len(stalled), 1)
+        # Hidden from other workers until the visibility timeout passes
+        self.assertEqual(jobs.claim(1), [])
+        later = timezone.now() + timedelta(seconds=61)
+        taken_over = jobs.claim(1, now=later)
+        self.assertEqual(taken_over[0].pk, stalled[0].pk)
+        self.assertEqual(taken_over[0].percobaan, 2)
+        self.assertEqual(jobs.run_job(taken_over[0]), 'selesai')
+        # The stalled worker finishing late does not notify the customer again
+        with self.assertLogs('admin_dashboard.jobs', 'WARNING'):
+            self.assertEqual(jobs.run_job(stalled[0]), 'menunggu')
+        self.assertEqual(Notifikasi.objects.count(), 1)
+        # nor change the recorded state when it fails
+        self._register_failing_task()
+        stalled[0].nama = 'test.gagal'
+        with self.assertLogs('admin_dashboard.jobs', 'WARNING'):
+            jobs.run_job(stalled[0])
+        taken_over[0].refresh_from_db()
+        self.assertEqual((taken_over[0].status, taken_over[0].error_terakhir), ('selesai', ''))
+        self.assertEqual(Notifikasi.objects.count(), 1)
+
+    def test_command_runs_due_jobs(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from admin_dashboard import jobs
+        from admin_dashboard.models import Notifikasi
+        for i in range(3):
+            jobs.enqueue('notifikasi.pelanggan', pelanggan_id=self.pelanggan.pk, tipe_pesan="Tes", isi_pesan=f"Halo {i}")
+        output = StringIO()
+        call_command('run_jobs', threads=1, stdout=output)
+        self.assertEqual(Notifikasi.objects.count(), 3)
+        self.assertRegex(output.getvalue(), r'Tugas selesai: 3, dijadwalkan ulang: 0, gagal: 0 - [\d.]+ detik')
+
+
+
+class SchedulerTestCase(TestCase):
+    """
+    Periodic jobs of run_scheduler: one scheduler per run thanks to the leases
+    """
+
+    def _register(self, name, func, **when):
+        from admin_dashboard import scheduler
+        scheduler.periodic(name, **(when or {'every': timedelta(minutes=10)}))(func)
+        self.addCleanup(scheduler._registry.pop, name)
+        return scheduler._registry[name]
+
+    def test_due_jobs_run_once_and_record_their_run(self):
+        from admin_dashboard.models import JadwalTugas
+        from admin_dashboard.scheduler import registered, run_due
+        runs = run_due('worker-a')
+        self.assertEqual({name for name, _, _ in runs}, {job.name for job in registered()})
+        self.assertEqual({status for _, status, _ in runs}, {'berhasil'})
+        rekap = JadwalTugas.objects.get(nama='rekap_penjualan')
+        self.assertEqual((rekap.jumlah_berhasil, rekap.dikunci_oleh, rekap.sewa_berakhir), (1, '', None))
+        self.assertIsNotNone(rekap.durasi_terakhir_ms)
+        self.assertEqual(rekap.hasil_terakhir, {'days': 1})
+        self.assertGreater(rekap.jalankan_berikutnya, timezone.now() + timedelta(minutes=14))
+        # Nothing is due right after
+        self.assertEqual(run_due('worker-b'), [])
+
+    def test_lease_keeps_other_schedulers_out(self):
+        from admin_dashboard.models import JadwalTugas
+        from admin_dashboard.scheduler import acquire, run_job
+        calls = []
+        job = self._register('test.hitung', lambda: calls.append(1) or {'calls': len(calls)})
+        JadwalTugas.objects.create(nama=job.name)
+        self.assertTrue(acquire(job, 'worker-a'))
+        self.assertFalse(acquire(job, 'worker-b'))
+        # worker-a died: once its lease expired, worker-b takes the job over
+        later = timezone.now() + timedelta(seconds=job.lease + 1)
+        self.assertTrue(acquire(job, 'worker-b', now=later))
+        self.assertEqual(run_job(job, 'worker-b')[0], 'berhasil')
+        # worker-a finishing late records nothing
+        run_job(job, 'worker-a')
+        row = JadwalTugas.objects.get(nama=job.name)
+        self.assertEqual((row.jumlah_berhasil, row.hasil_terakhir), (1, {'calls': 1}))
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_job_is_recorded_and_retried_sooner(self):
+        from admin_dashboard import scheduler
+        from admin_dashboard.models import JadwalTugas
+
+        def fail():
+            raise RuntimeError('boom')
+        # A daily job: its next regular run is almost a day away
+        job = self._register('test.gagal', fail, at=(timezone.localtime() - timedelta(minutes=1)).time())
+        JadwalTugas.objects.create(nama=job.name)
+        self.assertTrue(scheduler.acquire(job, 'worker-a'))
+        with self.assertLogs('admin_dashboard.scheduler', 'ERROR'):
+            self.assertEqual(scheduler.run_job(job, 'worker-a')[0], 'gagal')
+        row = JadwalTugas.objects.get(nama=job.name)
+        self.assertEqual((row.status_terakhir, row.jumlah_gagal, row.error_terakhir), ('gagal', 1, 'boom'))
+        self.assertLessEqual(row.jalankan_berikutnya, timezone.now() + timedelta(seconds=scheduler.RETRY_DELAY))
+
+    def test_daily_job_runs_at_local_time(self):
+        from datetime import datetime, time
+        from admin_dashboard.scheduler import next_run
+        job = self._register('test.harian', lambda: None, at=time(1, 0))
+        tz = timezone.get_current_timezone()
+        before = timezone.make_aware(datetime(2026, 3, 10, 0, 30), tz)
+        after = timezone.make_aware(datetime(2026, 3, 10, 1, 0), tz)
+        self.assertEqual(next_run(job, before), timezone.make_aware(datetime(2026, 3, 10, 1, 0), tz))
+        self.assertEqual(next_run(job, after), timezone.make_aware(datetime(2026, 3, 11, 1, 0), tz))
+
+    def test_expiry_and_cleanup_jobs(self):
+        from django.core import mail
+        from admin_dashboard import jobs, outbox
+        from admin_dashboard.models import EmailKeluar, Notifikasi
+        from admin_dashboard.periodic import delete_old_notifications, run_background_jobs, send_outbox, sweep_discounts
+        pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Scheduler Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000801",
+            username="scheduleruser",
+            password="pass",
+            email="scheduler@example.com"
+        )
+        produk = Produk.objects.create(nama_produk="Scheduler Product", harga_produk=10000, stok_produk=5)
+        expired = DiskonPelanggan.objects.create(
+            pelanggan=pelanggan, produk=produk, persen_diskon=10, end_time=timezone.now() - timedelta(hours=1)
+        )
+        running = DiskonPelanggan.objects.create(
+            pelanggan=pelanggan, produk=produk, persen_diskon=10, end_time=timezone.now() + timedelta(hours=1)
+        )
+        self.assertEqual(sweep_discounts(), {'expired': 1})
+        expired.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual((expired.status, running.status), ('tidak_aktif', 'aktif'))
+
+        old = timezone.now() - timedelta(days=365)
+        for is_read in (True, False):
+            notifikasi = Notifikasi.objects.create(pelanggan=pelanggan, tipe_pesan="Lama", isi_pesan="Lama", is_read=is_read)
+            Notifikasi.objects.filter(pk=notifikasi.pk).update(created_at=old)
+        Notifikasi.objects.create(pelanggan=pelanggan, tipe_pesan="Baru", isi_pesan="Baru", is_read=True)
+        self.assertEqual(delete_old_notifications(), {'deleted': 1})
+        self.assertEqual(set(Notifikasi.objects.values_list('tipe_pesan', 'is_read')), {("Lama", False), ("Baru", True)})
+
+        outbox.enqueue_email('Halo', 'emails/new_product_email.html', {'product': produk}, [pelanggan.email])
+        result = send_outbox()
+        self.assertEqual((result['terkirim'], result['menunggu'], result['gagal']), (1, 0, 0))
+        self.assertEqual([message.to for message in mail.outbox], [[pelanggan.email]])
+        self.assertEqual(EmailKeluar.objects.get().status, 'terkirim')
+
+        job = jobs.enqueue('notifikasi.pelanggan', pelanggan_id=pelanggan.pk, tipe_pesan="Tugas", isi_pesan="Dari scheduler")
+        result = run_background_jobs()
+        self.assertEqual((result['selesai'], result['menunggu'], result['gagal']), (1, 0, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'selesai')
+        self.assertTrue(Notifikasi.objects.filter(pelanggan=pelanggan, tipe_pesan="Tugas").exists())
+
+    def test_command_runs_due_jobs_and_reports_status(self):
+        from io import StringIO
+        from django.core.management import call_command
+        output = StringIO()
+        call_command('run_scheduler', once=True, stdout=output)
+        self.assertRegex(output.getvalue(), r'rekap_penjualan: berhasil \([\d.]+ ms\)')
+        output = StringIO()
+        call_command('run_scheduler', status=True, stdout=output)
+        self.assertRegex(output.getvalue(), r'ulang_tahun: berhasil, terakhir [\d: -]+ \([\d.]+ ms\), berikutnya [\d-]+ 01:00:00')
+
+
+class PaymentExpiryTestCase(TestCase):
+    """
+    Expired unpaid orders are cancelled in bulk and their stock is given back
+    """
+
+    def setUp(self):
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Expiry Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000901",
+            username="expiryuser",
+            password="pass",
+            email="expiry@example.com"
+        )
+        self.produk_a = Produk.objects.create(nama_produk="Expiry A", harga_produk=10000, stok_produk=100)
+        self.produk_b = Produk.objects.create(nama_produk="Expiry B", harga_produk=20000, stok_produk=100)
+
+    def _order(self, status='DIPROSES', hours=-1):
+        transaksi = Transaksi.objects.create(
+            pelanggan=self.pelanggan, total=50000, status_transaksi=status,
+            batas_waktu_bayar=timezone.now() + timedelta(hours=hours)
+        )
+        DetailTransaksi.objects.bulk_create([
+            DetailTransaksi(transaksi=transaksi, produk=self.produk_a, jumlah_produk=3, sub_total=30000),
+            DetailTransaksi(transaksi=transaksi, produk=self.produk_b, jumlah_produk=1, sub_total=20000),
+        ])
+        return transaksi
+
+    def _stock(self):
+        return list(Produk.objects.filter(pk__in=[self.produk_a.pk, self.produk_b.pk]).order_by('pk').values_list('stok_produk', flat=True))
+
+    def test_expired_orders_are_cancelled_and_restocked(self):
+        from admin_dashboard.expiry import expire_unpaid_orders
+        from admin_dashboard.models import Notifikasi
+        expired = [self._order() for _ in range(4)]
+        waiting = self._order(hours=1)
+        paid = self._order(status='DIBAYAR')
+
+        self.assertEqual(expire_unpaid_orders(batch_size=3), {'cancelled': 4, 'products': 4})
+        self.assertEqual(
+            set(Transaksi.objects.filter(status_transaksi='DIBATALKAN').values_list('pk', flat=True)),
+            {transaksi.pk for transaksi in expired}
+        )
+        waiting.refresh_from_db()
+        paid.refresh_from_db()
+        self.assertEqual((waiting.status_transaksi, paid.status_transaksi), ('DIPROSES', 'DIBAYAR'))
+        self.assertEqual(self._stock(), [112, 104])
+        notifikasi = Notifikasi.objects.filter(pelanggan=self.pelanggan, tipe_pesan="Pesanan Dibatalkan")
+        self.assertEqual(notifikasi.count(), 4)
+        self.assertIn(f"Pesanan #{expired[0].pk} telah dibatalkan", notifikasi.order_by('pk').first().isi_pesan)
+
+        # A second run finds nothing left to do
+        self.assertEqual(expire_unpaid_orders(), {'cancelled': 0, 'products': 0})
+        self.assertEqual(self._stock(), [112, 104])
+
+    def test_query_count_does_not_grow_with_orders(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from admin_dashboard.expiry import expire_unpaid_orders
+        counts = []
+        for orders in (2, 40):
+            for _ in range(orders):
+                self._order()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(expire_unpaid_orders()['cancelled'], orders)
+            counts.append(len(queries.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_order_paid_meanwhile_is_left_alone(self):
+        from unittest.mock import patch
+        from admin_dashboard import expiry
+        expired = self._order()
+        paid = self._order(status='DIBAYAR')
+        # The first read still sees the paid order as expired, as if it was
+        # paid between the SELECT and the UPDATE
+        stale = Transaksi.objects.filter(pk__in=[expired.pk, paid.pk])
+        with patch.object(expiry, 'expired_orders', side_effect=[stale, expiry.expired_orders(), expiry.expired_orders()]):
+            self.assertEqual(expiry.expire_unpaid_orders()['cancelled'], 1)
+        paid.refresh_from_db()
+        self.assertEqual(paid.status_transaksi, 'DIBAYAR')
+        self.assertEqual(self._stock(), [103, 101])
+
+
+class DiscountExpiryTestCase(TestCase):
+    """
+    Expired discounts are switched off by the sweeper and never loaded for pricing
+    """
+
+    def setUp(self):
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Discount Expiry Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000902",
+            username="discountexpiryuser",
+            password="pass",
+            email="discountexpiry@example.com"
+        )
+        self.produk = Produk.objects.create(nama_produk="Discount Expiry Product", harga_produk=10000, stok_produk=10)
+        past = timezone.now() - timedelta(hours=1)
+        self.expired = [
+            DiskonPelanggan.objects.create(pelanggan=self.pelanggan, produk=self.produk, persen_diskon=20, end_time=past)
+            for _ in range(5)
+        ]
+        self.general = DiskonPelanggan.objects.create(pelanggan=self.pelanggan, produk=None, persen_diskon=5)
+        self.running = DiskonPelanggan.objects.create(
+            pelanggan=self.pelanggan, produk=None, persen_diskon=7, end_time=timezone.now() + timedelta(hours=1)
+        )
+
+    def test_lookups_only_return_valid_discounts(self):
+        from admin_dashboard.discounts import DiscountResolver, active_discounts
+        self.assertEqual(
+            set(active_discounts().values_list('pk', flat=True)), {self.general.pk, self.running.pk}
+        )
+        # Not yet swept: the expired product discount is skipped for the general one
+        resolver = DiscountResolver.for_customer(self.pelanggan.id)
+        self.assertEqual(resolver.by_product, {})
+        self.assertEqual(resolver.resolve(self.produk.id), self.general)
+        self.assertEqual(DiscountResolver.for_public().resolve(self.produk.id), self.general)
+
+    def test_sweeper_switches_expired_discounts_off(self):
+        from admin_dashboard.expiry import expire_discounts
+        self.assertEqual(expire_discounts(batch_size=2), 5)
+        self.assertEqual(
+            set(DiskonPelanggan.objects.filter(status='aktif').values_list('pk', flat=True)),
+            {self.general.pk, self.running.pk}
+        )
+        self.assertEqual(expire_discounts(), 0)
+
+class BirthdayCampaignTestCase(TestCase):
+    """
+    The birthday campaign runs in a fixed number of queries
+    """
+
+    def setUp(self):
+        # Notifications are stamped with the real time, so campaign for today
+        self.today = timezone.localdate()
+        self.produk_list = [
+            Produk.objects.create(nama_produk=f"Birthday Product {i}", harga_produk=1000000, stok_produk=100)
+            for i in range(4)
+        ]
+
+    def _customer(self, i, birthday=True):
+        # 1992 is a leap year, so 29 February works as well
+        day = self.today if birthday else self.today + timedelta(days=1)
+        return Pelanggan.objects.create(
+            nama_pelanggan=f"Birthday Customer {i}",
+            alamat="Address",
+            tanggal_lahir=day.replace(year=1992),
+            no_hp=f"0812000002{i:02d}",
+            username=f"birthdayuser{i}",
+            password="pass",
+            email=f"birthday{i}@example.com"
+        )
+
+    def _buy(self, pelanggan, quantities):
+        transaksi = Transaksi.objects.create(pelanggan=pelanggan, total=6000000, status_transaksi='DIBAYAR')
+        for produk, jumlah in zip(self.produk_list, quantities):
+            DetailTransaksi.objects.create(transaksi=transaksi, produk=produk, jumlah_produk=jumlah, sub_total=jumlah * 1000000)
+
+    def _run(self, **kwargs):
+        from admin_dashboard.birthdays import run_birthday_campaign
+        return run_birthday_campaign(today=self.today, **kwargs)
+
+    def test_notifies_each_birthday_customer_once(self):
+        from admin_dashboard.models import Notifikasi
+        loyal = self._customer(0)
+        self._buy(loyal, [1, 1, 1, 1])
+        regular = self._customer(1)
+        self._customer(2, birthday=False)
+
+        result = self._run()
+        self.assertEqual((result['notified'], result['loyal']), (2, 1))
+        self.assertEqual(
+            dict(Notifikasi.objects.values_list('pelanggan_id', 'tipe_pesan')),
+            {loyal.id: 'Diskon Ulang Tahun Permanen', regular.id: 'Diskon Ulang Tahun Instan'}
+        )
+        # A second run finds everyone already notified
+        self.assertEqual(self._run()['notified'], 0)
+
+    def test_query_count_does_not_grow_with_customers(self):
+        for i in range(3):
+            self._customer(i)
+        # select + bulk insert, wrapped in a savepoint
+        with self.assertNumQueries(4):
+            self.assertEqual(self._run()['notified'], 3)
+        for i in range(3, 30):
+            self._customer(i)
+        with self.assertNumQueries(4):
+            self.assertEqual(self._run()['notified'], 27)
+
+    def test_discounts_for_top_products_of_loyal_customers(self):
+        loyal = self._customer(0)
+        self._buy(loyal, [5, 1, 3, 2])
+        DiskonPelanggan.objects.create(
+            pelanggan=loyal, produk=self.produk_list[0], persen_diskon=5, status='tidak_aktif'
+        )
+        result = self._run(with_discounts=True)
+        self.assertEqual(result['discounts'], 3)
+        diskon = DiskonPelanggan.objects.filter(pelanggan=loyal, status='aktif', persen_diskon=10)
+        self.assertEqual(
+            sorted(diskon.values_list('produk__nama_produk', flat=True)),
+            ['Birthday Product 0', 'Birthday Product 2', 'Birthday Product 3']
+        )
+        self.assertTrue(all(d.end_time is not None for d in diskon))
+
+    def test_command_reports_timings(self):
+        from django.core.management import call_command
+        from io import StringIO
+        self._customer(0)
+        out = StringIO()
+        call_command('check_birthday', '--no-email', stdout=out)
+        self.assertIn('Notifikasi ulang tahun dikirim ke 1 pelanggan', out.getvalue())
+        self.assertIn('select:', out.getvalue())
+
+
+class BirthdayLookupTestCase(TestCase):
+    """
+    Birthday queries use the indexed Pelanggan.ulang_tahun_mmdd column
+    """
+
+    def _customer(self, username, tanggal_lahir):
+        return Pelanggan.objects.create(
+            nama_pelanggan=username,
+            alamat="Address",
+            tanggal_lahir=tanggal_lahir,
+            no_hp="081200000300",
+            username=username,
+            password="pass",
+            email=f"{username}@example.com"
+        )
+
+    def test_column_follows_tanggal_lahir(self):
+        pelanggan = self._customer("mmdd", date(1990, 6, 15))
+        self.assertEqual(pelanggan.ulang_tahun_mmdd, 615)
+        pelanggan.tanggal_lahir = date(1990, 12, 31)
+        pelanggan.save(update_fields=['tanggal_lahir'])
+        self.assertEqual(Pelanggan.objects.get(pk=pelanggan.pk).ulang_tahun_mmdd, 1231)
+        self.assertTrue(pelanggan.is_birthday_on(date(2024, 12, 31)))
+
+    def test_today_and_upcoming_with_year_wraparound(self):
+        from admin_dashboard.birthdays import birthday_customers, upcoming_birthday_customers
+        self._customer("dec30", date(1990, 12, 30))
+        self._customer("jan02", date(1985, 1, 2))
+        self._customer("jan05", date(2000, 1, 5))
+
+        def names(queryset):
+            return sorted(queryset.values_list('username', flat=True))
+
+        self.assertEqual(names(birthday_customers(date(2024, 12, 30))), ['dec30'])
+        self.assertEqual(names(upcoming_birthday_customers(4, today=date(2024, 12, 30))), ['dec30', 'jan02'])
+        self.assertEqual(names(upcoming_birthday_customers(7, today=date(2025, 1, 1))), ['jan02', 'jan05'])
+        self.assertEqual(names(upcoming_birthday_customers(0, today=date(2025, 1, 1))), [])
+
+    def test_birthday_lookup_uses_index(self):
+        from django.db import connection
+        from admin_dashboard.birthdays import birthday_customers, upcoming_birthday_customers
+        for queryset in (birthday_customers(date(2024, 6, 15)), upcoming_birthday_customers(10, today=date(2024, 12, 28))):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn('ulang_tahun_mmdd', plan)
+            self.assertNotIn('SCAN pelanggan', plan.replace('SCAN pelanggan USING', ''))
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    The queries the views actually issue are planned on the composite and
+    partial indexes (EXPLAIN QUERY PLAN on the captured SQL)
+    """
+
+    def setUp(self):
+        from admin_dashboard.models import Admin, Kategori, Notifikasi
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Plan Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000400",
+            username="planuser",
+            password="pass",
+            email="plan@example.com"
+        )
+        self.kategori = Kategori.objects.create(nama_kategori="Plan")
+        produk = Produk.objects.create(
+            nama_produk="Plan Product", foto_produk='produk_images/test.jpg',
+            harga_produk=10000, stok_produk=50, kategori=self.kategori
+        )
+        for status in ('DIPROSES', 'SELESAI'):
+            Transaksi.objects.create(
+                pelanggan=self.pelanggan, total=10000, status_transaksi=status,
+                batas_waktu_bayar=timezone.now() + timedelta(hours=1)
+            )
+        DiskonPelanggan.objects.create(pelanggan=self.pelanggan, produk=produk, persen_diskon=10, status='aktif')
+        Notifikasi.objects.create(pelanggan=self.pelanggan, tipe_pesan="Info", isi_pesan="Info")
+
+        self.customer = Client()
+        session = self.customer.session
+        session['pelanggan_id'] = self.pelanggan.id
+        session.save()
+        self.admin = Client()
+        self.admin.force_login(Admin.objects.create_user(username='planadmin', password='pass', nama_lengkap='Plan Admin'))
+
+    def _plan(self, sql):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def _captured(self, request):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith(('SELECT', 'UPDATE'))]
+
+    def assertIndexUsed(self, statements, table, marker, index):
+        matching = [sql for sql in statements if f'FROM "{table}"' in sql and marker in sql]
+        self.assertTrue(matching, f'no query on {table} matching {marker!r}')
+        for sql in matching:
+            self.assertIn(index, self._plan(sql), sql)
+
+    def test_admin_transaction_list(self):
+        url = reverse('dashboard_admin:transaction_list')
+        statements = self._captured(lambda: self.admin.get(url))
+        self.assertIndexUsed(statements, 'transaksi', 'ORDER BY', 'transaksi_tanggal_idx')
+        statements = self._captured(lambda: self.admin.get(url, {'status': 'DIPROSES'}))
+        self.assertIndexUsed(statements, 'transaksi', 'ORDER BY', 'transaksi_status_tgl_idx')
+
+    def test_customer_catalog(self):
+        url = reverse('produk_list')
+        statements = self._captured(lambda: self.customer.get(url, {'kategori': self.kategori.pk}))
+        self.assertIndexUsed(statements, 'produk', '"kategori_id" =', 'produk_kategori_id_idx')
+        self.assertIndexUsed(statements, 'diskon_pelanggan', '"pelanggan_id" =', 'diskon_aktif_plg_produk_idx')
+        self.assertIndexUsed(statements, 'notifikasi', '"is_read"', 'notifikasi_plg_baca_idx')
+
+        statements = self._captured(lambda: Client().get(reverse('produk_list_public')))
+        self.assertIndexUsed(statements, 'diskon_pelanggan', 'GROUP BY', 'diskon_aktif_produk_idx')
+
+    def test_customer_orders_and_notifications(self):
+        statements = self._captured(lambda: self.customer.get(reverse('daftar_pesanan')))
+        self.assertIndexUsed(statements, 'transaksi', 'ORDER BY', 'transaksi_plg_status_idx')
+        statements = self._captured(lambda: self.customer.get(reverse('notifikasi')))
+        self.assertIndexUsed(statements, 'notifikasi', 'ORDER BY', 'notifikasi_plg_waktu_idx')
+
+    def test_paid_orders_of_a_customer(self):
+        from admin_dashboard.loyalty import rebuild_spending_ledger
+        # Ledger rebuild after a status change, and the most purchased products for pricing
+        statements = self._captured(lambda: rebuild_spending_ledger([self.pelanggan.id]))
+        statements += self._captured(lambda: list(Pelanggan.get_top_purchased_products(self.pelanggan.id)))
+        self.assertEqual(len([sql for sql in statements if '"status_transaksi" IN' in sql]), 2)
+        self.assertIndexUsed(statements, 'transaksi', '"status_transaksi" IN', 'transaksi_plg_status_idx')
+
+    def test_pending_orders(self):
+        from admin_dashboard.views import check_expired_payments
+        statements = self._captured(check_expired_payments)
+        self.assertIndexUsed(statements, 'transaksi', '"status_transaksi" =', 'transaksi_status_batas_idx')
+
+
+class BenchmarkSuiteTestCase(TestCase):
+    """Smoke test of the benchmark scenarios on a tiny synthetic dataset"""
+
+    def test_every_scenario_reports_metrics(self):
+        from admin_dashboard.benchmarks import SCENARIOS, run_scenarios
+        from admin_dashboard.synthetic import seed_dataset
+        rows = seed_dataset(50, customers=10, products=5)
+        self.assertEqual(Transaksi.objects.count(), rows['transaksi'])
+
+        results = run_scenarios(repeat=1)
+        self.assertEqual(set(results), {scenario.name for scenario in SCENARIOS})
+        for name, result in results.items():
+            self.assertIn(result['status'], (200, 302), name)
+            self.assertGreater(result['queries'], 0, name)
+            self.assertGreaterEqual(result['wall_ms_median'], 0, name)
+            self.assertGreater(result['peak_memory_kib'], 0, name)
+        self.assertEqual(results['checkout']['status'], 302)
+
+
+class SyntheticDataTestCase(TestCase):
+    """The synthetic generator is deterministic and skewed like real traffic"""
+
+    NOW = timezone.make_aware(timezone.datetime(2024, 6, 30, 12, 0))
+
+    def _snapshot(self):
+        return {
+            'orders': list(Transaksi.objects.order_by('pk').values_list('tanggal', 'status_transaksi', 'total')),
+            'birthdays': list(Pelanggan.objects.order_by('pk').values_list('tanggal_lahir', flat=True)),
+            'discounts': list(DiskonPelanggan.objects.order_by('pk').values_list('persen_diskon', 'status', 'end_time')),
+        }
+
+    def _clear(self):
+        from admin_dashboard.models import Kategori
+        for model in (DetailTransaksi, Transaksi, DiskonPelanggan, Pelanggan, Produk, Kategori):
+            model.objects.all().delete()
+
+    def test_same_seed_gives_same_data(self):
+        from admin_dashboard.synthetic import seed_dataset
+        rows = seed_dataset(300, customers=40, products=20, seed=7, discount_rate=0.5, now=self.NOW)
+        first = self._snapshot()
+        self.assertEqual(len(first['orders']), 300)
+        self.assertEqual(DetailTransaksi.objects.count(), rows['detail_transaksi'])
+        self.assertEqual(DiskonPelanggan.objects.count(), rows['diskon_pelanggan'])
+
+        self._clear()
+        seed_dataset(300, customers=40, products=20, seed=7, discount_rate=0.5, now=self.NOW)
+        self.assertEqual(self._snapshot(), first)
+
+    def test_distributions(self):
+        from django.db.models import Sum
+        from admin_dashboard.synthetic import seed_dataset
+        seed_dataset(2000, customers=200, products=50, seed=1, now=self.NOW)
+
+        units = list(
+            DetailTransaksi.objects.values('produk_id').annotate(units=Sum('jumlah_produk'))
+            .order_by('-units').values_list('units', flat=True)
+        )
+        # Zipf: the best seller sells far more than an average product
+        self.assertGreater(units[0], 5 * sum(units) / 50)
+        # Unpaid orders only exist inside the 24h payment window
+        stale = Transaksi.objects.filter(status_transaksi='DIPROSES', batas_waktu_bayar__lt=self.NOW)
+        self.assertFalse(stale.exists())
+        self.assertGreater(Pelanggan.objects.values('ulang_tahun_mmdd').distinct().count(), 150)
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Every route of both apps is requested (GET) with a logged-in customer and
+    admin, on a small and on a ten times larger dataset. Each route must stay
+    within its declared query budget and must not issue more queries on the
+    larger dataset, so N+1 patterns fail here with the offending SQL listed.
+    """
+    # Maximum queries per GET request, per route; new routes must declare one
+    QUERY_BUDGETS = {
+        # admin_dashboard (customer side)
+        'beranda_umum': 4,
+        'register_pelanggan': 3,
+        'login_pelanggan': 3,
+        'logout_pelanggan': 4,
+        'produk_list_public': 7,
+        'dashboard_pelanggan': 7,
+        'produk_list': 9,
+        'produk_detail': 5,
+        'keranjang': 8,
+        'update_keranjang': 1,
+        'tambah_ke_keranjang': 6,
+        'hapus_dari_keranjang': 4,
+        'checkout': 7,
+        'checkout_langsung': 1,
+        'proses_pembayaran': 6,
+        'daftar_pesanan': 7,
+        'detail_pesanan': 10,
+        'notifikasi': 9,
+        'akun': 6,
+        # dashboard_admin
+        'dashboard_admin:login': 2,
+        'dashboard_admin:logout': 4,
+        'dashboard_admin:dashboard': 11,
+        'dashboard_admin:analytics': 6,
+        'dashboard_admin:analytics_data': 6,
+        'dashboard_admin:export_transactions': 3,
+        'dashboard_admin:export_transaction_items': 3,
+        'dashboard_admin:product_list': 6,
+        'dashboard_admin:product_create': 4,
+        'dashboard_admin:product_detail': 5,
+        'dashboard_admin:product_update': 5,
+        'dashboard_admin:product_delete': 4,
+        'dashboard_admin:category_list': 4,
+        'dashboard_admin:category_create': 3,
+        'dashboard_admin:category_update': 4,
+        'dashboard_admin:category_delete': 4,
+        'dashboard_admin:customer_list': 5,
+        'dashboard_admin:customer_create': 3,
+        'dashboard_admin:customer_detail': 4,
+        'dashboard_admin:customer_update': 4,
+        'dashboard_admin:customer_delete': 4,
+        'dashboard_admin:transaction_list': 5,
+        'dashboard_admin:transaction_create': 7,
+        'dashboard_admin:transaction_detail': 7,
+        'dashboard_admin:transaction_update': 12,
+        'dashboard_admin:transaction_delete': 2,
+        'dashboard_admin:discount_list': 5,
+        'dashboard_admin:discount_create': 5,
+        'dashboard_admin:discount_update': 8,
+        'dashboard_admin:discount_delete': 6,
+        'dashboard_admin:notification_list': 5,
+        'dashboard_admin:notification_delete': 5,
+        'dashboard_admin:transaction_report': 8,
+        'dashboard_admin:generate_transaction_report_pdf': 5,
+        'dashboard_admin:transaction_report_pdf_status': 3,
+        'dashboard_admin:transaction_report_pdf_download': 2,
+        'dashboard_admin:best_products_report': 6,
+        'dashboard_admin:query_profile': 3,
+    }
+    # Model whose first row fills a route's <pk>, matched on the url name
+    PK_MODELS = {
+        'produk': 'Produk',
+        'product': 'Produk',
+        'category': 'Kategori',
+        'customer': 'Pelanggan',
+        'transaction': 'Transaksi',
+        'discount': 'DiskonPelanggan',
+        'notification': 'Notifikasi',
+    }
+
+    def setUp(self):
+        from admin_dashboard.models import Admin
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Budget Customer",
+            alamat="Test Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081234560000",
+            username="budgetuser",
+            password="testpass123",
+            email="budget@example.com"
+        )
+        self.admin = Admin.objects.create_user(username='budgetadmin', password='testpass123', nama_lengkap='Budget Admin')
+        self.media_root = tempfile.mkdtemp()
+        self.grown = 0
+
+    def _grow(self, count):
+        """
+        Add `count` more of every kind of row: products (each with a customer
+        discount and in the cart), customers, orders with lines,
+        notifications and broadcasts
+        """
+        from admin_dashboard.models import Kategori, Notifikasi
+        from admin_dashboard.notifications import broadcast
+        kategori = Kategori.objects.create(nama_kategori=f"Kategori {self.grown}")
+        for i in range(self.grown, self.grown + count):
+            produk = Produk.objects.create(
+                nama_produk=f"Produk {i}",
+                harga_produk=10000,
+                stok_produk=100,
+                deskripsi_produk="Deskripsi",
+                foto_produk="test.jpg",
+                kategori=kategori
+            )
+            DiskonPelanggan.objects.create(pelanggan=self.pelanggan, produk=produk, persen_diskon=10, status='aktif')
+            other = Pelanggan.objects.create(
+                nama_pelanggan=f"Pelanggan {i}",
+                alamat="Address",
+                tanggal_lahir=date(1985, 5, 5),
+                no_hp=f"0812{i:08d}",
+                username=f"budget{i}",
+                password="pass",
+                email=f"budget{i}@example.com"
+            )
+            for pemilik in (self.pelanggan, other):
+                transaksi = Transaksi.objects.create(
+                    pelanggan=pemilik,
+                    total=20000,
+                    status_transaksi='DIPROSES',
+                    alamat_pengiriman="Address"
+                )
+                DetailTransaksi.objects.create(transaksi=transaksi, produk=produk, jumlah_produk=2, sub_total=20000)
+                transaksi.status_transaksi = 'SELESAI'
+                transaksi.save()
+                Notifikasi.objects.create(pelanggan=pemilik, tipe_pesan="Info", isi_pesan=f"Pesan {i}")
+            broadcast("Produk Baru", f"Produk {i} tersedia")
+        self.grown += count
+
+    def _routes(self):
+        """
+        (url name, URL pattern) of every route in both apps' urls.py
+        """
+        from admin_dashboard import urls as shop_urls
+        from dashboard_admin import urls as admin_urls
+        for urls, prefix in ((shop_urls, ''), (admin_urls, f'{admin_urls.app_name}:')):
+            for pattern in urls.urlpatterns:
+                yield prefix + pattern.name, pattern
+
+    def _kwargs(self, name, pattern):
+        from django.apps import apps
+        kwargs = {}
+        for param in pattern.pattern.converters:
+            if param == 'key':
+                # PDF report routes: the report of the unfiltered transaction list
+                from dashboard_admin.pdf_reports import report_key
+                kwargs[param] = report_key({})
+                continue
+            if param == 'produk_id':
+                model = Produk
+            elif param == 'pesanan_id':
+                model = Transaksi
+            else:
+                model_name = next(model for key, model in self.PK_MODELS.items() if key in name)
+                model = apps.get_model('admin_dashboard', model_name)
+            queryset = model.objects.order_by('pk')
+            if model is Transaksi:
+                queryset = queryset.filter(pelanggan=self.pelanggan)
+            kwargs[param] = queryset.values_list('pk', flat=True).first()
+        return kwargs
+
+    def _measure(self):
+        """
+        {url name: (query count, captured queries)} for one GET of every route
+        """
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from dashboard_admin.pdf_reports import generate_report
+        results = {}
+        # Fresh report cache, so the PDF report is generated on every measurement
+        report_dir = tempfile.mkdtemp(dir=self.media_root)
+        cart = {str(pk): 1 for pk in Produk.objects.values_list('pk', flat=True)}
+        for name, pattern in self._routes():
+            # Budgets hold for a cold cache
+            cache.clear()
+            client = Client()
+            if name.startswith('dashboard_admin:'):
+                client.force_login(self.admin)
+            else:
+                session = client.session
+                session['pelanggan_id'] = self.pelanggan.pk
+                session['keranjang'] = cart
+                session.save()
+            url = reverse(name, kwargs=self._kwargs(name, pattern))
+            with override_settings(MEDIA_ROOT=self.media_root, REPORT_CACHE_DIR=report_dir), \
+                    patch('dashboard_admin.pdf_reports._submit', side_effect=generate_report), \
+                    CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+                if response.streaming:
+                    # Streaming views query while the body is consumed
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 500, f"{name} failed with {response.status_code}")
+            results[name] = (len(ctx.captured_queries), [query['sql'] for query in ctx.captured_queries])
+        return results
+
+    def _format(self, queries):
+        return '\n'.join(f'  {sql}' for sql in queries)
+
+    def test_every_route_has_a_budget(self):
+        names = {name for name, _ in self._routes()}
+        self.assertEqual(names - set(self.QUERY_BUDGETS), set(), "Routes without a query budget")
+        self.assertEqual(set(self.QUERY_BUDGETS) - names, set(), "Budgets for routes that no longer exist")
+
+    def test_query_counts_within_budget_and_constant(self):
+        self._grow(3)
+        small = self._measure()
+        self._grow(27)
+        large = self._measure()
+
+        problems = []
+        for name, (count, queries) in large.items():
+            budget = self.QUERY_BUDGETS[name]
+            if count > budget:
+                problems.append(f"{name}: {count} queries, budget {budget}\n{self._format(queries)}")
+            elif count > small[name][0]:
+                problems.append(
+                    f"{name}: {small[name][0]} queries with 3 rows per table, {count} with 30\n{self._format(queries)}"
+                )
+        self.assertFalse(problems, '\n\n'.join(problems))
+
+
+class DashboardStatsTestCase(TestCase):
+    """Cached dashboard statistics: few queries, single flight, invalidation"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan="Stats Customer",
+            alamat="Address",
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp="081200000400",
+            username="statsuser",
+            password="pass",
+            email="stats@example.com"
+        )
+        self.produk = Produk.objects.create(
+            nama_produk="Stats Produk", harga_produk=50000, stok_produk=10,
+            deskripsi_produk="Deskripsi", foto_produk="test.jpg"
+        )
+
+    def _order(self, status='DIPROSES'):
+        transaksi = Transaksi.objects.create(
+            pelanggan=self.pelanggan, total=50000, status_transaksi='DIPROSES', alamat_pengiriman="Address"
+        )
+        DetailTransaksi.objects.create(transaksi=transaksi, produk=self.produk, jumlah_produk=1, sub_total=50000)
+        if status != 'DIPROSES':
+            transaksi.status_transaksi = status
+            transaksi.save()
+        return transaksi
+
+    def test_stats_are_cached_until_a_transaction_changes(self):
+        from admin_dashboard.dashboard_stats import dashboard_stats, pending_transaction_count
+        self._order('SELESAI')
+        pending = self._order()
+
+        with self.assertNumQueries(6):
+            stats = dashboard_stats()
+        self.assertEqual(stats['total_transactions'], 2)
+        self.assertEqual(stats['pending_transaction_count'], 1)
+        self.assertEqual(stats['new_transaction_count'], 1)
+        self.assertEqual(stats['total_revenue'], Decimal('50000'))
+        self.assertEqual(stats['total_customers'], 1)
+        with self.assertNumQueries(0):
+            dashboard_stats()
+
+        # Saves that do not touch the status keep the cache
+        pending.alamat_pengiriman = "Alamat baru"
+        pending.save()
+        with self.assertNumQueries(0):
+            dashboard_stats()
+
+        self.assertEqual(pending_transaction_count(), 1)
+        pending.status_transaksi = 'DIBAYAR'
+        pending.save()
+        self.assertEqual(pending_transaction_count(), 0)
+        stats = dashboard_stats()
+        self.assertEqual(stats['pending_transaction_count'], 0)
+        self.assertEqual(stats['total_revenue'], Decimal('100000'))
+
+        self._order()
+        self.assertEqual(dashboard_stats()['total_transactions'], 3)
+
+    def test_concurrent_refill_serves_stale_copy(self):
+        from django.core.cache import cache
+        from admin_dashboard import dashboard_stats as stats_module
+        stale = stats_module.dashboard_stats()
+        stats_module.invalidate_dashboard_stats()
+        self._order()
+
+        # Another request holds the refill lock: answer with the stale copy, no queries
+        cache.add(stats_module.LOCK_CACHE_KEY, True, stats_module.LOCK_TTL)
+        with self.assertNumQueries(0):
+            self.assertEqual(stats_module.dashboard_stats(), stale)
+
+        # Without a stale copy, wait for the refill and then fall back to the DB
+        cache.delete(stats_module.STALE_CACHE_KEY)
+        with patch.object(stats_module, 'REFILL_WAIT', 0.1):
+            self.assertEqual(stats_module.dashboard_stats()['total_transactions'], 1)
+        cache.delete(stats_module.LOCK_CACHE_KEY)
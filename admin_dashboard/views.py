@@ -4,17 +4,18 @@ from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
 from .forms import PelangganRegistrationForm, PelangganLoginForm, PelangganEditForm, PembayaranForm
-from .models import Produk, Pelanggan, Transaksi, DetailTransaksi, Notifikasi, DiskonPelanggan, Kategori
-from django.db.models import Sum
+from .models import Produk, Pelanggan, Transaksi, DetailTransaksi, Notifikasi, NotifikasiBroadcast, Kategori
+from . import jobs, notifications, outbox
+from .discounts import DiscountResolver
+from .pricing import PricingEngine
+from .stock import reserve_stock
+from .pagination import CURSOR_PARAM, keyset_page
 from django.db.models.functions import TruncMonth
 from django.http import JsonResponse
 import json
 import os
 from django.conf import settings
 from datetime import timedelta
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 import logging
 
 # Configure logger
@@ -60,11 +61,7 @@ def register_pelanggan(request):
                 # Check if customer has birthday today and send immediate notification
                 from datetime import date
                 today = date.today()
-                is_birthday = (
-                    pelanggan.tanggal_lahir and 
-                    pelanggan.tanggal_lahir.month == today.month and 
-                    pelanggan.tanggal_lahir.day == today.day
-                )
+                is_birthday = pelanggan.is_birthday_on(today)
                 
                 if is_birthday:
                     # Create birthday notification
@@ -142,9 +139,9 @@ def produk_list(request):
     
     # Filter products by category if specified
     if kategori_id:
-        produk = Produk.objects.filter(kategori_id=kategori_id)
+        produk = Produk.objects.select_related('kategori').filter(kategori_id=kategori_id)
     else:
-        produk = Produk.objects.all()
+        produk = Produk.objects.select_related('kategori').all()
         
     pelanggan_id = request.session.get('pelanggan_id')
     
@@ -156,44 +153,12 @@ def produk_list(request):
     today = date.today()
     is_birthday = False
     is_loyal = False
-    total_spending = 0
     
     if pelanggan:
-        is_birthday = (
-            pelanggan.tanggal_lahir and 
-            pelanggan.tanggal_lahir.month == today.month and 
-            pelanggan.tanggal_lahir.day == today.day
-        )
+        is_birthday = pelanggan.is_birthday_on(today)
         
         # Kondisi B: Total semua Transaksi dengan status DIBAYAR/DIKIRIM/SELESAI pelanggan tersebut ≥ Rp 5.000.000
-        from django.db.models import Sum
-        total_spending = Transaksi.objects.filter(
-            pelanggan=pelanggan,
-            status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        ).aggregate(
-            total_belanja=Sum('total')
-        )['total_belanja'] or 0
-        
-        is_loyal = total_spending >= 5000000
-    
-    # Check for P2-B: Loyalitas Instan (Non-Loyal + Birthday + Cart Total >= 5,000,000)
-    qualifies_for_instant_loyalty = is_birthday and not is_loyal if pelanggan else False
-    
-    # Calculate total cart value before discounts for P2-B check
-    total_cart_value = 0
-    keranjang_belanja = request.session.get('keranjang', {}) if pelanggan else {}
-    for produk_id_str, jumlah in keranjang_belanja.items():
-        try:
-            produk_id = int(produk_id_str)
-            produk_obj = get_object_or_404(Produk, pk=produk_id)
-            # Ensure all calculations use Decimal type
-            harga_produk_decimal = Decimal(str(produk_obj.harga_produk))
-            jumlah_decimal = Decimal(str(jumlah))
-            total_cart_value += harga_produk_decimal * jumlah_decimal
-        except Exception:
-            pass  # Skip invalid items
-    
-    qualifies_for_p2b = qualifies_for_instant_loyalty and total_cart_value >= Decimal('5000000')
+        is_loyal = pelanggan.is_loyal
     
     # Customer qualifies for P2-A: Loyalitas Permanen (Loyal + Birthday)
     qualifies_for_p2a = is_birthday and is_loyal if pelanggan else False
@@ -208,35 +173,19 @@ def produk_list(request):
             # Fallback if method doesn't work
             top_products_ids = []
     
-    # Add discount information to each product
-    for p in produk:
-        # Check for product-specific discount first (Priority 1)
-        diskon_produk = None
-        if pelanggan:
-            diskon_produk = DiskonPelanggan.objects.filter(
-                pelanggan_id=pelanggan_id,
-                produk=p,
-                status='aktif'
-            ).first()
-            
-            # If no product-specific discount, check for general discount
-            if not diskon_produk:
-                diskon_produk = DiskonPelanggan.objects.filter(
-                    pelanggan_id=pelanggan_id,
-                    produk__isnull=True,  # General discount (not product-specific)
-                    status='aktif'
-                ).first()
-        
-        # P2-A: Only show birthday discount label for top 3 favorite products (Loyal + Birthday)
-        if not diskon_produk and qualifies_for_p2a and p.id in top_products_ids:
-            # Create a mock discount object for display purposes only
-            diskon_produk = type('DiskonPelanggan', (), {
-                'persen_diskon': 10,
-                'pesan': 'Diskon Ulang Tahun untuk Pelanggan Loyal'
-            })()
-        
-        # Attach discount info to product object
-        p.diskon_aktif = diskon_produk
+    # Load all active discounts of this customer at once and attach them to the products
+    resolver = DiscountResolver.for_customer(pelanggan_id if pelanggan else None)
+    resolver.annotate(produk)
+    
+    # P2-A: Only show birthday discount label for top 3 favorite products (Loyal + Birthday)
+    if qualifies_for_p2a:
+        for p in produk:
+            if not p.diskon_aktif and p.id in top_products_ids:
+                # Create a mock discount object for display purposes only
+                p.diskon_aktif = type('DiskonPelanggan', (), {
+                    'persen_diskon': 10,
+                    'pesan': 'Diskon Ulang Tahun untuk Pelanggan Loyal'
+                })()
     
     # Get notification count
     notifikasi_count = get_notification_count(pelanggan_id) if pelanggan_id else 0
@@ -259,27 +208,13 @@ def produk_list_public(request):
     
     # Filter products by category if specified
     if kategori_id:
-        produk = Produk.objects.filter(kategori_id=kategori_id)
+        produk = Produk.objects.select_related('kategori').filter(kategori_id=kategori_id)
     else:
-        produk = Produk.objects.all()
+        produk = Produk.objects.select_related('kategori').all()
     
     # Add discount information to each product (for display purposes only)
-    for p in produk:
-        # Check for any active discount (no customer-specific filtering for public view)
-        diskon_produk = DiskonPelanggan.objects.filter(
-            produk=p,
-            status='aktif'
-        ).first()
-        
-        # If no product-specific discount, check for general discount
-        if not diskon_produk:
-            diskon_produk = DiskonPelanggan.objects.filter(
-                produk__isnull=True,  # General discount
-                status='aktif'
-            ).first()
-        
-        # Attach discount info to product object
-        p.diskon_aktif = diskon_produk
+    # No customer-specific filtering for public view
+    DiscountResolver.for_public().annotate(produk)
     
     context = {
         'produk': produk,
@@ -314,9 +249,8 @@ def keranjang(request):
     # Get the customer object
     pelanggan = get_object_or_404(Pelanggan, pk=pelanggan_id)
     
-    # Calculate cart totals using the helper function
-    from .utils import calculate_cart_totals
-    cart_totals = calculate_cart_totals(pelanggan, keranjang_belanja)
+    # Price the cart with the shared pricing engine
+    cart_totals = PricingEngine.for_request(request, pelanggan).price_cart(keranjang_belanja)
     
     context = {
         'produk_di_keranjang': cart_totals['produk_di_keranjang'],
@@ -328,6 +262,7 @@ def keranjang(request):
         'is_birthday': cart_totals['is_birthday'],
         'is_loyal': cart_totals['is_loyal'],
         'total_spending': cart_totals['total_spending'],
+        'qualifies_for_birthday_discount': cart_totals['qualifies_for_p2a'],
         'qualifies_for_p2b': cart_totals['qualifies_for_p2b'],
         'total_cart_value': cart_totals['total_cart_value'],
         'has_active_birthday_discount': cart_totals['has_active_birthday_discount'],
@@ -369,11 +304,7 @@ def tambah_ke_keranjang(request, produk_id):
         # Check if customer has birthday today
         from datetime import date
         today = date.today()
-        is_birthday = (
-            pelanggan.tanggal_lahir and 
-            pelanggan.tanggal_lahir.month == today.month and 
-            pelanggan.tanggal_lahir.day == today.day
-        )
+        is_birthday = pelanggan.is_birthday_on(today)
         
         if is_birthday:
             # Check if customer has already received a birthday notification today
@@ -385,17 +316,8 @@ def tambah_ke_keranjang(request, produk_id):
             
             # If no birthday notification sent today, create one
             if not existing_notification:
-                # Calculate total spending for paid transactions
-                from django.db.models import Sum
-                total_spending = Transaksi.objects.filter(
-                    pelanggan=pelanggan,
-                    status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-                ).aggregate(
-                    total_belanja=Sum('total')
-                )['total_belanja'] or 0
-                
                 # Check customer loyalty status
-                is_loyal = total_spending >= 5000000
+                is_loyal = pelanggan.is_loyal
                 
                 # Send appropriate notification based on loyalty status
                 if is_loyal:
@@ -481,9 +403,8 @@ def checkout(request):
     # Get the customer object
     pelanggan = get_object_or_404(Pelanggan, pk=pelanggan_id)
     
-    # Calculate cart totals using the helper function
-    from .utils import calculate_cart_totals
-    cart_totals = calculate_cart_totals(pelanggan, keranjang_belanja)
+    # Price the cart with the shared pricing engine
+    cart_totals = PricingEngine.for_request(request, pelanggan).price_cart(keranjang_belanja)
     
     # Store cart data and discount information in session for later use in payment processing
     request.session['checkout_data'] = {
@@ -545,7 +466,9 @@ def proses_pembayaran(request):
             
             pelanggan_id = request.session.get('pelanggan_id')
             pelanggan = get_object_or_404(Pelanggan, pk=pelanggan_id)
-            total_belanja = 0
+            
+            # Price the cart once with the shared pricing engine
+            cart_totals = PricingEngine.for_request(request, pelanggan).price_cart(keranjang_belanja)
 
             try:
                 with transaction.atomic():
@@ -554,185 +477,49 @@ def proses_pembayaran(request):
                     if not alamat_pengiriman:
                         alamat_pengiriman = pelanggan.alamat
                     
-                    # Get discount data from session
-                    total_diskon = checkout_data.get('total_diskon', 0)
-                    total_sebelum_diskon = checkout_data.get('total_sebelum_diskon', 0)
-                    keterangan_diskon = ""
-                    
-                    # Determine discount description
-                    if total_diskon > 0:
-                        # Check if customer qualifies for birthday discount
-                        from datetime import date
-                        today = date.today()
-                        is_birthday = (
-                            pelanggan.tanggal_lahir and 
-                            pelanggan.tanggal_lahir.month == today.month and 
-                            pelanggan.tanggal_lahir.day == today.day
-                        )
-                        
-                        if is_birthday:
-                            # Check loyalty status
-                            total_spending = Transaksi.objects.filter(
-                                pelanggan=pelanggan,
-                                status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-                            ).aggregate(
-                                total_belanja=Sum('total')
-                            )['total_belanja'] or 0
-                            
-                            is_loyal = total_spending >= 5000000
-                            
-                            if is_loyal:
-                                keterangan_diskon = "Diskon Ulang Tahun Permanen (10%)"
-                            else:
-                                keterangan_diskon = "Diskon Ulang Tahun Instan (10%)"
-                        else:
-                            keterangan_diskon = "Diskon Reguler"
-                    
+                    # Tentukan batas waktu pembayaran 24 jam ke depan
+                    waktu_checkout = timezone.now()
                     transaksi = Transaksi.objects.create(
                         pelanggan=pelanggan,
-                        tanggal=timezone.now(),
-                        total=0,
+                        tanggal=waktu_checkout,
+                        total=cart_totals['total_belanja'],
                         bukti_bayar=request.FILES.get('bukti_bayar'),
                         status_transaksi='DIPROSES',
                         alamat_pengiriman=alamat_pengiriman,
-                        total_diskon=total_diskon,  # Store discount data
-                        keterangan_diskon=keterangan_diskon  # Store discount description
-                    )
-                    
-                    # SET WAKTU BATAS JIKA BELUM ADA
-                    if not transaksi.batas_waktu_bayar:
-                        transaksi.waktu_checkout = timezone.now()
-                        # Tentukan batas waktu pembayaran 24 jam ke depan
-                        transaksi.batas_waktu_bayar = transaksi.waktu_checkout + timedelta(hours=24) 
-                        transaksi.save()
-                    
-                    detail_list = []  # To store details for later use
-                    
-                    # P1: Get top purchased products for this customer
-                    try:
-                        top_products = pelanggan.get_top_purchased_products(limit=3)
-                        top_products_ids = [p.id for p in top_products]
-                    except Exception:
-                        # Fallback if method doesn't work
-                        top_products_ids = []
-                    
-                    # Check if customer qualifies for birthday discount
-                    from datetime import date
-                    today = date.today()
-                    is_birthday = (
-                        pelanggan.tanggal_lahir and 
-                        pelanggan.tanggal_lahir.month == today.month and 
-                        pelanggan.tanggal_lahir.day == today.day
+                        waktu_checkout=waktu_checkout,
+                        batas_waktu_bayar=waktu_checkout + timedelta(hours=24),
+                        total_diskon=cart_totals['total_diskon'],  # Store discount data
+                        keterangan_diskon=cart_totals['keterangan_diskon']  # Store discount description
                     )
                     
-                    # Kondisi B: Total semua Transaksi dengan status DIBAYAR/DIKIRIM/SELESAI pelanggan tersebut ≥ Rp 5.000.000
-                    from django.db.models import Sum
-                    total_spending = Transaksi.objects.filter(
-                        pelanggan=pelanggan,
-                        status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-                    ).aggregate(
-                        total_belanja=Sum('total')
-                    )['total_belanja'] or 0
-                    
-                    is_loyal = total_spending >= 5000000
-                    
-                    # Calculate total cart value before discounts for P2-B check
-                    total_cart_value = 0
-                    for produk_id_str, jumlah in keranjang_belanja.items():
-                        produk_id = int(produk_id_str)
-                        produk = get_object_or_404(Produk, pk=produk_id)
-                        # Ensure all calculations use Decimal type
-                        harga_produk_decimal = Decimal(str(produk.harga_produk))
-                        jumlah_decimal = Decimal(str(jumlah))
-                        total_cart_value += harga_produk_decimal * jumlah_decimal
-                    
-                    # Check for P2-B: Universal Birthday Discount (Birthday + Cart Total >= 5,000,000)
-                    # Logic: Ulang Tahun HARI INI AND Total Keranjang >= Rp 5000000
-                    is_p2b_eligible = (
-                        is_birthday and 
-                        total_cart_value >= Decimal('5000000')
+                    # Reserve stock for all lines with conditional atomic decrements;
+                    # InsufficientStock rolls back the whole order
+                    reserve_stock(
+                        (item['produk'], item['jumlah']) for item in cart_totals['produk_di_keranjang']
                     )
                     
-                    # Customer qualifies for P2-A: Loyalitas Permanen (Loyal + Birthday)
-                    qualifies_for_p2a = is_birthday and is_loyal
-                    
-                    for produk_id_str, jumlah in keranjang_belanja.items():
-                        produk_id = int(produk_id_str)
-                        produk = get_object_or_404(Produk, pk=produk_id)
-                        
-                        if produk.stok_produk < jumlah:
-                            raise ValueError(f'Stok produk {produk.nama_produk} tidak mencukupi. Hanya tersisa {produk.stok_produk}.')
-                        
-                        # Calculate price with discount if applicable
-                        harga_satuan = produk.harga_produk
-                        
-                        # Check for product-specific discount first (Priority 1)
-                        diskon_produk = DiskonPelanggan.objects.filter(
-                            pelanggan_id=pelanggan_id,
-                            produk=produk,
-                            status='aktif'
-                        ).first()
-                        
-                        # If no product-specific discount, check for general discount
-                        if not diskon_produk:
-                            diskon_produk = DiskonPelanggan.objects.filter(
-                                pelanggan_id=pelanggan_id,
-                                produk__isnull=True,  # General discount
-                                status='aktif'
-                            ).first()
-                        
-                        # If no manual discount found, check for birthday discounts (Priority 2)
-                        if not diskon_produk:
-                            # P2-A: Loyalitas Permanen - Apply 10% discount to top 3 favorite products
-                            if qualifies_for_p2a and produk_id in top_products_ids:
-                                # Apply 10% birthday discount
-                                harga_satuan_decimal = Decimal(str(harga_satuan))
-                                persen_diskon_decimal = Decimal('10')
-                                harga_satuan = harga_satuan_decimal - (harga_satuan_decimal * persen_diskon_decimal / 100)
-                            
-                            # P2-B: Loyalitas Instan - Apply 10% discount to all items in cart
-                            elif is_p2b_eligible:
-                                # Apply 10% birthday discount
-                                harga_satuan_decimal = Decimal(str(harga_satuan))
-                                persen_diskon_decimal = Decimal('10')
-                                harga_satuan = harga_satuan_decimal - (harga_satuan_decimal * persen_diskon_decimal / 100)
-                        
-                        # Apply manual discount if found (Priority 1)
-                        elif diskon_produk:
-                            # Ensure all calculations use Decimal type
-                            harga_satuan_decimal = Decimal(str(harga_satuan))
-                            persen_diskon_decimal = Decimal(str(diskon_produk.persen_diskon))
-                            harga_satuan = harga_satuan_decimal - (harga_satuan_decimal * persen_diskon_decimal / 100)
-                        
-                        # Save the original stock before updating
-                        produk.stok_produk -= jumlah
-                        produk.save()
-                        
-                        # Ensure all calculations use Decimal type
-                        harga_satuan_decimal = Decimal(str(harga_satuan))
-                        jumlah_decimal = Decimal(str(jumlah))
-                        sub_total = harga_satuan_decimal * jumlah_decimal
-                        detail = DetailTransaksi.objects.create(
+                    detail_list = [
+                        DetailTransaksi(
                             transaksi=transaksi,
-                            produk=produk,
-                            jumlah_produk=jumlah,
-                            sub_total=sub_total
+                            produk=item['produk'],
+                            jumlah_produk=item['jumlah'],
+                            sub_total=item['sub_total']
                         )
-                        detail_list.append(detail)
-                        total_belanja += sub_total
-
-                    transaksi.total = total_belanja
-                    transaksi.save()
+                        for item in cart_totals['produk_di_keranjang']
+                    ]
+                    DetailTransaksi.objects.bulk_create(detail_list)
 
                     # Clear cart and checkout data from session
                     request.session.pop('keranjang', None)
                     request.session.pop('checkout_data', None)
 
-                    # Create notification for the customer
-                    create_notification(
-                        pelanggan, 
-                        "Pesanan Baru", 
-                        f"Pesanan Anda telah berhasil dibuat. Silakan tunggu konfirmasi dari admin. Nomor pesanan: #{transaksi.id}"
+                    # Notify the customer after the response (background job,
+                    # committed together with the order)
+                    jobs.enqueue(
+                        'notifikasi.pelanggan',
+                        pelanggan_id=pelanggan.pk,
+                        tipe_pesan="Pesanan Baru",
+                        isi_pesan=f"Pesanan Anda telah berhasil dibuat. Silakan tunggu konfirmasi dari admin. Nomor pesanan: #{transaksi.id}"
                     )
 
                     messages.success(request, 'Pembayaran berhasil! Terima kasih telah berbelanja.')
@@ -763,11 +550,6 @@ def proses_pembayaran(request):
         messages.error(request, 'Data keranjang tidak ditemukan. Silakan tambahkan produk ke keranjang terlebih dahulu.')
         return redirect('keranjang')
     
-    total_belanja = 0
-    total_sebelum_diskon = 0
-    total_diskon = 0
-    produk_di_keranjang = []
-    
     pelanggan_id = request.session.get('pelanggan_id')
     pelanggan = get_object_or_404(Pelanggan, pk=pelanggan_id)
     
@@ -784,65 +566,16 @@ def proses_pembayaran(request):
         # Tentukan batas waktu pembayaran 24 jam ke depan
         transaksi.batas_waktu_bayar = transaksi.waktu_checkout + timedelta(hours=24)
     
-    for produk_id_str, jumlah in keranjang_belanja.items():
-        produk_id = int(produk_id_str)
-        produk = get_object_or_404(Produk, pk=produk_id)
-        # Ensure all calculations use Decimal type
-        harga_produk_decimal = Decimal(str(produk.harga_produk))
-        jumlah_decimal = Decimal(str(jumlah))
-        harga_asli = harga_produk_decimal * jumlah_decimal
-        sub_total = harga_asli
-        
-        # Check for discounts
-        diskon = None
-        potongan_harga = 0
-        harga_setelah_diskon = sub_total
-        
-        # Check for product-specific discount first
-        diskon_produk = DiskonPelanggan.objects.filter(
-            pelanggan_id=pelanggan_id,
-            produk=produk,
-            status='aktif'
-        ).first()
-        
-        # If no product-specific discount, check for general discount
-        if not diskon_produk:
-            diskon_produk = DiskonPelanggan.objects.filter(
-                pelanggan_id=pelanggan_id,
-                produk__isnull=True,  # General discount (applies to all products)
-                status='aktif'
-            ).first()
-        
-        if diskon_produk:
-            diskon = diskon_produk
-            # Ensure all calculations use Decimal type
-            sub_total_decimal = Decimal(str(sub_total))
-            persen_diskon_decimal = Decimal(str(diskon.persen_diskon))
-            potongan_harga = int(sub_total_decimal * (persen_diskon_decimal / 100))
-            harga_setelah_diskon = sub_total_decimal - Decimal(str(potongan_harga))
-            sub_total = harga_setelah_diskon
-        
-        total_belanja += sub_total
-        total_sebelum_diskon += harga_asli
-        total_diskon += potongan_harga
-        
-        produk_di_keranjang.append({
-            'produk': produk,
-            'jumlah': jumlah,
-            'sub_total': sub_total,
-            'harga_asli': harga_asli,
-            'diskon': diskon,
-            'potongan_harga': potongan_harga,
-            'harga_setelah_diskon': harga_setelah_diskon
-        })
+    # Price the cart with the shared pricing engine (reused after an invalid POST)
+    cart_totals = PricingEngine.for_request(request, pelanggan).price_cart(keranjang_belanja)
 
     context = {
         'form': form,
-        'produk_di_keranjang': produk_di_keranjang,
-        'total_belanja': total_belanja,
-        'total_sebelum_diskon': total_sebelum_diskon,
-        'total_diskon': total_diskon,
-        'total_setelah_diskon': total_sebelum_diskon - total_diskon,
+        'produk_di_keranjang': cart_totals['produk_di_keranjang'],
+        'total_belanja': cart_totals['total_belanja'],
+        'total_sebelum_diskon': cart_totals['total_sebelum_diskon'],
+        'total_diskon': cart_totals['total_diskon'],
+        'total_setelah_diskon': cart_totals['total_setelah_diskon'],
         'alamat_default': pelanggan.alamat,
         'transaksi': transaksi
     }
@@ -851,7 +584,9 @@ def proses_pembayaran(request):
 @login_required_pelanggan
 def daftar_pesanan(request):
     pelanggan = get_object_or_404(Pelanggan, pk=request.session['pelanggan_id'])
-    pesanan = Transaksi.objects.filter(pelanggan=pelanggan).order_by('-tanggal')
+    # Through the reverse manager every order reuses the loaded customer;
+    # keyset pagination on (tanggal, id), 10 orders per page
+    pesanan = keyset_page(request, pelanggan.transaksi_set.all(), 10, ordering=('-tanggal', '-id'))
     
     # Get notification count
     notifikasi_count = get_notification_count(pelanggan.id)
@@ -904,10 +639,12 @@ def detail_pesanan(request, pesanan_id):
 @login_required_pelanggan
 def notifikasi(request):
     pelanggan = get_object_or_404(Pelanggan, pk=request.session['pelanggan_id'])
-    notifikasi_list = Notifikasi.objects.filter(pelanggan=pelanggan).order_by('-created_at')
+    # One page of personal notifications and broadcasts, loaded before marking them as read
+    notifikasi_list = notifications.notifications_page(pelanggan.id, request.GET.get(CURSOR_PARAM))
+    notifikasi_list.set_urls(request.GET)
     
     # Logika untuk menandai notifikasi sebagai sudah dibaca
-    Notifikasi.objects.filter(pelanggan=pelanggan, is_read=False).update(is_read=True)
+    notifications.mark_all_read(pelanggan.id)
     
     # Get notification count (will be 0 after marking as read)
     notifikasi_count = 0
@@ -974,22 +711,19 @@ def create_notification(pelanggan, tipe_pesan, isi_pesan, url_target='#'):
 # Helper function to create notifications for all customers
 def create_notification_for_all_customers(tipe_pesan, isi_pesan, url_target='#'):
     """
-    Create a notification for all customers with optional CTA URL
+    Create a notification for all customers with optional CTA URL.
+    Stored once as a broadcast; each customer only gets a read receipt.
     """
     try:
-        pelanggan_list = Pelanggan.objects.all()
-        for pelanggan in pelanggan_list:
-            # Add CTA URL to the message if provided
-            pesan = isi_pesan
-            if url_target and url_target != '#':
-                pesan = f"{isi_pesan} <a href='{url_target}' class='alert-link'>Lihat detail</a>"
-            
-            Notifikasi.objects.create(
-                pelanggan=pelanggan,
-                tipe_pesan=tipe_pesan,
-                isi_pesan=pesan,
-                target_url=url_target if url_target and url_target != '#' else None
-            )
+        # Add CTA URL to the message if provided
+        if url_target and url_target != '#':
+            isi_pesan = f"{isi_pesan} <a href='{url_target}' class='alert-link'>Lihat detail</a>"
+        
+        notifications.broadcast(
+            tipe_pesan,
+            isi_pesan,
+            target_url=url_target if url_target and url_target != '#' else None
+        )
         return True
     except Exception as e:
         # Log the error if needed
@@ -998,13 +732,10 @@ def create_notification_for_all_customers(tipe_pesan, isi_pesan, url_target='#')
 # Add this helper function to get notification count
 def get_notification_count(pelanggan_id):
     """
-    Get the count of unread notifications for a customer
+    Get the count of unread notifications (personal and broadcast) for a customer
     """
     try:
-        return Notifikasi.objects.filter(
-            pelanggan_id=pelanggan_id,
-            is_read=False
-        ).count()
+        return notifications.unread_count(pelanggan_id)
     except Exception:
         return 0
 
@@ -1021,29 +752,12 @@ def get_cart_item_count(request):
 
 def check_expired_payments():
     """
-    Function to check for expired payments and update their status
-    This should be called periodically or before processing payments
+    Cancel orders whose payment deadline has passed and give their stock
+    back (see admin_dashboard.expiry; run every minute by run_scheduler)
     """
-    from django.utils import timezone
-    from .models import Transaksi
-    
-    # Get all transactions with status 'DIPROSES' that have expired
-    expired_transactions = Transaksi.objects.filter(
-        status_transaksi='DIPROSES',
-        batas_waktu_bayar__lt=timezone.now()
-    )
-    
-    # Update their status to 'DIBATALKAN'
-    for transaction in expired_transactions:
-        transaction.status_transaksi = 'DIBATALKAN'
-        transaction.save()
-        
-        # Create notification for the customer
-        create_notification(
-            transaction.pelanggan,
-            "Pesanan Dibatalkan",
-            f"Pesanan #{transaction.id} telah dibatalkan karena melewati batas waktu pembayaran."
-        )
+    from .expiry import expire_unpaid_orders
+
+    return expire_unpaid_orders()
 
 def send_birthday_email(customer, total_spending):
     """
@@ -1066,30 +780,14 @@ def send_birthday_email(customer, total_spending):
 
 def send_notification_email(subject, template_name, context, recipient_list, url_target='#'):
     """
-    Send email notification using HTML template with optional CTA URL
+    Queue an email notification (HTML template with optional CTA URL) in the
+    outbox; `manage.py send_outbox` sends it
     """
     try:
-        # Add CTA URL to context if provided
-        if url_target and url_target != '#':
-            context['cta_url'] = url_target
-        
-        # Render HTML content
-        html_message = render_to_string(template_name, context)
-        # Create plain text version
-        plain_message = strip_tags(html_message)
-        
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=recipient_list,
-            html_message=html_message,
-            fail_silently=False,
-        )
+        outbox.enqueue_email(subject, template_name, context, recipient_list, url_target)
         return True
     except Exception as e:
-        logger.error(f"Failed to send email: {e}")
+        logger.error(f"Failed to queue email: {e}")
         return False
 
 # API Views for Notifications
@@ -1103,17 +801,15 @@ def fetch_unread_notifications(request):
         if not pelanggan_id:
             return JsonResponse({'error': 'Not authenticated'}, status=401)
         
-        # Get unread notifications
-        notifications = Notifikasi.objects.filter(
-            pelanggan_id=pelanggan_id,
-            is_read=False
-        ).order_by('-created_at')
+        # Get unread personal and broadcast notifications
+        unread = notifications.notifications_for(pelanggan_id, unread_only=True)
         
         # Serialize notifications
         notifications_data = []
-        for notification in notifications:
+        for notification in unread:
             notifications_data.append({
                 'id': notification.id,
+                'broadcast': notification.is_broadcast,
                 'tipe_pesan': notification.tipe_pesan,
                 'isi_pesan': notification.isi_pesan,
                 'created_at': notification.created_at.isoformat(),
@@ -1147,13 +843,17 @@ def mark_notification_as_read(request):
             return JsonResponse({'error': 'Notification ID is required'}, status=400)
         
         # Mark notification as read
-        notification = get_object_or_404(
-            Notifikasi, 
-            id=notification_id, 
-            pelanggan_id=pelanggan_id
-        )
-        notification.is_read = True
-        notification.save()
+        if request.POST.get('broadcast') in ('1', 'true'):
+            notification = get_object_or_404(NotifikasiBroadcast, id=notification_id)
+            notifications.mark_broadcast_read(pelanggan_id, notification.id)
+        else:
+            notification = get_object_or_404(
+                Notifikasi, 
+                id=notification_id, 
+                pelanggan_id=pelanggan_id
+            )
+            notification.is_read = True
+            notification.save()
         
         return JsonResponse({
             'success': True,
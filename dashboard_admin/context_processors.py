@@ -1,5 +1,6 @@
 from django.apps import apps
 from django.utils import timezone
+from admin_dashboard.dashboard_stats import pending_transaction_count
 
 def admin_crm_context(request):
     """
@@ -26,10 +27,9 @@ def admin_crm_context(request):
         # ).count()
         
         # New transactions (with status DIPROSES - pending payment)
-        # This count is specifically for the Transactions menu badge
-        new_transaction_count = Transaksi.objects.filter(
-            status_transaksi='DIPROSES'
-        ).count()
+        # This count is specifically for the Transactions menu badge;
+        # cached together with the dashboard statistics
+        new_transaction_count = pending_transaction_count()
         
         # NOTE: We're removing the global unread notification count
         # as it was causing a global badge to appear next to the dashboard title
@@ -0,0 +1,225 @@
+"""
+Streaming exports of transactions and their line items.
+
+Rows are read with `QuerySet.iterator(chunk_size=...)` as plain value tuples
+and written out as they arrive, as CSV (optionally gzip-compressed on the
+fly) or as an XLSX workbook whose single sheet is deflated straight into the
+response. Memory use stays the same whatever the number of exported rows.
+"""
+import csv
+import re
+import zipfile
+import zlib
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from admin_dashboard.models import DetailTransaksi, Transaksi
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+TRANSACTION_COLUMNS = [
+    ('ID', 'id'),
+    ('Tanggal', 'tanggal'),
+    ('Pelanggan', 'pelanggan__nama_pelanggan'),
+    ('Status', 'status_transaksi'),
+    ('Alamat Pengiriman', 'alamat_pengiriman'),
+    ('Ongkir', 'ongkir'),
+    ('Total', 'total'),
+]
+DETAIL_COLUMNS = [
+    ('ID Transaksi', 'transaksi_id'),
+    ('Tanggal', 'transaksi__tanggal'),
+    ('Pelanggan', 'transaksi__pelanggan__nama_pelanggan'),
+    ('Status', 'transaksi__status_transaksi'),
+    ('Produk', 'produk__nama_produk'),
+    ('Jumlah', 'jumlah_produk'),
+    ('Sub Total', 'sub_total'),
+]
+
+# Characters XML 1.0 does not allow, even escaped
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def filter_transactions(queryset, start_date=None, end_date=None, status=None, prefix=''):
+    """
+    Apply the transaction report filters, on Transaksi or (with
+    prefix='transaksi__') on a related model
+    """
+    if start_date:
+        queryset = queryset.filter(**{f'{prefix}tanggal__gte': start_date})
+    if end_date:
+        queryset = queryset.filter(**{f'{prefix}tanggal__lte': end_date})
+    if status:
+        queryset = queryset.filter(**{f'{prefix}status_transaksi': status})
+    return queryset
+
+
+def transaction_rows(start_date=None, end_date=None, status=None):
+    queryset = filter_transactions(Transaksi.objects.all(), start_date, end_date, status)
+    return queryset.order_by('-tanggal', '-id').values_list(*[field for _, field in TRANSACTION_COLUMNS])
+
+
+def detail_rows(start_date=None, end_date=None, status=None):
+    queryset = filter_transactions(DetailTransaksi.objects.all(), start_date, end_date, status, prefix='transaksi__')
+    return queryset.order_by('-transaksi__tanggal', '-transaksi_id', 'id').values_list(
+        *[field for _, field in DETAIL_COLUMNS]
+    )
+
+
+def _cell_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'tzinfo'):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _iter_rows(rows, chunk_size):
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield [_cell_value(value) for value in row]
+
+
+class _Buffer:
+    """
+    Write target that keeps what was written until the generator drains it
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(part if isinstance(part, bytes) else part.encode() for part in self.parts)
+        self.parts = []
+        return data
+
+
+def stream_csv(header, rows, chunk_size=EXPORT_CHUNK_SIZE, compress=False):
+    """
+    CSV bytes, one piece per chunk of rows; gzip-compressed when `compress`
+    """
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def emit(data):
+        return compressor.compress(data) if compressor else data
+
+    # Byte order mark, so spreadsheet programs read the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for index, row in enumerate(_iter_rows(rows, chunk_size), 1):
+        writer.writerow(row)
+        if index % chunk_size == 0:
+            data = emit(buffer.drain())
+            if data:
+                yield data
+    data = emit(buffer.drain())
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(row):
+    cells = []
+    for value in row:
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            text = escape(_INVALID_XML.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def stream_xlsx(header, rows, sheet='Data', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    XLSX bytes of a one-sheet workbook (inline strings, no shared string
+    table), deflated into the output chunk by chunk
+    """
+    buffer = _Buffer()
+    # The buffer cannot seek, so zipfile writes sizes in data descriptors
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content.replace('{sheet}', escape(sheet)))
+        with workbook.open('xl/worksheets/sheet1.xml', 'w') as sheet_xml:
+            sheet_xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet_xml.write(_xlsx_row(header).encode())
+            for index, row in enumerate(_iter_rows(rows, chunk_size), 1):
+                sheet_xml.write(_xlsx_row(row).encode())
+                if index % chunk_size == 0:
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet_xml.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def export_response(name, columns, rows, export_format='csv', compress=False):
+    """
+    StreamingHttpResponse downloading `rows` as `name`.csv(.gz) or `name`.xlsx
+    """
+    header = [label for label, _ in columns]
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(header, rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        filename = f'{name}.xlsx'
+    elif compress:
+        response = StreamingHttpResponse(stream_csv(header, rows, compress=True), content_type='application/gzip')
+        filename = f'{name}.csv.gz'
+    else:
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv; charset=utf-8')
+        filename = f'{name}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
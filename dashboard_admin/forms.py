@@ -31,13 +31,14 @@ class PelangganForm(forms.ModelForm):
 class ProdukForm(forms.ModelForm):
     class Meta:
         model = Produk
-        fields = ['nama_produk', 'deskripsi_produk', 'foto_produk', 'stok_produk', 'harga_produk', 'kategori']
+        fields = ['nama_produk', 'deskripsi_produk', 'foto_produk', 'stok_produk', 'harga_produk', 'harga_modal', 'kategori']
         widgets = {
             'nama_produk': forms.TextInput(attrs={'class': 'form-control'}),
             'deskripsi_produk': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'foto_produk': forms.FileInput(attrs={'class': 'form-control'}),
             'stok_produk': forms.NumberInput(attrs={'class': 'form-control'}),
             'harga_produk': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+            'harga_modal': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'kategori': forms.Select(attrs={'class': 'form-control'}),
         }
 
@@ -0,0 +1,178 @@
+"""
+Per-request SQL profiling, switched on with the SQL_PROFILING_ENABLED setting.
+
+Every query of a request is timed through a database execute wrapper. The
+totals are sent back as `X-Query-Count` and `Server-Timing` headers, requests
+slower than SQL_PROFILING_SLOW_REQUEST_MS are written to the
+`dashboard_admin.slow_requests` logger (a rotating file, see LOGGING), and
+per-view totals are kept in memory for the admin "Profil Query" page.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+slow_request_logger = logging.getLogger('dashboard_admin.slow_requests')
+
+# How many duplicate signatures / slowest statements to report per request
+REPORT_LIMIT = 5
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def query_signature(sql):
+    """
+    Parameterised SQL with IN (...) lists collapsed, so the same statement
+    issued for different rows (an N+1 pattern) gets the same signature
+    """
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('(...)', sql)).strip()
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that times every statement of one request
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self, limit=REPORT_LIMIT):
+        """
+        Signatures executed more than once, most repeated first
+        """
+        counts = Counter(query_signature(sql) for sql, _ in self.queries)
+        return [(signature, count) for signature, count in counts.most_common(limit) if count > 1]
+
+    def slowest(self, limit=REPORT_LIMIT):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+
+class ViewStats:
+    """
+    Thread-safe per-view totals for the lifetime of the process
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.since = timezone.now()
+
+    def record(self, view, recorder, total_ms):
+        duplicate_queries = sum(count - 1 for _, count in recorder.duplicates(limit=None))
+        with self._lock:
+            stats = self._views.setdefault(view, {
+                'view': view,
+                'requests': 0,
+                'queries': 0,
+                'duplicate_queries': 0,
+                'db_ms': 0.0,
+                'total_ms': 0.0,
+                'max_db_ms': 0.0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['duplicate_queries'] += duplicate_queries
+            stats['db_ms'] += recorder.total_ms
+            stats['total_ms'] += total_ms
+            stats['max_db_ms'] = max(stats['max_db_ms'], recorder.total_ms)
+
+    def ranking(self):
+        """
+        Views ordered by total DB time, with per-request averages
+        """
+        with self._lock:
+            rows = [dict(stats) for stats in self._views.values()]
+        for row in rows:
+            row['avg_queries'] = row['queries'] / row['requests']
+            row['avg_db_ms'] = row['db_ms'] / row['requests']
+            row['avg_total_ms'] = row['total_ms'] / row['requests']
+        return sorted(rows, key=lambda row: row['db_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self.since = timezone.now()
+
+
+view_stats = ViewStats()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return match.view_name
+    return request.path
+
+
+class SqlProfilingMiddleware:
+    """
+    Measure the database work of every request (see module docstring)
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'SQL_PROFILING_SLOW_REQUEST_MS', 500)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['Server-Timing'] = (
+            f'db;dur={recorder.total_ms:.2f};desc="{recorder.count} queries", '
+            f'app;dur={total_ms:.2f}'
+        )
+
+        view = _view_name(request)
+        view_stats.record(view, recorder, total_ms)
+        if total_ms >= self.slow_request_ms:
+            self.log_slow_request(request, response, view, recorder, total_ms)
+        return response
+
+    def log_slow_request(self, request, response, view, recorder, total_ms):
+        slow_request_logger.warning(json.dumps({
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(recorder.total_ms, 2),
+            'queries': recorder.count,
+            'duplicates': [
+                {'sql': signature, 'count': count} for signature, count in recorder.duplicates()
+            ],
+            'slowest': [
+                {'sql': sql, 'ms': round(duration, 2)} for sql, duration in recorder.slowest()
+            ],
+        }))
@@ -0,0 +1,323 @@
+"""
+Transaction report PDFs, generated in a background worker thread and cached
+on disk.
+
+A report is identified by a hash of its filter parameters. Its status
+(pending, running, done or failed, with a row/page progress) lives in a small
+JSON file next to the PDF, so every server process sees the same state. The
+PDF is drawn row by row on a ReportLab canvas, one page at a time, from a
+chunked iterator over the transactions, so memory does not grow with the
+size of the report. Finished reports are served from disk for
+REPORT_CACHE_TTL seconds.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from admin_dashboard.models import PAID_STATUSES, Transaksi
+from .exports import filter_transactions
+
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+FILTER_NAMES = ('start_date', 'end_date', 'status')
+ROW_CHUNK_SIZE = 500
+# A running job that has not written progress for this long is assumed dead
+STALE_JOB_SECONDS = 10 * 60
+
+_KEY = re.compile(r'^[0-9a-f]{64}$')
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 1.5 * cm
+ROW_HEIGHT = 14
+# (header, x position, max characters, right aligned)
+COLUMNS = [
+    ('No', 0, 7, False),
+    ('Tanggal', 1.3 * cm, 16, False),
+    ('ID', 4.4 * cm, 8, False),
+    ('Pelanggan', 5.9 * cm, 28, False),
+    ('Status', 11.0 * cm, 10, False),
+    ('Ongkir', 15.0 * cm, 14, True),
+    ('Total', 18.0 * cm, 16, True),
+]
+
+executor = ThreadPoolExecutor(max_workers=getattr(settings, 'REPORT_WORKERS', 2), thread_name_prefix='pdf-report')
+# Held while a request reads a report's status and queues it, so concurrent
+# requests for the same report queue it only once
+_request_lock = threading.Lock()
+
+
+def report_key(filters):
+    """
+    Cache key of a report: sha256 of its normalised filter parameters
+    """
+    normalised = {name: filters.get(name) or '' for name in FILTER_NAMES}
+    payload = json.dumps({'version': REPORT_VERSION, 'filters': normalised}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_valid_key(key):
+    return bool(_KEY.match(key))
+
+
+def _cache_dir():
+    return getattr(settings, 'REPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'report_cache'))
+
+
+def pdf_path(key):
+    return os.path.join(_cache_dir(), f'{key}.pdf')
+
+
+def _status_path(key):
+    return os.path.join(_cache_dir(), f'{key}.json')
+
+
+def _temporary_path(path):
+    """
+    A new, uniquely named empty file next to `path`: the request thread and
+    the worker threads of one process never share a temporary file
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix=f'{os.path.basename(path)}.', suffix='.tmp')
+    os.close(handle)
+    return temporary
+
+
+def _replace(temporary, path):
+    try:
+        os.replace(temporary, path)
+    except OSError:
+        _discard(temporary)
+        raise
+
+
+def _discard(temporary):
+    try:
+        os.remove(temporary)
+    except OSError:
+        pass
+
+
+def _write_atomic(path, data, mode='w'):
+    temporary = _temporary_path(path)
+    try:
+        with open(temporary, mode) as handle:
+            handle.write(data)
+    except Exception:
+        _discard(temporary)
+        raise
+    _replace(temporary, path)
+
+
+def read_status(key):
+    """
+    Status dict of a report, or None when it was never requested
+    """
+    try:
+        with open(_status_path(key)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_status(**status):
+    status['updated'] = time.time()
+    _write_atomic(_status_path(status['key']), json.dumps(status))
+    return status
+
+
+def _is_fresh(status):
+    ttl = getattr(settings, 'REPORT_CACHE_TTL', 15 * 60)
+    return (
+        status['state'] == 'done'
+        and os.path.exists(pdf_path(status['key']))
+        and time.time() - status['finished'] < ttl
+    )
+
+
+def _is_active(status):
+    return status['state'] in ('pending', 'running') and time.time() - status['updated'] < STALE_JOB_SECONDS
+
+
+def request_report(filters, force=False):
+    """
+    Status of the report for `filters`, queueing its generation unless a fresh
+    copy is cached (ignored with `force`) or a worker is already on it
+    """
+    filters = {name: filters.get(name) or '' for name in FILTER_NAMES}
+    key = report_key(filters)
+    with _request_lock:
+        status = read_status(key)
+        # `force` skips a cached copy, never a worker that is already on it
+        if status and (_is_active(status) or (not force and _is_fresh(status))):
+            return status
+        status = _write_status(key=key, filters=filters, state='pending', rows=0, total=None, pages=0)
+        _submit(key, filters)
+    return status
+
+
+def _submit(key, filters):
+    executor.submit(_run_in_worker, key, filters)
+
+
+def _run_in_worker(key, filters):
+    try:
+        generate_report(key, filters)
+    finally:
+        # Worker threads get their own connection; do not leave it open
+        connection.close()
+
+
+def _text(value, width):
+    value = str(value)
+    return value if len(value) <= width else value[:width - 1] + '…'
+
+
+def _rupiah(value):
+    return f'Rp {value or 0:,.0f}'
+
+
+class _PageWriter:
+    """
+    Draw table rows on a canvas, starting a new page (with the column
+    headers repeated) whenever the current one is full
+    """
+
+    def __init__(self, pdf, title, subtitle):
+        self.pdf = pdf
+        self.title = title
+        self.subtitle = subtitle
+        self.pages = 0
+        self.y = 0
+
+    def start_page(self):
+        if self.pages:
+            self.pdf.showPage()
+        self.pages += 1
+        self.y = PAGE_HEIGHT - MARGIN
+        if self.pages == 1:
+            self.pdf.setFont('Helvetica-Bold', 16)
+            self.pdf.drawCentredString(PAGE_WIDTH / 2, self.y - 16, self.title)
+            self.y -= 30
+            if self.subtitle:
+                self.pdf.setFont('Helvetica', 9)
+                self.pdf.drawString(MARGIN, self.y - 10, self.subtitle)
+                self.y -= 20
+        self.pdf.setFont('Helvetica', 8)
+        self.pdf.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f'Halaman {self.pages}')
+        self.y -= ROW_HEIGHT
+        self.pdf.setFont('Helvetica-Bold', 9)
+        self._draw(header for header, *_ in COLUMNS)
+        self.pdf.line(MARGIN, self.y - 4, PAGE_WIDTH - MARGIN, self.y - 4)
+        self.pdf.setFont('Helvetica', 8)
+
+    def _draw(self, values):
+        for (_, x, width, right), value in zip(COLUMNS, values):
+            text = _text(value, width)
+            if right:
+                self.pdf.drawRightString(MARGIN + x, self.y, text)
+            else:
+                self.pdf.drawString(MARGIN + x, self.y, text)
+
+    def row(self, values):
+        if not self.pages or self.y - ROW_HEIGHT < MARGIN:
+            self.start_page()
+        self.y -= ROW_HEIGHT
+        self._draw(values)
+        return self.y - ROW_HEIGHT < MARGIN
+
+    def footer(self, text):
+        if not self.pages or self.y - 2 * ROW_HEIGHT < MARGIN:
+            self.start_page()
+        self.y -= 2 * ROW_HEIGHT
+        self.pdf.setFont('Helvetica-Bold', 10)
+        self.pdf.drawString(MARGIN, self.y, text)
+
+
+def _subtitle(filters):
+    parts = []
+    if filters.get('start_date'):
+        parts.append(f"Dari {filters['start_date']}")
+    if filters.get('end_date'):
+        parts.append(f"Sampai {filters['end_date']}")
+    if filters.get('status'):
+        parts.append(f"Status: {filters['status']}")
+    return 'Filter: ' + ' '.join(parts) if parts else ''
+
+
+def render_report(path, filters, progress=None):
+    """
+    Write the transaction report for `filters` to `path`, calling
+    progress(rows, pages) after every finished page. Returns (rows, pages).
+    """
+    transactions = filter_transactions(
+        Transaksi.objects.all(), filters.get('start_date'), filters.get('end_date'), filters.get('status')
+    )
+    total_revenue = transactions.filter(status_transaksi__in=PAID_STATUSES).aggregate(total=Sum('total'))['total'] or 0
+    rows = transactions.order_by('-tanggal', '-id').values_list(
+        'tanggal', 'id', 'pelanggan__nama_pelanggan', 'status_transaksi', 'ongkir', 'total'
+    )
+
+    pdf = canvas.Canvas(path, pagesize=A4, pageCompression=1)
+    pdf.setTitle('Laporan Transaksi')
+    writer = _PageWriter(pdf, 'Laporan Transaksi - UD. Barokah Jaya Beton', _subtitle(filters))
+    count = 0
+    for count, (tanggal, pk, nama_pelanggan, status, ongkir, total) in enumerate(rows.iterator(chunk_size=ROW_CHUNK_SIZE), 1):
+        page_full = writer.row([
+            count,
+            timezone.localtime(tanggal).strftime('%d/%m/%Y %H:%M') if tanggal else '',
+            pk,
+            nama_pelanggan or '',
+            status,
+            _rupiah(ongkir),
+            _rupiah(total),
+        ])
+        if page_full and progress:
+            progress(count, writer.pages)
+    writer.footer(f'Total Pendapatan: {_rupiah(total_revenue)}')
+    pdf.save()
+    return count, writer.pages
+
+
+def generate_report(key, filters):
+    """
+    Worker entry point: render the report into the cache directory and keep
+    its status file up to date
+    """
+    total = None
+    try:
+        total = filter_transactions(
+            Transaksi.objects.all(), filters.get('start_date'), filters.get('end_date'), filters.get('status')
+        ).count()
+        _write_status(key=key, filters=filters, state='running', rows=0, total=total, pages=0)
+
+        def progress(rows, pages):
+            _write_status(key=key, filters=filters, state='running', rows=rows, total=total, pages=pages)
+
+        path = pdf_path(key)
+        temporary = _temporary_path(path)
+        try:
+            rows, pages = render_report(temporary, filters, progress)
+        except Exception:
+            _discard(temporary)
+            raise
+        _replace(temporary, path)
+        return _write_status(
+            key=key, filters=filters, state='done', rows=rows, total=total, pages=pages, finished=time.time()
+        )
+    except Exception as e:
+        logger.exception('PDF report %s failed', key)
+        return _write_status(key=key, filters=filters, state='failed', rows=0, total=total, pages=0, error=str(e))
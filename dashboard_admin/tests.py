@@ -1,5 +1,6 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import authenticate, login
 from django.core.exceptions import PermissionDenied
 from django.http import JsonResponse
@@ -572,3 +573,556 @@ class DashboardAdminSecurityTests(TestCase):
         self.assertEqual(response.status_code, 400)  # Should return 400 error for invalid request
         json_response = json.loads(response.content)
         self.assertEqual(json_response['error'], 'Invalid request')
+
+
+@override_settings(SQL_PROFILING_ENABLED=True, SQL_PROFILING_SLOW_REQUEST_MS=0)
+class SqlProfilingTests(TestCase):
+    """Test the per-request SQL profiling middleware and report page"""
+
+    def setUp(self):
+        from dashboard_admin.middleware import view_stats
+        view_stats.reset()
+        self.admin = Admin.objects.create_user(
+            username='profileadmin',
+            password='testpass123',
+            nama_lengkap='Profile Admin'
+        )
+        self.client.force_login(self.admin)
+
+    def test_headers_and_slow_request_log(self):
+        with self.assertLogs('dashboard_admin.slow_requests', level='WARNING') as logs:
+            response = self.client.get(reverse('dashboard_admin:product_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'dashboard_admin:product_list')
+        self.assertEqual(entry['queries'], int(response['X-Query-Count']))
+        self.assertTrue(entry['slowest'])
+
+    def test_duplicate_signatures(self):
+        from dashboard_admin.middleware import QueryRecorder, query_signature
+        self.assertEqual(
+            query_signature('SELECT * FROM produk WHERE id IN (%s, %s,  %s)'),
+            query_signature('SELECT * FROM produk WHERE id IN (%s)')
+        )
+        recorder = QueryRecorder()
+        recorder.queries = [('SELECT 1 WHERE id = %s', 1.0)] * 3 + [('SELECT 2', 5.0)]
+        self.assertEqual(recorder.duplicates(), [('SELECT 1 WHERE id = %s', 3)])
+        self.assertEqual(recorder.slowest(1), [('SELECT 2', 5.0)])
+
+    def test_query_profile_page_ranks_views(self):
+        with self.assertLogs('dashboard_admin.slow_requests', level='WARNING'):
+            self.client.get(reverse('dashboard_admin:product_list'))
+            self.client.get(reverse('dashboard_admin:category_list'))
+            response = self.client.get(reverse('dashboard_admin:query_profile'))
+        self.assertEqual(response.status_code, 200)
+        ranking = response.context['views']
+        self.assertEqual(
+            {row['view'] for row in ranking},
+            {'dashboard_admin:product_list', 'dashboard_admin:category_list'}
+        )
+        self.assertEqual(ranking, sorted(ranking, key=lambda row: row['db_ms'], reverse=True))
+
+        with self.assertLogs('dashboard_admin.slow_requests', level='WARNING'):
+            self.client.post(reverse('dashboard_admin:query_profile'))
+        from dashboard_admin.middleware import view_stats
+        self.assertEqual([row['view'] for row in view_stats.ranking()], ['dashboard_admin:query_profile'])
+
+
+class AnalyticsDataTests(TestCase):
+    """Test the JSON analytics endpoint served from the sales rollups"""
+
+    def setUp(self):
+        from admin_dashboard.rollups import refresh_rollups
+        self.admin = Admin.objects.create_user(
+            username='analyticsadmin',
+            password='testpass123',
+            nama_lengkap='Analytics Admin'
+        )
+        self.client.force_login(self.admin)
+        self.pelanggan = Pelanggan.objects.create(
+            nama_pelanggan='Analytics Customer',
+            alamat='Kupang',
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp='081234567800',
+            username='analyticscustomer',
+            password='testpass123',
+            email='analytics@example.com'
+        )
+        self.produk = Produk.objects.create(
+            nama_produk='Roster Analitik',
+            deskripsi_produk='Produk untuk analitik',
+            foto_produk='produk_images/test.jpg',
+            stok_produk=100,
+            harga_produk=50000
+        )
+        # (day in January 2026, status, total, units)
+        for day, status, total, units in [
+            (5, 'SELESAI', 100000, 2),
+            (6, 'SELESAI', 300000, 1),
+            (7, 'DIBATALKAN', 999999, 5),
+            (14, 'SELESAI', 50000, 1),
+        ]:
+            transaksi = Transaksi.objects.create(pelanggan=self.pelanggan, total=total, status_transaksi=status)
+            DetailTransaksi.objects.create(transaksi=transaksi, produk=self.produk, jumlah_produk=units, sub_total=total)
+            Transaksi.objects.filter(pk=transaksi.pk).update(
+                tanggal=timezone.make_aware(datetime(2026, 1, day, 12))
+            )
+        refresh_rollups(full=True)
+        self.url = reverse('dashboard_admin:analytics_data')
+
+    def get(self, headers=None, **params):
+        return self.client.get(self.url, {'start': '2026-01-05', 'end': '2026-01-14', **params}, headers=headers)
+
+    def test_daily_revenue_fills_empty_days(self):
+        response = self.get(granularity='day', metric='revenue')
+        self.assertEqual(response.status_code, 200)
+        series = response.json()['series']
+        self.assertEqual(len(series), 10)
+        self.assertEqual(series[0], {'start': '2026-01-05', 'value': 100000.0})
+        self.assertEqual(series[1]['value'], 300000.0)
+        self.assertEqual(series[2]['value'], 0)
+        self.assertEqual(series[-1], {'start': '2026-01-14', 'value': 50000.0})
+
+    def test_weekly_metrics(self):
+        expected = {
+            'revenue': [400000.0, 50000.0],
+            'orders': [2, 1],
+            'units': [3, 1],
+            'aov': [200000.0, 50000.0],
+        }
+        for metric, values in expected.items():
+            with self.subTest(metric=metric):
+                data = self.get(granularity='week', metric=metric).json()
+                self.assertEqual([item['start'] for item in data['series']], ['2026-01-05', '2026-01-12'])
+                self.assertEqual([item['value'] for item in data['series']], values)
+
+    def test_monthly_series_and_rankings(self):
+        data = self.get(granularity='month').json()
+        self.assertEqual(data['series'], [{'start': '2026-01-01', 'value': 450000.0}])
+        self.assertEqual(data['top_products'][0]['total_quantity'], 4)
+        self.assertEqual(data['top_customers'][0]['pelanggan_id'], self.pelanggan.pk)
+        self.assertEqual(data['top_customers'][0]['total_spent'], 450000.0)
+
+    def test_invalid_parameters(self):
+        for params in [
+            {'start': '05-01-2026'},
+            {'granularity': 'year'},
+            {'metric': 'profit'},
+            {'start': '2026-02-01'},
+            {'start': '2020-01-01', 'granularity': 'day'},
+        ]:
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_etag_and_cache_control(self):
+        response = self.get()
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+        cached = self.get(headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+        transaksi = Transaksi.objects.create(pelanggan=self.pelanggan, total=70000, status_transaksi='SELESAI')
+        Transaksi.objects.filter(pk=transaksi.pk).update(tanggal=timezone.make_aware(datetime(2026, 1, 8, 12)))
+        from admin_dashboard.rollups import refresh_rollups
+        refresh_rollups(full=True)
+        changed = self.get(headers={'If-None-Match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_requires_admin(self):
+        self.client.logout()
+        response = self.get()
+        self.assertNotEqual(response.status_code, 200)
+
+
+class TransactionExportTests(TestCase):
+    """Test the streaming CSV/XLSX exports of transactions and line items"""
+
+    def setUp(self):
+        self.admin = Admin.objects.create_user(
+            username='exportadmin',
+            password='testpass123',
+            nama_lengkap='Export Admin'
+        )
+        self.client.force_login(self.admin)
+        pelanggan = Pelanggan.objects.create(
+            nama_pelanggan='Export, "Customer"',
+            alamat='Kupang',
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp='081234567801',
+            username='exportcustomer',
+            password='testpass123',
+            email='export@example.com'
+        )
+        produk = Produk.objects.create(
+            nama_produk='Paving <Block> & Co',
+            deskripsi_produk='Produk ekspor',
+            foto_produk='produk_images/test.jpg',
+            stok_produk=100,
+            harga_produk=25000
+        )
+        for index in range(5):
+            transaksi = Transaksi.objects.create(
+                pelanggan=pelanggan,
+                total=50000 * (index + 1),
+                status_transaksi='SELESAI' if index % 2 else 'DIBATALKAN'
+            )
+            DetailTransaksi.objects.create(transaksi=transaksi, produk=produk, jumlah_produk=2, sub_total=50000)
+            DetailTransaksi.objects.create(transaksi=transaksi, produk=produk, jumlah_produk=1, sub_total=25000)
+
+    def test_csv_export(self):
+        import csv
+        import io
+        response = self.client.get(reverse('dashboard_admin:export_transactions'), {'status': 'SELESAI'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transaksi.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0], ['ID', 'Tanggal', 'Pelanggan', 'Status', 'Alamat Pengiriman', 'Ongkir', 'Total'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row[3] for row in rows[1:]}, {'SELESAI'})
+        self.assertEqual(rows[1][2], 'Export, "Customer"')
+
+    def test_gzip_csv_export_of_items(self):
+        import gzip
+        response = self.client.get(reverse('dashboard_admin:export_transaction_items'), {'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="detail_transaksi.csv.gz"')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], 'ID Transaksi,Tanggal,Pelanggan,Status,Produk,Jumlah,Sub Total')
+        self.assertEqual(len(lines), 11)
+
+    def test_xlsx_export(self):
+        import io
+        import zipfile
+        from xml.etree import ElementTree
+        response = self.client.get(reverse('dashboard_admin:export_transaction_items'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        self.assertIn('[Content_Types].xml', workbook.namelist())
+        namespace = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+        rows = sheet.findall('.//x:row', namespace)
+        self.assertEqual(len(rows), 11)
+        texts = [node.text for node in rows[1].findall('.//x:t', namespace)]
+        self.assertIn('Paving <Block> & Co', texts)
+
+    def test_rows_are_streamed_in_chunks(self):
+        from dashboard_admin.exports import TRANSACTION_COLUMNS, stream_csv, stream_xlsx, transaction_rows
+        header = [label for label, _ in TRANSACTION_COLUMNS]
+        self.assertEqual(len(list(stream_csv(header, transaction_rows(), chunk_size=2))), 3)
+        self.assertGreater(len(list(stream_xlsx(header, transaction_rows(), chunk_size=1))), 1)
+
+    def test_invalid_format(self):
+        response = self.client.get(reverse('dashboard_admin:export_transactions'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PdfReportTests(TestCase):
+    """Test the background, disk-cached transaction report PDFs"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from dashboard_admin.pdf_reports import generate_report
+        self.admin = Admin.objects.create_user(
+            username='pdfadmin',
+            password='testpass123',
+            nama_lengkap='PDF Admin'
+        )
+        self.client.force_login(self.admin)
+        pelanggan = Pelanggan.objects.create(
+            nama_pelanggan='PDF Customer',
+            alamat='Kupang',
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp='081234567802',
+            username='pdfcustomer',
+            password='testpass123',
+            email='pdf@example.com'
+        )
+        for index in range(60):
+            Transaksi.objects.create(pelanggan=pelanggan, total=10000 * (index + 1), status_transaksi='SELESAI')
+
+        report_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, report_dir)
+        settings_override = override_settings(REPORT_CACHE_DIR=report_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Run the worker inline instead of in a background thread
+        submit = patch('dashboard_admin.pdf_reports._submit', side_effect=generate_report)
+        self.submit = submit.start()
+        self.addCleanup(submit.stop)
+
+    def test_report_is_generated_and_downloaded(self):
+        from dashboard_admin.pdf_reports import report_key
+        response = self.client.get(reverse('dashboard_admin:generate_transaction_report_pdf'), {'status': 'SELESAI'})
+        key = report_key({'status': 'SELESAI'})
+        self.assertRedirects(response, reverse('dashboard_admin:transaction_report_pdf_status', args=[key]))
+
+        status = self.client.get(
+            reverse('dashboard_admin:transaction_report_pdf_status', args=[key]), {'format': 'json'}
+        ).json()
+        self.assertEqual(status['state'], 'done')
+        self.assertEqual((status['rows'], status['total']), (60, 60))
+        self.assertEqual(status['pages'], 2)
+
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        content = b''.join(download.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+
+        page = self.client.get(reverse('dashboard_admin:transaction_report_pdf_status', args=[key]))
+        self.assertContains(page, status['download_url'])
+
+    def test_repeat_requests_are_served_from_cache(self):
+        url = reverse('dashboard_admin:generate_transaction_report_pdf')
+        self.client.get(url, {'start_date': '2020-01-01'})
+        self.client.get(url, {'start_date': '2020-01-01'})
+        self.assertEqual(self.submit.call_count, 1)
+
+        self.client.get(url, {'start_date': '2020-01-01', 'refresh': '1'})
+        self.assertEqual(self.submit.call_count, 2)
+
+        self.client.get(url, {'start_date': '2020-01-02'})
+        self.assertEqual(self.submit.call_count, 3)
+
+    def test_simultaneous_requests_queue_one_job(self):
+        import os
+        import threading
+        import time
+        from dashboard_admin import pdf_reports
+        self.submit.side_effect = None
+        read_status = pdf_reports.read_status
+
+        def slow_read_status(key):
+            # Widen the window between reading the status and queueing the job
+            status = read_status(key)
+            time.sleep(0.02)
+            return status
+
+        barrier = threading.Barrier(8)
+
+        def request():
+            barrier.wait()
+            pdf_reports.request_report({'status': 'SELESAI'})
+
+        with patch('dashboard_admin.pdf_reports.read_status', side_effect=slow_read_status):
+            threads = [threading.Thread(target=request) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(self.submit.call_count, 1)
+
+        # A refresh while the job is still pending does not queue it again
+        status = pdf_reports.request_report({'status': 'SELESAI'}, force=True)
+        self.assertEqual((status['state'], self.submit.call_count), ('pending', 1))
+        self.assertFalse([name for name in os.listdir(pdf_reports._cache_dir()) if name.endswith('.tmp')])
+
+    def test_failed_report(self):
+        from dashboard_admin.pdf_reports import report_key
+        with patch('dashboard_admin.pdf_reports.render_report', side_effect=OSError('disk full')), \
+                self.assertLogs('dashboard_admin.pdf_reports', level='ERROR'):
+            self.client.get(reverse('dashboard_admin:generate_transaction_report_pdf'))
+        key = report_key({})
+        status = self.client.get(
+            reverse('dashboard_admin:transaction_report_pdf_status', args=[key]), {'format': 'json'}
+        ).json()
+        self.assertEqual((status['state'], status['error']), ('failed', 'disk full'))
+        self.assertEqual(self.client.get(reverse('dashboard_admin:transaction_report_pdf_download', args=[key])).status_code, 404)
+
+    def test_unknown_reports(self):
+        for key in ['0' * 64, 'not-a-key']:
+            response = self.client.get(reverse('dashboard_admin:transaction_report_pdf_status', args=[key]))
+            self.assertEqual(response.status_code, 404)
+
+
+class BestProductsReportTests(TestCase):
+    """Test the best products report over the product sales rollup"""
+
+    def setUp(self):
+        from admin_dashboard.rollups import refresh_rollups
+        self.admin = Admin.objects.create_user(
+            username='bestadmin',
+            password='testpass123',
+            nama_lengkap='Best Admin'
+        )
+        self.client.force_login(self.admin)
+        pelanggan = Pelanggan.objects.create(
+            nama_pelanggan='Best Customer',
+            alamat='Kupang',
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp='081234567803',
+            username='bestcustomer',
+            password='testpass123',
+            email='best@example.com'
+        )
+        # name: (price, cost price)
+        self.products = {
+            name: Produk.objects.create(
+                nama_produk=name,
+                deskripsi_produk=name,
+                foto_produk='produk_images/test.jpg',
+                stok_produk=1000,
+                harga_produk=harga,
+                harga_modal=modal
+            )
+            for name, (harga, modal) in {
+                'Paving': (10000, 9000),
+                'Roster': (100000, 40000),
+                'Tiang': (50000, None),
+            }.items()
+        }
+        # (day in March 2026, product, units)
+        for day, name, units in [
+            (10, 'Paving', 20),
+            (10, 'Roster', 2),
+            (11, 'Tiang', 5),
+            (3, 'Roster', 1),
+            (4, 'Paving', 40),
+        ]:
+            produk = self.products[name]
+            sub_total = produk.harga_produk * units
+            transaksi = Transaksi.objects.create(pelanggan=pelanggan, total=sub_total, status_transaksi='SELESAI')
+            DetailTransaksi.objects.create(transaksi=transaksi, produk=produk, jumlah_produk=units, sub_total=sub_total)
+            Transaksi.objects.filter(pk=transaksi.pk).update(tanggal=timezone.make_aware(datetime(2026, 3, day, 12)))
+        refresh_rollups(full=True)
+        self.url = reverse('dashboard_admin:best_products_report')
+        self.period = {'start_date': '2026-03-08', 'end_date': '2026-03-14'}
+
+    def names(self, response):
+        return [row['produk'].nama_produk for row in response.context['page_obj']]
+
+    def test_sort_options(self):
+        expected = {
+            'quantity': ['Paving', 'Tiang', 'Roster'],
+            'revenue': ['Tiang', 'Paving', 'Roster'],
+            # Tiang has no cost price, so no margin: listed last
+            'margin': ['Roster', 'Paving', 'Tiang'],
+        }
+        for sort, names in expected.items():
+            with self.subTest(sort=sort):
+                response = self.client.get(self.url, {**self.period, 'sort': sort})
+                self.assertEqual(self.names(response), names)
+        row = self.client.get(self.url, {**self.period, 'sort': 'margin'}).context['page_obj'][0]
+        self.assertEqual(row['margin'], 120000)
+
+    def test_totals_come_from_one_aggregate(self):
+        response = self.client.get(self.url, self.period)
+        self.assertEqual(response.context['total_revenue'], 200000 + 200000 + 250000)
+        self.assertEqual(response.context['summary']['kuantitas'], 27)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+
+        # Session, user, summary, page of rows, products of the page (sidebar badge is cached)
+        with self.assertNumQueries(5):
+            self.client.get(self.url, self.period)
+
+    def test_compare_with_previous_period(self):
+        response = self.client.get(self.url, {**self.period, 'compare': '1'})
+        self.assertEqual((response.context['previous_start'], response.context['previous_end']), (date(2026, 3, 1), date(2026, 3, 7)))
+        previous = response.context['previous_summary']
+        self.assertEqual(previous['pendapatan'], 400000 + 100000)
+        self.assertEqual(previous['revenue_change'], 30)
+
+        rows = {row['produk'].nama_produk: row for row in response.context['page_obj']}
+        self.assertEqual((rows['Paving']['previous_quantity'], rows['Paving']['revenue_change']), (40, -50))
+        self.assertEqual(rows['Roster']['revenue_change'], 100)
+        self.assertIsNone(rows['Tiang']['revenue_change'])
+        self.assertContains(response, 'Periode sebelumnya')
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the admin lists"""
+
+    def setUp(self):
+        self.admin = Admin.objects.create_user(
+            username='pageadmin',
+            password='testpass123',
+            nama_lengkap='Page Admin'
+        )
+        self.client.force_login(self.admin)
+        pelanggan = Pelanggan.objects.create(
+            nama_pelanggan='Page Customer',
+            alamat='Kupang',
+            tanggal_lahir=date(1990, 1, 1),
+            no_hp='081234567804',
+            username='pagecustomer',
+            password='testpass123',
+            email='page@example.com'
+        )
+        base = timezone.make_aware(datetime(2026, 3, 1, 9, 0))
+        self.transactions = []
+        for i in range(25):
+            transaksi = Transaksi.objects.create(
+                pelanggan=pelanggan,
+                total=10000,
+                status_transaksi='SELESAI' if i % 5 else 'DIPROSES'
+            )
+            # Pairs of transactions share a timestamp, so the id breaks ties
+            Transaksi.objects.filter(pk=transaksi.pk).update(tanggal=base + timedelta(hours=i // 2))
+            self.transactions.append(transaksi.pk)
+        self.expected = list(Transaksi.objects.order_by('-tanggal', '-id').values_list('id', flat=True))
+        self.url = reverse('dashboard_admin:transaction_list')
+
+    def ids(self, response):
+        return [transaksi.id for transaksi in response.context['page_obj']]
+
+    def test_next_and_previous_walk_the_whole_list(self):
+        from urllib.parse import parse_qs
+        seen = []
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['page_obj'].has_previous())
+        pages = [response]
+        while response.context['page_obj'].has_next():
+            response = self.client.get(self.url + response.context['page_obj'].next_url)
+            pages.append(response)
+        for page in pages:
+            seen.extend(self.ids(page))
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(self.ids(page)) for page in pages], [10, 10, 5])
+
+        # Going back from the last page gives the middle page again
+        previous = self.client.get(self.url + pages[-1].context['page_obj'].previous_url)
+        self.assertEqual(self.ids(previous), self.ids(pages[1]))
+        self.assertTrue(previous.context['page_obj'].has_next())
+        self.assertTrue(previous.context['page_obj'].has_previous())
+        self.assertNotIn('cursor', parse_qs(pages[1].context['page_obj'].first_url.lstrip('?')))
+
+    def test_filters_are_kept_in_the_cursor_links(self):
+        response = self.client.get(self.url, {'status': 'SELESAI'})
+        page = response.context['page_obj']
+        self.assertIn('status=SELESAI', page.next_url)
+        second = self.client.get(self.url + page.next_url)
+        ids = self.ids(response) + self.ids(second)
+        self.assertEqual(ids, [pk for pk in self.expected if Transaksi.objects.get(pk=pk).status_transaksi == 'SELESAI'])
+        self.assertEqual(page.count, 20)
+        self.assertTrue(page.count_is_estimate)
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        for cursor in ['not-a-cursor', 'WyJuZXh0IiwgWzFdXQ', '']:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.ids(response), self.expected[:10])
+
+    def test_deep_pages_cost_the_same_queries(self):
+        last_url = ''
+        response = self.client.get(self.url)
+        while response.context['page_obj'].has_next():
+            last_url = response.context['page_obj'].next_url
+            response = self.client.get(self.url + last_url)
+        # Session, user, one LIMIT query on the page (count is cached)
+        with self.assertNumQueries(3) as first_page:
+            self.client.get(self.url)
+        with self.assertNumQueries(3):
+            self.client.get(self.url + last_url)
+        sql = ' '.join(query['sql'] for query in first_page.captured_queries).upper()
+        self.assertNotIn('OFFSET', sql)
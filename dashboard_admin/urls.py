@@ -11,6 +11,7 @@ urlpatterns = [
     # Admin dashboard main pages
     path('', views.dashboard, name='dashboard'),
     path('analytics/', views.analytics, name='analytics'),
+    path('analytics/data/', views.analytics_data, name='analytics_data'),
     
     # Product management
     path('products/', views.product_list, name='product_list'),
@@ -52,5 +53,12 @@ urlpatterns = [
     # Reports
     path('reports/transactions/', views.transaction_report, name='transaction_report'),
     path('reports/transactions/pdf/', views.generate_transaction_report_pdf, name='generate_transaction_report_pdf'),
+    path('reports/transactions/pdf/<str:key>/', views.transaction_report_pdf_status, name='transaction_report_pdf_status'),
+    path('reports/transactions/pdf/<str:key>/download/', views.transaction_report_pdf_download, name='transaction_report_pdf_download'),
+    path('reports/transactions/export/', views.export_transactions, name='export_transactions'),
+    path('reports/transactions/items/export/', views.export_transaction_items, name='export_transaction_items'),
     path('reports/best-products/', views.best_products_report, name='best_products_report'),
+    
+    # Monitoring
+    path('monitoring/queries/', views.query_profile, name='query_profile'),
 ]
\ No newline at end of file
@@ -4,26 +4,32 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
-from django.http import HttpResponse
-from datetime import timedelta
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control
+from datetime import date, timedelta
+import hashlib
+import json
+import os
 from django.db import transaction as db_transaction
 from django.db.models import F
 from django.core.paginator import Paginator
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.hashers import make_password
-from django.apps import apps
 from django.views.decorators.http import require_POST
+from django.conf import settings
 
-# ReportLab imports for PDF generation
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from io import BytesIO
 
 # Import models from admin_dashboard app
+from admin_dashboard import jobs, rollups
+from admin_dashboard.dashboard_stats import dashboard_stats
 from admin_dashboard.models import Admin, Pelanggan, Produk, Kategori, Transaksi, DetailTransaksi, DiskonPelanggan, Notifikasi
+from admin_dashboard.pagination import keyset_page
+from .exports import (
+    DETAIL_COLUMNS, EXPORT_FORMATS, TRANSACTION_COLUMNS, detail_rows, export_response, transaction_rows
+)
+from . import pdf_reports
+from .middleware import view_stats
 from .forms import PelangganForm, ProdukForm, KategoriForm, DiskonForm, TransaksiForm, DetailTransaksiFormSet
 
 # Create your views here.
@@ -58,93 +64,24 @@ def admin_required(view_func):
 @admin_required
 def dashboard(request):
     try:
-        # Get models from apps to avoid circular imports
-        Produk = apps.get_model('admin_dashboard', 'Produk')
-        Pelanggan = apps.get_model('admin_dashboard', 'Pelanggan')
-        Transaksi = apps.get_model('admin_dashboard', 'Transaksi')
-        DetailTransaksi = apps.get_model('admin_dashboard', 'DetailTransaksi')
-        
-        # Get dashboard statistics
-        total_products = Produk.objects.count()
-        total_customers = Pelanggan.objects.count()
-        total_transactions = Transaksi.objects.count()
-        total_revenue = Transaksi.objects.filter(
-            status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        # Calculate monthly revenue for the last 6 months
-        today = timezone.now()
-        monthly_revenue = []
-        
-        # Define status that count as paid transactions
-        PAID_STATUSES = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        
-        for i in range(5, -1, -1):  # Last 6 months (including current)
-            start_date = (today - timedelta(days=30*i)).replace(day=1)
-            if i == 0:  # Current month
-                end_date = today
-            else:
-                # Last day of the month
-                next_month = (today - timedelta(days=30*(i-1))).replace(day=1)
-                end_date = next_month - timedelta(days=1)
-                
-            monthly_total = Transaksi.objects.filter(
-                status_transaksi__in=PAID_STATUSES,
-                tanggal__gte=start_date,
-                tanggal__lte=end_date
-            ).aggregate(total=Sum('total'))['total'] or 0
-            
-            monthly_revenue.append({
-                'month': start_date.strftime('%B %Y'),
-                'total': float(monthly_total)
-            })
+        # Counts, revenue, best sellers and CRM counts: one cached bundle,
+        # refilled by a single request and invalidated by transaction changes
+        stats = dashboard_stats()
+        total_products = stats['total_products']
+        total_customers = stats['total_customers']
+        total_transactions = stats['total_transactions']
+        total_revenue = stats['total_revenue']
+        monthly_revenue = stats['monthly_revenue']
+        chart_best_selling_products = stats['best_selling_products']
+        new_customer_count = stats['new_customer_count']
+        birthday_customer_count = stats['birthday_customer_count']
+        new_transaction_count = stats['new_transaction_count']
         
         # Get recent transactions
         recent_transactions = Transaksi.objects.select_related('pelanggan').order_by('-tanggal')[:5]
         
         # Get low stock products: urutkan berdasarkan stok (naik) dan batasi 5
-        low_stock_products = Produk.objects.order_by('stok_produk')[:5]
-        
-        # Get top 5 best selling products (by quantity) - prepare data for Chart.js
-        PAID_STATUSES = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
-        best_selling_products = DetailTransaksi.objects.filter(
-            transaksi__status_transaksi__in=PAID_STATUSES
-        ).values(
-            'produk__nama_produk'
-        ).annotate(
-            total_quantity=Sum('jumlah_produk'),
-            total_revenue=Sum('sub_total')
-        ).order_by('-total_quantity')[:5]
-        
-        # Prepare data for Chart.js
-        # Convert to list of dictionaries that can be serialized to JSON
-        chart_best_selling_products = []
-        for product in best_selling_products:
-            chart_best_selling_products.append({
-                'produk__nama_produk': product['produk__nama_produk'],
-                'total_quantity': int(product['total_quantity']),
-                'total_revenue': float(product['total_revenue'])
-            })
-        
-        # Get CRM counts
-        from datetime import date
-        today_date = timezone.now().date()
-        
-        # New customers today
-        new_customer_count = Pelanggan.objects.filter(
-            created_at__date=today_date
-        ).count()
-        
-        # Birthday customers today
-        birthday_customer_count = Pelanggan.objects.filter(
-            tanggal_lahir__month=today_date.month,
-            tanggal_lahir__day=today_date.day
-        ).count()
-        
-        # New transactions today (excluding completed)
-        new_transaction_count = Transaksi.objects.filter(
-            tanggal__date=today_date
-        ).exclude(status_transaksi='SELESAI').count()
+        low_stock_products = Produk.objects.select_related('kategori').order_by('stok_produk')[:5]
         
     except Exception as e:
         # Handle any errors and provide default values
@@ -182,64 +119,14 @@ def dashboard(request):
 
 @admin_required
 def analytics(request):
-    # Get models from apps to avoid circular imports
-    Transaksi = apps.get_model('admin_dashboard', 'Transaksi')
-    DetailTransaksi = apps.get_model('admin_dashboard', 'DetailTransaksi')
-    
-    # Calculate monthly revenue for the last 6 months
-    today = timezone.now()
-    monthly_revenue = []
-    
-    # Define status that count as paid transactions
-    PAID_STATUSES = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
-    
-    for i in range(5, -1, -1):  # Last 6 months (including current)
-        start_date = (today - timedelta(days=30*i)).replace(day=1)
-        if i == 0:  # Current month
-            end_date = today
-        else:
-            # Last day of the month
-            next_month = (today - timedelta(days=30*(i-1))).replace(day=1)
-            end_date = next_month - timedelta(days=1)
-            
-        monthly_total = Transaksi.objects.filter(
-            status_transaksi__in=PAID_STATUSES,
-            tanggal__gte=start_date,
-            tanggal__lte=end_date
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        monthly_revenue.append({
-            'month': start_date.strftime('%B %Y'),
-            'total': float(monthly_total)
-        })
+    # Calculate monthly revenue for the last 6 calendar months
+    monthly_revenue = rollups.monthly_revenue(months=6)
     
     # Get top 5 best selling products (by quantity) - prepare data for Chart.js
-    top_products = DetailTransaksi.objects.filter(
-        transaksi__status_transaksi__in=PAID_STATUSES
-    ).values(
-        'produk__nama_produk'
-    ).annotate(
-        total_quantity=Sum('jumlah_produk'),
-        total_revenue=Sum('sub_total')
-    ).order_by('-total_quantity')[:5]
-    
-    # Prepare data for Chart.js
-    chart_top_products = []
-    for product in top_products:
-        chart_top_products.append({
-            'produk__nama_produk': product['produk__nama_produk'],
-            'total_quantity': int(product['total_quantity']),
-            'total_revenue': float(product['total_revenue'])
-        })
+    chart_top_products = rollups.top_products(limit=5)
     
     # Get top 3 loyal customers (by total purchase amount)
-    top_customers = Transaksi.objects.filter(
-        status_transaksi__in=PAID_STATUSES
-    ).values(
-        'pelanggan__nama_pelanggan'
-    ).annotate(
-        total_spent=Sum('total')
-    ).order_by('-total_spent')[:3]
+    top_customers = rollups.top_customers(limit=3)
     
     context = {
         'monthly_revenue': monthly_revenue,
@@ -248,6 +135,80 @@ def analytics(request):
     }
     return render(request, 'dashboard_admin/analytics.html', context)
 
+# Longest range the analytics API answers, in buckets
+ANALYTICS_MAX_BUCKETS = 1000
+# Browser cache lifetime of analytics ranges that still include today, and
+# of ranges that are entirely in the past
+ANALYTICS_MAX_AGE = 60
+ANALYTICS_CLOSED_MAX_AGE = 60 * 60
+
+
+def _analytics_date(request, name, default):
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Parameter '{name}' harus berformat YYYY-MM-DD.")
+
+
+@admin_required
+def analytics_data(request):
+    """
+    JSON series for the analytics charts, read from the daily sales rollups:
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD&granularity=day|week|month&metric=revenue|units|orders|aov
+
+    Responses carry an ETag of the payload (a matching If-None-Match gets a
+    304) and a private Cache-Control, longer for ranges that are closed.
+    """
+    today = timezone.localdate()
+    granularity = request.GET.get('granularity', 'day')
+    metric = request.GET.get('metric', 'revenue')
+    try:
+        end = _analytics_date(request, 'end', today)
+        start = _analytics_date(request, 'start', end - timedelta(days=29))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if granularity not in rollups.GRANULARITIES:
+        return JsonResponse({'error': f"Granularity harus salah satu dari: {', '.join(rollups.GRANULARITIES)}."}, status=400)
+    if metric not in rollups.METRICS:
+        return JsonResponse({'error': f"Metric harus salah satu dari: {', '.join(rollups.METRICS)}."}, status=400)
+    if start > end:
+        return JsonResponse({'error': 'Tanggal awal tidak boleh setelah tanggal akhir.'}, status=400)
+    if len(rollups.bucket_starts(start, end, granularity)) > ANALYTICS_MAX_BUCKETS:
+        return JsonResponse({'error': f'Rentang terlalu panjang (maksimal {ANALYTICS_MAX_BUCKETS} titik data).'}, status=400)
+
+    payload = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'metric': metric,
+        'series': rollups.sales_series(start, end, granularity, metric),
+        'top_products': rollups.top_products(limit=5, start_date=start, end_date=end),
+        'top_customers': [
+            {
+                'pelanggan_id': row['pelanggan_id'],
+                'pelanggan__nama_pelanggan': row['pelanggan__nama_pelanggan'],
+                'total_spent': float(row['total_spent']),
+            }
+            for row in rollups.top_customers(limit=3, start_date=start, end_date=end)
+        ],
+    }
+    body = json.dumps(payload, separators=(',', ':'))
+    etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=ANALYTICS_CLOSED_MAX_AGE if end < today else ANALYTICS_MAX_AGE
+    )
+    return response
+
 # Product Management Views
 @admin_required
 def product_list(request):
@@ -265,10 +226,8 @@ def product_list(request):
     if category_id:
         products = products.filter(kategori_id=category_id)
     
-    # Add pagination
-    paginator = Paginator(products, 10)  # Show 10 products per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination: 10 products per page, no OFFSET scans on deep pages
+    page_obj = keyset_page(request, products, 10, ordering=('id',), count='exact')
     
     categories = Kategori.objects.all()
     
@@ -444,10 +403,8 @@ def customer_list(request):
             Q(email__icontains=query)
         )
     
-    # Add pagination
-    paginator = Paginator(customers, 10)  # Show 10 customers per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination: 10 customers per page (created_at may be empty, id follows it)
+    page_obj = keyset_page(request, customers, 10, ordering=('id',), count='exact')
     
     context = {
         'page_obj': page_obj,
@@ -459,23 +416,14 @@ def customer_list(request):
 def customer_detail(request, pk):
     customer = get_object_or_404(Pelanggan, pk=pk)
     
-    # Calculate total spending
-    total_spending = Transaksi.objects.filter(
-        pelanggan=customer,
-        status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI']
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
-    # Check if customer is loyal
-    is_loyal = total_spending >= 5000000
+    # Total spending and loyalty come from the stored loyalty ledger
+    total_spending = customer.total_spending
+    is_loyal = customer.is_loyal
     
     # Check if customer has birthday today
     from datetime import date
     today = date.today()
-    is_birthday = (
-        customer.tanggal_lahir and 
-        customer.tanggal_lahir.month == today.month and 
-        customer.tanggal_lahir.day == today.day
-    )
+    is_birthday = customer.is_birthday_on(today)
     
     context = {
         'customer': customer,
@@ -567,10 +515,8 @@ def transaction_list(request):
             Q(id__icontains=query)
         )
     
-    # Add pagination
-    paginator = Paginator(transactions, 10)  # Show 10 transactions per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (tanggal, id): 10 transactions per page
+    page_obj = keyset_page(request, transactions, 10, ordering=('-tanggal', '-id'), count='estimate')
     
     context = {
         'page_obj': page_obj,
@@ -790,15 +736,9 @@ def transaction_update(request, pk):
                     old_status = getattr(transaction, '_old_status', transaction.status_transaksi)
                     _handle_stock_adjustment(transaction, old_status, transaction.status_transaksi, request)
                     
-                    # Send notification to customer if status changed to SELESAI
+                    # Notify the customer after the response if status changed to SELESAI
                     if transaction.status_transaksi == 'SELESAI' and old_status != 'SELESAI':
-                        from django.urls import reverse
-                        detail_url = reverse('detail_pesanan', args=[transaction.pk])
-                        _create_notification(
-                            transaction.pelanggan,
-                            "Pesanan Selesai",
-                            f"Pesanan Anda dengan ID {transaction.id} telah SELESAI. <a href='{detail_url}' class='alert-link'>Beri Feedback</a>"
-                        )
+                        jobs.enqueue('notifikasi.pesanan_selesai', transaksi_ids=[transaction.pk])
                     
                     messages.success(request, f'Transaction #{transaction.id} updated successfully.')
                     return redirect('dashboard_admin:transaction_list')
@@ -843,10 +783,8 @@ def transaction_update(request, pk):
 def discount_list(request):
     discounts = DiskonPelanggan.objects.select_related('pelanggan', 'produk').all()
     
-    # Add pagination
-    paginator = Paginator(discounts, 10)  # Show 10 discounts per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (tanggal_dibuat, id): 10 discounts per page
+    page_obj = keyset_page(request, discounts, 10, ordering=('-tanggal_dibuat', '-id'), count='estimate')
     
     context = {
         'page_obj': page_obj,
@@ -919,10 +857,8 @@ def discount_delete(request, pk):
 def notification_list(request):
     notifications = Notifikasi.objects.select_related('pelanggan').order_by('-created_at')
     
-    # Add pagination
-    paginator = Paginator(notifications, 10)  # Show 10 notifications per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (created_at, id): 10 notifications per page
+    page_obj = keyset_page(request, notifications, 10, ordering=('-created_at', '-id'), count='estimate')
     
     context = {
         'page_obj': page_obj,
@@ -964,10 +900,8 @@ def transaction_report(request):
     if status:
         transactions = transactions.filter(status_transaksi=status)
     
-    # Add pagination
-    paginator = Paginator(transactions, 25)  # Show 25 transactions per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (tanggal, id): 25 transactions per page
+    page_obj = keyset_page(request, transactions, 25, ordering=('-tanggal', '-id'), count='estimate')
     
     # Calculate total revenue for filtered transactions
     PAID_STATUSES = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
@@ -983,54 +917,122 @@ def transaction_report(request):
     }
     return render(request, 'dashboard_admin/reports/dashboard_transaction_report.html', context)
 
+def _export_params(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format harus salah satu dari: {', '.join(EXPORT_FORMATS)}.")
+    filters = {
+        'start_date': request.GET.get('start_date'),
+        'end_date': request.GET.get('end_date'),
+        'status': request.GET.get('status'),
+    }
+    return export_format, request.GET.get('gzip') == '1', filters
+
+@admin_required
+def export_transactions(request):
+    """Stream the filtered transactions as CSV (?gzip=1 for .csv.gz) or XLSX"""
+    try:
+        export_format, compress, filters = _export_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return export_response('transaksi', TRANSACTION_COLUMNS, transaction_rows(**filters), export_format, compress)
+
+@admin_required
+def export_transaction_items(request):
+    """Stream the line items of the filtered transactions as CSV or XLSX"""
+    try:
+        export_format, compress, filters = _export_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return export_response('detail_transaksi', DETAIL_COLUMNS, detail_rows(**filters), export_format, compress)
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def _percent_change(current, previous):
+    if not previous:
+        return None
+    return (current - previous) * 100 / previous
+
 @admin_required
 def best_products_report(request):
     # Get filter parameters
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    
-    # Start with all products
-    products = Produk.objects.all()
-    
-    # Build the query for DetailTransaksi based on date filters
-    detail_transaksi_filter = Q(detailtransaksi__transaksi__status_transaksi__in=['DIBAYAR', 'DIKIRIM', 'SELESAI'])
-    
-    if start_date:
-        detail_transaksi_filter &= Q(detailtransaksi__transaksi__tanggal__gte=start_date)
-    
-    if end_date:
-        detail_transaksi_filter &= Q(detailtransaksi__transaksi__tanggal__lte=end_date)
-    
-    # Annotate with aggregated data
-    products = products.annotate(
-        total_kuantitas_terjual=Sum(
-            'detailtransaksi__jumlah_produk',
-            filter=detail_transaksi_filter
-        ),
-        total_pendapatan=Sum(
-            'detailtransaksi__sub_total',
-            filter=detail_transaksi_filter
+    start_date = _parse_date(request.GET.get('start_date'))
+    end_date = _parse_date(request.GET.get('end_date'))
+    sort = request.GET.get('sort')
+    if sort not in rollups.PRODUCT_SALES_SORTS:
+        sort = 'quantity'
+    compare = request.GET.get('compare') == '1'
+
+    previous_start = previous_end = None
+    if compare:
+        # Compare with the period of the same length right before this one
+        end_date = end_date or timezone.localdate()
+        start_date = start_date or end_date - timedelta(days=29)
+        previous_end = start_date - timedelta(days=1)
+        previous_start = previous_end - (end_date - start_date)
+
+    # Totals and the product count in one aggregate over the product rollup
+    summary = rollups.product_sales_summary(start_date, end_date)
+
+    # Only the requested page of grouped rows is read
+    paginator = Paginator(rollups.product_sales(start_date, end_date, sort), 25)  # Show 25 products per page
+    paginator.count = summary['jumlah_produk']
+    page_obj = paginator.get_page(request.GET.get('page'))
+    rows = list(page_obj.object_list)
+    produk_ids = [row['produk_id'] for row in rows]
+    products = Produk.objects.select_related('kategori').in_bulk(produk_ids)
+    previous = rollups.product_sales_for(produk_ids, previous_start, previous_end) if compare and rows else {}
+    for row in rows:
+        row['produk'] = products[row['produk_id']]
+        if compare:
+            row['previous_quantity'], row['previous_revenue'] = previous.get(row['produk_id'], (0, 0))
+            row['revenue_change'] = _percent_change(row['pendapatan'], row['previous_revenue'])
+    page_obj.object_list = rows
+
+    previous_summary = None
+    if compare:
+        previous_summary = rollups.product_sales_summary(previous_start, previous_end)
+        previous_summary['revenue_change'] = _percent_change(
+            summary['pendapatan'], previous_summary['pendapatan']
         )
-    ).filter(total_kuantitas_terjual__gt=0).order_by('-total_kuantitas_terjual')
-    
-    # Add pagination
-    paginator = Paginator(products, 25)  # Show 25 products per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Calculate total revenue
-    total_revenue = 0
-    for product in products:
-        total_revenue += product.total_pendapatan if product.total_pendapatan else 0
-    
+
     context = {
         'page_obj': page_obj,
-        'start_date': start_date,
-        'end_date': end_date,
-        'total_revenue': total_revenue,
+        'start_date': start_date.isoformat() if start_date else '',
+        'end_date': end_date.isoformat() if end_date else '',
+        'sort': sort,
+        'compare': compare,
+        'previous_start': previous_start,
+        'previous_end': previous_end,
+        'total_revenue': summary['pendapatan'],
+        'summary': summary,
+        'previous_summary': previous_summary,
     }
     return render(request, 'dashboard_admin/reports/best_products_report.html', context)
 
+# Monitoring
+@admin_required
+def query_profile(request):
+    """
+    Views ranked by total database time, as measured by SqlProfilingMiddleware
+    """
+    if request.method == 'POST':
+        view_stats.reset()
+        messages.success(request, 'Statistik profil query telah direset.')
+        return redirect('dashboard_admin:query_profile')
+
+    context = {
+        'profiling_enabled': getattr(settings, 'SQL_PROFILING_ENABLED', False),
+        'slow_request_ms': getattr(settings, 'SQL_PROFILING_SLOW_REQUEST_MS', 500),
+        'views': view_stats.ranking(),
+        'since': view_stats.since,
+    }
+    return render(request, 'dashboard_admin/monitoring/query_profile.html', context)
+
 # Helper functions
 def _handle_stock_adjustment(transaction, old_status, new_status, request):
     """Handle stock adjustments when transaction status changes"""
@@ -1058,24 +1060,6 @@ def _handle_stock_adjustment(transaction, old_status, new_status, request):
                 produk.save(update_fields=['stok_produk'])
                 messages.success(request, f"Stok produk '{produk.nama_produk}' dikembalikan.")
 
-def _create_notification(pelanggan, tipe_pesan, isi_pesan, url_target='#'):
-    """Create a notification for a specific customer with optional CTA URL"""
-    try:
-        # Add CTA URL to the message if provided
-        if url_target and url_target != '#':
-            isi_pesan = f"{isi_pesan} <a href='{url_target}' class='alert-link'>Lihat detail</a>"
-        
-        Notifikasi.objects.create(
-            pelanggan=pelanggan,
-            tipe_pesan=tipe_pesan,
-            isi_pesan=isi_pesan,
-            target_url=url_target if url_target and url_target != '#' else None
-        )
-        return True
-    except Exception as e:
-        # Log the error if needed
-        return False
-
 def _send_new_product_notification(product):
     """Send notification to all customers about new product"""
     from admin_dashboard.views import create_notification_for_all_customers
@@ -1096,120 +1080,39 @@ def _send_stock_update_notification(product):
 
 @admin_required
 def generate_transaction_report_pdf(request):
-    """Generate PDF report for transactions"""
-    # Get filter parameters
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    status = request.GET.get('status')
-    
-    # Start with all transactions
-    transactions = Transaksi.objects.select_related('pelanggan').prefetch_related('detailtransaksi_set__produk')
-    
-    # Apply filters
-    if start_date:
-        transactions = transactions.filter(tanggal__gte=start_date)
-    
-    if end_date:
-        transactions = transactions.filter(tanggal__lte=end_date)
-    
-    if status:
-        transactions = transactions.filter(status_transaksi=status)
-    
-    # Sort transactions by date
-    transactions = transactions.order_by('-tanggal')
-    
-    # Create a PDF buffer
-    buffer = BytesIO()
-    
-    # Create the PDF object
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    
-    # Add title
-    title = Paragraph("Laporan Transaksi - UD. Barokah Jaya Beton", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.2*inch))
-    
-    # Add filter information if any
-    if start_date or end_date or status:
-        filter_info = "Filter: "
-        if start_date:
-            filter_info += f"Dari {start_date} "
-        if end_date:
-            filter_info += f"Sampai {end_date} "
-        if status:
-            filter_info += f"Status: {status}"
-        filter_para = Paragraph(filter_info, styles['Normal'])
-        elements.append(filter_para)
-        elements.append(Spacer(1, 0.1*inch))
-    
-    # Prepare data for the table
-    table_data = [['No', 'Tanggal', 'ID', 'Pelanggan', 'Status', 'Ongkir', 'Total']]
-    
-    # Calculate total revenue for filtered transactions
-    PAID_STATUSES = ['DIBAYAR', 'DIKIRIM', 'SELESAI']
-    paid_transactions = transactions.filter(status_transaksi__in=PAID_STATUSES)
-    total_revenue = paid_transactions.aggregate(total=Sum('total'))['total'] or 0
-    
-    # Add transaction data
-    for index, transaction in enumerate(transactions, 1):
-        # Format tanggal
-        tanggal_formatted = transaction.tanggal.strftime('%d/%m/%Y %H:%M') if transaction.tanggal else ''
-        
-        table_data.append([
-            str(index),
-            tanggal_formatted,
-            str(transaction.id),
-            str(transaction.pelanggan.nama_pelanggan if transaction.pelanggan else ''),
-            str(transaction.status_transaksi),
-            f"Rp {transaction.ongkir:,.0f}" if transaction.ongkir else "Rp 0",
-            f"Rp {transaction.total:,.0f}" if transaction.total else "Rp 0"
-        ])
-    
-    # Create the table
-    pdf_table = Table(table_data)
-    pdf_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    
-    elements.append(pdf_table)
-    
-    # Add total revenue
-    elements.append(Spacer(1, 0.2*inch))
-    total_revenue_para = Paragraph(f"<b>Total Pendapatan: Rp {total_revenue:,.0f}</b>", styles['Normal'])
-    elements.append(total_revenue_para)
-    
-    # Build the PDF
-    doc.build(elements)
-    
-    # Get the value of the BytesIO buffer
-    pdf_value = buffer.getvalue()
-    buffer.close()
-    
-    # Create the HTTP response
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="laporan_transaksi.pdf"'
-    response.write(pdf_value)
-    
-    return response
+    """Queue the transaction report PDF in the background and show its progress"""
+    filters = {name: request.GET.get(name) for name in pdf_reports.FILTER_NAMES}
+    status = pdf_reports.request_report(filters, force=request.GET.get('refresh') == '1')
+    return redirect('dashboard_admin:transaction_report_pdf_status', key=status['key'])
+
+def _pdf_report_status(key):
+    if not pdf_reports.is_valid_key(key):
+        raise Http404
+    status = pdf_reports.read_status(key)
+    if status is None:
+        raise Http404
+    return status
+
+@admin_required
+def transaction_report_pdf_status(request, key):
+    """Progress of a queued PDF report, as a page or (?format=json) as JSON"""
+    status = _pdf_report_status(key)
+    if status['state'] == 'done':
+        status['download_url'] = reverse('dashboard_admin:transaction_report_pdf_download', args=[key])
+    if request.GET.get('format') == 'json':
+        response = JsonResponse(status)
+        add_never_cache_headers(response)
+        return response
+    return render(request, 'dashboard_admin/reports/pdf_status.html', {'report': status})
+
+@admin_required
+def transaction_report_pdf_download(request, key):
+    """Serve a finished PDF report from the report cache"""
+    status = _pdf_report_status(key)
+    path = pdf_reports.pdf_path(key)
+    if status['state'] != 'done' or not os.path.exists(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename='laporan_transaksi.pdf', content_type='application/pdf')
 
 # Transaction Delete View
 @admin_required
@@ -17,6 +17,10 @@ The script will:
 - Set up the Django environment
 - Import and execute the check_birthdays management command
 - Print execution timestamps for logging purposes
+
+Alternatively, run `python manage.py run_scheduler` as an Always-on task: it
+runs this birthday check together with the other periodic jobs (payment and
+discount expiry, sales rollups, old notifications).
 """
 
 import os
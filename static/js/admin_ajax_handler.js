@@ -130,12 +130,14 @@
     };
     
     // Function to mark notification as read
-    window.markNotificationAsRead = function(notificationId, targetUrl) {
+    // Personal and broadcast notifications have separate ids: `isBroadcast` says which one
+    window.markNotificationAsRead = function(notificationId, targetUrl, isBroadcast) {
         $.ajax({
             url: '/api/notifications/mark_read/',
             type: 'POST',
             data: {
                 'id': notificationId,
+                'broadcast': isBroadcast ? 1 : 0,
                 'csrfmiddlewaretoken': $('[name=csrfmiddlewaretoken]').val()
             },
             success: function(response) {
@@ -176,7 +178,7 @@
         let html = '';
         notifications.forEach(function(notification) {
             html += `
-                <div class="notification-item" onclick="markNotificationAsRead(${notification.id}, '${notification.target_url || '#'}')">
+                <div class="notification-item" onclick="markNotificationAsRead(${notification.id}, '${notification.target_url || '#'}', ${notification.broadcast ? 'true' : 'false'})">
                     <div class="d-flex justify-content-between">
                         <span class="notification-title">${notification.tipe_pesan}</span>
                         <span class="notification-time">${formatNotificationTime(notification.created_at)}</span>